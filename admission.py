@@ -0,0 +1,177 @@
+# admission.py
+"""
+게이트웨이 입장 제어 (admission control)
+- 작업 종류별 풀: cpu (인코더/BERT 추론), io (LLM/저장소 조회)
+  → 풀마다 동시 실행 슬롯 수와 대기열 길이에 상한
+- 대기열은 우선순위 큐: interactive(사용자 요청)가 batch(사전 생성/일괄 작업)보다 먼저
+- 같은 우선순위 안에서는 클라이언트별 공정 분배 (가상 시간 기준, 한 클라이언트가 몰아 보내도 번갈아 처리)
+- 대기열이 차면 즉시 Overloaded → 게이트웨이가 429 + Retry-After 로 응답
+  (과부하 시 모두가 타임아웃되는 대신 처리 가능한 만큼은 정상 처리)
+
+이벤트 루프 안에서만 사용 (락 없음)
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {"interactive": INTERACTIVE, "batch": BATCH}
+
+# batch 요청은 대기열의 이 비율까지만 사용 (나머지는 interactive 몫)
+BATCH_QUEUE_SHARE = 0.5
+
+
+class Overloaded(Exception):
+    def __init__(self, pool: str, retry_after: int):
+        super().__init__(f"{pool} pool overloaded")
+        self.pool = pool
+        self.retry_after = retry_after
+
+
+class WorkloadPool:
+    """동시 실행 슬롯 + 우선순위/공정 대기열"""
+
+    def __init__(self, name: str, capacity: int, max_queue: int, queue_timeout: float = 30.0):
+        self.name = name
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self.active = 0
+        self._queue = []                      # (priority, 가상 시간, 순번, future)
+        self._seq = itertools.count()
+        self._client_vtime: Dict[str, float] = {}
+        self._vtime = 0.0                     # 마지막으로 시작한 작업의 가상 시간
+        self._service_sec = 1.0               # 작업 소요 시간 EWMA (Retry-After 계산용)
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _queue_limit(self, priority: int) -> int:
+        return self.max_queue if priority == INTERACTIVE else int(self.max_queue * BATCH_QUEUE_SHARE)
+
+    def retry_after(self) -> int:
+        waves = (len(self._queue) + 1) / max(self.capacity, 1)
+        return max(1, math.ceil(waves * self._service_sec))
+
+    def _next_vtime(self, client: str) -> float:
+        return max(self._client_vtime.get(client, 0.0), self._vtime) + 1.0
+
+    def _commit_vtime(self, client: str, vtime: float) -> None:
+        """입장/대기열 등록이 확정된 요청만 클라이언트 가상 시간을 진행 (429 거절은 공정성에 반영 안 함)"""
+        self._client_vtime[client] = vtime
+        if len(self._client_vtime) > 10000:
+            # 오래된 클라이언트 정리 (현재 가상 시간보다 뒤처진 항목은 기본값과 같음)
+            self._client_vtime = {c: v for c, v in self._client_vtime.items() if v > self._vtime}
+
+    async def acquire(self, priority: int = INTERACTIVE, client: str = "") -> None:
+        vtime = self._next_vtime(client)
+        if self.active < self.capacity and not self._queue:
+            self.active += 1
+            self._commit_vtime(client, vtime)
+            self._vtime = vtime
+            self.admitted += 1
+            return
+
+        if len(self._queue) >= self._queue_limit(priority):
+            self.rejected += 1
+            raise Overloaded(self.name, self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, vtime, next(self._seq), future)
+        heapq.heappush(self._queue, entry)
+        self._commit_vtime(client, vtime)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if future.done():
+                # 슬롯을 받은 직후 타임아웃 → 받은 슬롯으로 그대로 실행
+                self.admitted += 1
+                return
+            self._drop(entry, future)
+            self.timed_out += 1
+            raise Overloaded(self.name, self.retry_after())
+        except BaseException:
+            # 대기 중 요청 취소 (클라이언트 연결 종료 등)
+            if future.done():
+                # 이미 넘겨받은 슬롯은 다음 대기자에게 반납
+                self.release()
+            else:
+                self._drop(entry, future)
+            raise
+        self.admitted += 1
+
+    def _drop(self, entry, future) -> None:
+        """대기열에서 제거 (release 가 죽은 대기자에게 슬롯을 넘기지 않도록)"""
+        future.cancel()
+        self._queue.remove(entry)
+        heapq.heapify(self._queue)
+
+    def release(self, elapsed: Optional[float] = None) -> None:
+        if elapsed is not None:
+            self._service_sec = 0.9 * self._service_sec + 0.1 * elapsed
+        # 슬롯을 반납하지 않고 다음 대기자에게 바로 넘김
+        while self._queue:
+            _, vtime, _, future = heapq.heappop(self._queue)
+            if not future.done():
+                self._vtime = vtime
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: int = INTERACTIVE, client: str = ""):
+        await self.acquire(priority, client)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def stats(self) -> Dict:
+        return {
+            "capacity": self.capacity,
+            "active": self.active,
+            "queued": len(self._queue),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "queue_timeouts": self.timed_out,
+            "avg_service_sec": round(self._service_sec, 3),
+        }
+
+
+class AdmissionController:
+
+    def __init__(self):
+        cpu = os.cpu_count() or 4
+        self.pools = {
+            "cpu": WorkloadPool(
+                "cpu",
+                capacity=int(os.getenv("GATEWAY_CPU_SLOTS", str(max(1, cpu // 2)))),
+                max_queue=int(os.getenv("GATEWAY_CPU_QUEUE", "32")),
+            ),
+            "io": WorkloadPool(
+                "io",
+                capacity=int(os.getenv("GATEWAY_IO_SLOTS", "32")),
+                max_queue=int(os.getenv("GATEWAY_IO_QUEUE", "256")),
+            ),
+        }
+
+    def slot(self, pool: str, priority: int = INTERACTIVE, client: str = ""):
+        return self.pools[pool].slot(priority, client)
+
+    def stats(self) -> Dict:
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+
+def request_priority(value: Optional[str]) -> int:
+    """X-Priority 헤더 값 → 우선순위 (없거나 모르는 값이면 interactive)"""
+    return PRIORITY_NAMES.get((value or "").strip().lower(), INTERACTIVE)
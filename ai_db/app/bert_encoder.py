@@ -0,0 +1,106 @@
+# app/bert_encoder.py
+"""
+ai_hj MultiTaskLegalBERT 체크포인트를 검색 인코더로 사용
+- 모델 이름이 "legal-bert:<체크포인트 폴더>" 이면 SentenceTransformer 대신 이 인코더 사용
+  (service / build_index / incremental 모두 load_encoder 로 로드)
+- 검색 벡터: 마지막 레이어 토큰 평균 (ai_hj/llm/model.py mean_pool 과 같은 방식, 512토큰 절단)
+- 분류 헤드(classifier)도 함께 로드 → 같은 forward 1번으로 소송 유형 확률까지 계산
+→ 인덱스를 이 인코더로 만들면 ai_hj 예측 forward 의 벡터를 그대로 검색에 사용할 수 있음
+"""
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+BERT_ENCODER_PREFIX = "legal-bert:"
+BASE_MODEL_NAME = "klue/bert-base"
+DEFAULT_CLASS_NAMES = ['민사/가사소송', '행정소송', '형사소송']
+
+
+def is_bert_encoder(model_name: Optional[str]) -> bool:
+    return bool(model_name) and model_name.startswith(BERT_ENCODER_PREFIX)
+
+
+def load_encoder(model_name: str, device: Optional[str] = None):
+    """모델 이름 → 인코더 (legal-bert:<경로> 또는 SentenceTransformer 모델 이름)"""
+    if is_bert_encoder(model_name):
+        return BertEncoder(model_name[len(BERT_ENCODER_PREFIX):], device=device or "cpu")
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, device=device)
+
+
+class BertEncoder:
+    """SentenceTransformer 와 같은 encode() 인터페이스"""
+
+    def __init__(self, checkpoint_dir: str, device: str = "cpu", max_seq_length: int = 512):
+        import torch
+        from transformers import AutoTokenizer, BertModel
+
+        checkpoint = torch.load(os.path.join(checkpoint_dir, "pytorch_model.bin"),
+                                map_location="cpu", weights_only=False)
+        self.class_names = DEFAULT_CLASS_NAMES
+        if isinstance(checkpoint, dict) and "model_state_dict" in checkpoint:
+            self.class_names = checkpoint.get("class_names") or DEFAULT_CLASS_NAMES
+            checkpoint = checkpoint["model_state_dict"]
+
+        self.device = torch.device(device)
+        self.tokenizer = AutoTokenizer.from_pretrained(BASE_MODEL_NAME)
+        self.bert = BertModel.from_pretrained(BASE_MODEL_NAME)
+        self.bert.load_state_dict(
+            {k[len("bert."):]: v for k, v in checkpoint.items() if k.startswith("bert.")}
+        )
+        hidden_size = self.bert.config.hidden_size
+        self.classifier = torch.nn.Linear(hidden_size, len(self.class_names))
+        self.classifier.load_state_dict({
+            "weight": checkpoint["classifier.weight"],
+            "bias": checkpoint["classifier.bias"],
+        })
+        self.bert.to(self.device)
+        self.classifier.to(self.device)
+        self.max_seq_length = max_seq_length
+        self.eval()
+
+    def eval(self):
+        self.bert.eval()
+        self.classifier.eval()
+        return self
+
+    def share_memory(self):
+        """preload-then-fork 용 (SentenceTransformer.share_memory 와 같은 역할)"""
+        self.bert.share_memory()
+        self.classifier.share_memory()
+        return self
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.bert.config.hidden_size
+
+    def _forward(self, texts: List[str]):
+        import torch
+
+        inputs = self.tokenizer(texts, return_tensors="pt", truncation=True, padding=True,
+                                max_length=self.max_seq_length)
+        inputs = {k: v.to(self.device) for k, v in inputs.items() if k != "token_type_ids"}
+        with torch.no_grad():
+            outputs = self.bert(**inputs)
+        mask = inputs["attention_mask"].unsqueeze(-1).to(outputs.last_hidden_state.dtype)
+        vectors = (outputs.last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        return vectors, outputs.pooler_output
+
+    def encode(self, texts: List[str], batch_size: int = 32, show_progress_bar: bool = False,
+               convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        out = []
+        for i in range(0, len(texts), batch_size):
+            vectors, _ = self._forward(list(texts[i:i + batch_size]))
+            out.append(vectors.float().cpu().numpy())
+        if not out:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype="float32")
+        return np.concatenate(out)
+
+    def encode_with_case_type(self, text: str) -> Tuple[np.ndarray, Dict[str, float]]:
+        """검색 벡터 (1, dim) + 소송 유형 확률 (forward 1번)"""
+        import torch
+
+        vectors, pooled = self._forward([text])
+        with torch.no_grad():
+            probs = torch.softmax(self.classifier(pooled), dim=-1)[0].tolist()
+        return vectors.float().cpu().numpy(), dict(zip(self.class_names, probs))
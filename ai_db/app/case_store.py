@@ -0,0 +1,230 @@
+# app/case_store.py
+"""
+판례 데이터 저장소 (메모리 맵 Arrow IPC 파일)
+- 워커마다 parquet/CSV 전체를 pandas로 올리는 대신
+  비압축 Arrow IPC 파일을 mmap으로 열고 필요한 행만 꺼냄
+- 같은 파일을 여는 워커들은 OS 페이지 캐시를 공유 → 워커당 추가 메모리 최소화
+- 사건 유형별 subset 비트맵(.npy)도 미리 계산해 mmap으로 사용
+- 섹션 오프셋/판결 결과 컬럼(app/sections.py)이 없으면 생성 시 1회 계산해서 함께 저장
+"""
+import os
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from app.search_engine import SUBSET_CASE_TYPES, subset_mask
+from app.sections import SECTION_NAMES, add_section_columns, section_columns, with_section_schema
+
+CASE_STORE_FILE = "cases.arrow"
+SUBSET_FILE = "subset_{case_type}.npy"
+# 근사 중복 클러스터 (pipeline/dedup.py): clusters[i] = 행 i가 속한 클러스터의 대표 행 위치
+CLUSTERS_FILE = "clusters.npy"
+
+# 서빙에 필요 없는 대용량 컬럼 (03_XAI에서 만든 object 임베딩 컬럼 등)
+DROP_COLUMNS = ("embedding", "fact_text")
+
+
+def write_case_store(batches: Iterable[pa.RecordBatch], schema: pa.Schema, out_dir: str) -> str:
+    """
+    RecordBatch 스트림 → 비압축 Arrow IPC 파일 + subset 비트맵 (메모리는 배치 크기만큼만 사용)
+
+    Returns:
+        생성된 Arrow 파일 경로
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    out_path = os.path.join(out_dir, CASE_STORE_FILE)
+    tmp_path = out_path + ".tmp"
+
+    masks = {case_type: [] for case_type in SUBSET_CASE_TYPES}
+    rows = 0
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+                rows += batch.num_rows
+
+                df = batch.select(["사건종류명", "case_text"]).to_pandas()
+                for case_type in SUBSET_CASE_TYPES:
+                    masks[case_type].append(subset_mask(case_type, df))
+
+    for case_type, parts in masks.items():
+        mask = np.concatenate(parts) if parts else np.zeros(0, dtype=bool)
+        np.save(os.path.join(out_dir, SUBSET_FILE.format(case_type=case_type)), mask)
+
+    os.replace(tmp_path, out_path)
+    print(f"✅ 판례 저장소 생성: {out_path} ({rows} rows)")
+    return out_path
+
+
+def open_parquet_source(path: str) -> ds.Dataset:
+    """
+    정제 데이터 열기: 단일 parquet 파일 또는 pipeline/ingest.py가 만든
+    사건종류명 파티션 디렉터리 (사건종류명=형사/...) 모두 지원
+    """
+    if os.path.isdir(path):
+        partitioning = ds.partitioning(pa.schema([("사건종류명", pa.string())]), flavor="hive")
+        return ds.dataset(path, format="parquet", partitioning=partitioning)
+    return ds.dataset(path, format="parquet")
+
+
+def build_case_store(parquet_path: str, out_dir: str, batch_size: int = 4096) -> str:
+    """parquet (파일 또는 파티션 디렉터리) → 판례 저장소 (배치 단위 스트리밍)"""
+    dataset = open_parquet_source(parquet_path)
+    columns = [
+        name for name in dataset.schema.names
+        if name not in DROP_COLUMNS and not name.startswith("__index_level_")
+    ]
+    schema = with_section_schema(pa.schema([dataset.schema.field(name) for name in columns]))
+    batches = (
+        add_section_columns(batch, schema)
+        for batch in dataset.to_batches(columns=columns, batch_size=batch_size)
+    )
+    return write_case_store(batches, schema, out_dir)
+
+
+class CaseStore:
+    """mmap Arrow 파일 기반 읽기 전용 판례 저장소 (행 위치 = FAISS 인덱스 위치)"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.path = os.path.join(directory, CASE_STORE_FILE)
+
+        # memory_map + read_all은 zero-copy → 실제로 읽는 페이지만 메모리에 올라옴
+        self._source = pa.memory_map(self.path, "r")
+        self.table = pa.ipc.open_file(self._source).read_all()
+
+        self._masks: Dict[str, np.ndarray] = {}
+        for case_type in SUBSET_CASE_TYPES:
+            mask_path = os.path.join(directory, SUBSET_FILE.format(case_type=case_type))
+            if os.path.exists(mask_path):
+                self._masks[case_type] = np.load(mask_path, mmap_mode="r")
+
+        # 근사 중복 클러스터 (없으면 모든 행이 자기 자신의 대표)
+        clusters_path = os.path.join(directory, CLUSTERS_FILE)
+        self.clusters = np.load(clusters_path, mmap_mode="r") if os.path.exists(clusters_path) else None
+        self._cluster_sizes = None
+        self._cluster_members = None
+
+        # ✅ 사건번호 → 행 위치 매핑
+        self.case_id_to_idx = self._build_id_map()
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    @property
+    def columns(self):
+        return self.table.column_names
+
+    def _build_id_map(self) -> Dict[str, int]:
+        case_id_to_idx = {}
+        for idx, case_num in enumerate(self.table.column("사건번호").to_pylist()):
+            if case_num is None:
+                continue
+            normalized = str(case_num).strip()
+            if normalized:
+                case_id_to_idx[normalized] = idx
+        return case_id_to_idx
+
+    def subset_mask(self, case_type: str) -> Optional[np.ndarray]:
+        """사건 유형 subset 비트맵 (없으면 저장소에서 계산 후 캐시)"""
+        if case_type not in SUBSET_CASE_TYPES:
+            return None
+        if case_type not in self._masks:
+            df = self.table.select(["사건종류명", "case_text"]).to_pandas()
+            self._masks[case_type] = subset_mask(case_type, df)
+        return self._masks[case_type]
+
+    @property
+    def indexed_count(self) -> int:
+        """벡터 인덱스에 들어간 행 수 (중복 제거 시 대표 행만)"""
+        if self.clusters is None:
+            return len(self)
+        return int((self.cluster_sizes() > 0).sum())
+
+    def cluster_sizes(self) -> np.ndarray:
+        """대표 행 위치별 클러스터 크기 (대표가 아닌 행은 0)"""
+        if self._cluster_sizes is None:
+            if self.clusters is None:
+                self._cluster_sizes = np.ones(len(self), dtype=np.int64)
+            else:
+                self._cluster_sizes = np.bincount(np.asarray(self.clusters), minlength=len(self))
+        return self._cluster_sizes
+
+    def canonical_position(self, position: int) -> int:
+        """클러스터 대표 행 위치"""
+        return position if self.clusters is None else int(self.clusters[position])
+
+    def _members_index(self):
+        """
+        (클러스터 순으로 정렬한 행 위치, 클러스터별 시작 오프셋) - 저장소당 한 번만 계산
+        → duplicates() 가 코퍼스 전체를 훑지 않고 클러스터 구간만 잘라서 반환
+        """
+        if self._cluster_members is None:
+            order = np.argsort(np.asarray(self.clusters), kind="stable")
+            starts = np.concatenate([[0], np.cumsum(self.cluster_sizes())])
+            self._cluster_members = (order, starts)
+        return self._cluster_members
+
+    def duplicates(self, position: int) -> np.ndarray:
+        """같은 클러스터에 속한 행 위치 (대표 포함, 자기 자신 포함, 오름차순)"""
+        if self.clusters is None:
+            return np.array([position], dtype=np.int64)
+        order, starts = self._members_index()
+        cluster = int(self.clusters[position])
+        return order[starts[cluster]:starts[cluster + 1]]
+
+    def take(self, positions: Sequence[int], columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """지정한 행 위치만 DataFrame으로 꺼냄 (index = 행 위치)"""
+        positions = np.asarray(positions, dtype=np.int64)
+        table = self.table if columns is None else self.table.select(list(columns))
+        df = table.take(pa.array(positions)).to_pandas()
+        df.index = positions
+        return df
+
+    def row(self, position: int) -> dict:
+        """한 행을 dict로 반환"""
+        return self.table.slice(position, 1).to_pylist()[0]
+
+    def section(self, position: int, name: str) -> Optional[str]:
+        """
+        case_text의 한 섹션만 반환 (없으면 None)
+        mmap 버퍼에서 섹션 바이트 구간만 잘라 읽음 → 전문 전체를 읽지 않음
+        """
+        if name not in SECTION_NAMES:
+            raise ValueError(f"Unknown section: {name}")
+        start_col, end_col = section_columns(name)
+        if start_col not in self.table.column_names:
+            return None
+        start = self.table.column(start_col)[position].as_py()
+        end = self.table.column(end_col)[position].as_py()
+        if start is None or start < 0:
+            return None
+
+        column = self.table.column("case_text")
+        for chunk in column.chunks:
+            if position < len(chunk):
+                break
+            position -= len(chunk)
+        offset_type = np.int64 if pa.types.is_large_string(chunk.type) else np.int32
+        offsets = np.frombuffer(chunk.buffers()[1], dtype=offset_type)
+        base = int(offsets[chunk.offset + position])
+        return chunk.buffers()[2].slice(base + start, end - start).to_pybytes().decode("utf-8")
+
+    def value_counts(self, column: str) -> pd.Series:
+        counts = pc.value_counts(self.table.column(column)).to_pylist()
+        series = pd.Series({c["values"]: c["counts"] for c in counts})
+        return series.sort_values(ascending=False)
+
+
+def open_case_store(directory: str, source_parquet: Optional[str] = None) -> CaseStore:
+    """저장소 열기 (Arrow 파일이 없고 원본 parquet이 있으면 최초 1회 변환)"""
+    if not os.path.exists(os.path.join(directory, CASE_STORE_FILE)):
+        if not source_parquet:
+            raise FileNotFoundError(f"{CASE_STORE_FILE} not found in {directory}")
+        print(f"🔄 {CASE_STORE_FILE} 없음 → {source_parquet} 에서 변환")
+        build_case_store(source_parquet, directory)
+    return CaseStore(directory)
@@ -4,7 +4,7 @@
 Rule-based 방식으로 텍스트에서 사건 유형을 추정
 """
 import re
-from typing import Tuple
+from typing import Dict, Tuple
 
 def infer_case_type(text: str) -> Tuple[str, float]:
     """
@@ -83,6 +83,32 @@ def infer_case_type(text: str) -> Tuple[str, float]:
     return "전체", 0.4
 
 
+# BERT 분류 헤드로 형사 subset 을 고를 최소 확률 (미만이면 전체 검색)
+CASE_TYPE_MIN_PROB = 0.5
+
+
+def infer_case_type_from_probs(probs: Dict[str, float], text: str) -> Tuple[str, float]:
+    """
+    MultiTaskLegalBERT 분류 헤드 확률로 사건 유형 추정 (검색 벡터와 같은 forward 결과)
+    - 헤드 라벨은 민사/가사소송, 행정소송, 형사소송
+    - 형사소송 → 형사 subset
+    - 민사/가사소송은 가사/노동을 구분하지 않으므로 키워드 규칙으로 세분 (아니면 전체)
+    - 행정소송은 subset 이 없으므로 전체
+    """
+    if not probs:
+        return infer_case_type(text)
+    label = max(probs, key=probs.get)
+    prob = float(probs[label])
+
+    if label == "형사소송" and prob >= CASE_TYPE_MIN_PROB:
+        return "형사", prob
+    if label == "민사/가사소송":
+        keyword_type, keyword_confidence = infer_case_type(text)
+        if keyword_type in ("가사", "노동"):
+            return keyword_type, min(prob, keyword_confidence)
+    return "전체", prob
+
+
 def get_case_type_label(case_type: str) -> str:
     """UI 표시용 레이블"""
     labels = {
@@ -0,0 +1,266 @@
+# app/corpus.py
+"""
+버전별 검색 아티팩트 관리 (무중단 교체)
+
+디렉터리 구조:
+    <root>/versions/<version>/
+        case_index.faiss      FAISS 인덱스
+        cases.arrow           판례 저장소 (id 매핑은 사건번호 컬럼에서 생성)
+        subset_*.npy          사건 유형별 subset 비트맵
+        clusters.npy          근사 중복 클러스터 (선택, 있으면 인덱스에는 대표 행만)
+        delta/<batch_id>/     증분 추가분 (app/delta_segment.py)
+        manifest.json         마지막에 기록 → 존재하면 "완성된 버전"
+
+- 백그라운드 스레드가 새 버전을 감지하면 별도로 로드하고 스모크 쿼리를 통과한 뒤에만 교체
+- 요청은 시작 시점에 current()로 받은 버전을 끝까지 사용 → 진행 중인 요청은 이전 버전으로 완료
+- versions/ 가 없으면 <root> 자체를 단일 버전("legacy")으로 사용
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.case_store import CaseStore, build_case_store, open_case_store
+from app.delta_segment import DeltaSegment, SegmentedIndex, SegmentedStore
+from app.search_engine import read_index_mmap
+
+INDEX_FILE = "case_index.faiss"
+MANIFEST_FILE = "manifest.json"
+VERSIONS_DIR = "versions"
+LEGACY_VERSION = "legacy"
+
+SMOKE_QUERY = "임대인이 보증금을 돌려주지 않고 연락을 피하고 있습니다."
+
+
+def read_manifest(directory: str) -> Dict[str, Any]:
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(directory: str, **fields) -> Dict[str, Any]:
+    """manifest.json 기록 (임시 파일 → rename 으로 원자적 생성)"""
+    manifest = {"created_at": datetime.now().isoformat(timespec="seconds"), **fields}
+    path = os.path.join(directory, MANIFEST_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(path + ".tmp", path)
+    return manifest
+
+
+def latest_ready_version(root: str) -> Optional[str]:
+    """manifest.json까지 기록된 버전 중 이름이 가장 큰 것 (예: 20261018-0300)"""
+    versions_dir = os.path.join(root, VERSIONS_DIR)
+    if not os.path.isdir(versions_dir):
+        return None
+    ready = [
+        name for name in os.listdir(versions_dir)
+        if os.path.exists(os.path.join(versions_dir, name, MANIFEST_FILE))
+    ]
+    return max(ready) if ready else None
+
+
+def active_version_dir(root: str) -> Tuple[str, str]:
+    """현재 서비스 대상 (버전 이름, 디렉터리) — versions/ 가 없으면 루트 자체"""
+    version = latest_ready_version(root)
+    if version is None:
+        return LEGACY_VERSION, root
+    return version, os.path.join(root, VERSIONS_DIR, version)
+
+
+def new_version_name() -> str:
+    return datetime.now().strftime("%Y%m%d-%H%M%S")
+
+
+def prepare_version(root: str, version: str, index_path: str, parquet_path: str,
+                    model_name: str) -> str:
+    """
+    노트북 산출물(case_index.faiss + parquet)로 새 버전 디렉터리 생성
+    manifest.json은 마지막에 기록되므로 서비스는 완성된 버전만 보게 됨
+    """
+    directory = os.path.join(root, VERSIONS_DIR, version)
+    os.makedirs(directory, exist_ok=True)
+    build_case_store(parquet_path, directory)
+    shutil.copyfile(index_path, os.path.join(directory, INDEX_FILE))
+    write_manifest(directory, version=version, model_name=model_name)
+    print(f"✅ 새 버전 준비 완료: {directory}")
+    return directory
+
+
+class CorpusVersion:
+    """한 버전의 검색 아티팩트 묶음 (인덱스 + 판례 저장소 + id 매핑 + subset 비트맵)"""
+
+    def __init__(self, version: str, directory: str, case_store: Optional[CaseStore] = None):
+        self.version = version
+        self.directory = directory
+        self.manifest = read_manifest(directory)
+        main_store = case_store or CaseStore(directory)
+        main_index = read_index_mmap(os.path.join(directory, INDEX_FILE))
+
+        # 메인 + 델타 세그먼트를 하나의 인덱스/저장소처럼 사용 (툼스톤 제외)
+        self.delta = DeltaSegment(directory, main_store, main_index.d, main_index.metric_type)
+        self.delta.refresh()
+        self.case_store = SegmentedStore(main_store, self.delta)
+        self.faiss_index = SegmentedIndex(main_index, self.delta)
+        self.loaded_at = time.time()
+
+    @property
+    def case_id_to_idx(self):
+        return self.case_store.case_id_to_idx
+
+    def smoke_test(self, encoder, model_name: Optional[str] = None) -> None:
+        """교체 전 검증: 인코더/차원/행 수 일치 + 샘플 쿼리 검색이 정상 결과를 내는지"""
+        built_with = self.manifest.get("model_name")
+        if built_with and model_name and built_with != model_name:
+            raise ValueError(f"인코더 불일치: {built_with} != {model_name}")
+
+        # 근사 중복 제거 버전은 대표 행만 인덱스에 있음
+        if self.faiss_index.ntotal != self.case_store.indexed_count:
+            raise ValueError(
+                f"인덱스/저장소 행 수 불일치: {self.faiss_index.ntotal} != {self.case_store.indexed_count}"
+            )
+
+        query_vec = encoder.encode([SMOKE_QUERY]).astype("float32")
+        if query_vec.shape[1] != self.faiss_index.d:
+            raise ValueError(f"차원 불일치: {query_vec.shape[1]} != {self.faiss_index.d}")
+
+        D, I = self.faiss_index.search(query_vec, 5)
+        positions = I[0][I[0] >= 0]
+        if len(positions) == 0 or not np.isfinite(D[0][: len(positions)]).all():
+            raise ValueError("스모크 쿼리 결과 없음")
+        self.case_store.take(positions, columns=["사건번호", "case_text"])
+
+
+class CorpusManager:
+    """현재 서비스 중인 버전 핸들 + 새 버전 감시/교체"""
+
+    def __init__(self, root: str, encoder, model_name: Optional[str] = None,
+                 source_parquet: Optional[str] = None, poll_interval: float = 30.0):
+        self.root = root
+        self.encoder = encoder
+        self.model_name = model_name
+        self.source_parquet = source_parquet
+        self.poll_interval = poll_interval
+
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+        self._failed = set()
+
+        self.swap_count = 0
+        self.last_error = None
+
+        self._current = self._load_initial()
+
+    # ------------------------
+    # 버전 탐색 / 로드
+    # ------------------------
+    def _versions_dir(self) -> str:
+        return os.path.join(self.root, VERSIONS_DIR)
+
+    def latest_ready_version(self) -> Optional[str]:
+        return latest_ready_version(self.root)
+
+    def _load_initial(self) -> CorpusVersion:
+        version = self.latest_ready_version()
+        if version is None:
+            # 버전 디렉터리가 없으면 기존 단일 디렉터리 구조 사용
+            store = open_case_store(self.root, source_parquet=self.source_parquet)
+            corpus = CorpusVersion(LEGACY_VERSION, self.root, case_store=store)
+        else:
+            corpus = CorpusVersion(version, os.path.join(self._versions_dir(), version))
+        print(f"✅ 판례 코퍼스 버전: {corpus.version} ({len(corpus.case_store)} rows)")
+        return corpus
+
+    def current(self) -> CorpusVersion:
+        """현재 버전 핸들 (요청 시작 시 한 번만 호출해서 끝까지 사용)"""
+        return self._current
+
+    def refresh(self) -> bool:
+        """새 버전이 있으면 로드 → 스모크 쿼리 → 원자적 교체"""
+        with self._lock:
+            version = self.latest_ready_version()
+            if version is None or version == self._current.version or version in self._failed:
+                return False
+
+            print(f"🔄 새 코퍼스 버전 감지: {version} → 백그라운드 로드")
+            try:
+                candidate = CorpusVersion(version, os.path.join(self._versions_dir(), version))
+                candidate.smoke_test(self.encoder, self.model_name)
+            except Exception as e:
+                # 실패한 버전은 다시 시도하지 않음 (새 버전 이름으로 다시 배포)
+                self._failed.add(version)
+                self.last_error = f"{version}: {e}"
+                print(f"❌ 새 버전 검증 실패, 기존 버전 유지: {e}")
+                return False
+
+            previous = self._current
+            self._current = candidate
+            self.swap_count += 1
+            self.last_error = None
+            print(f"✅ 코퍼스 교체: {previous.version} → {candidate.version}")
+            return True
+
+    # ------------------------
+    # 백그라운드 감시
+    # ------------------------
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.refresh()
+                # 같은 버전에 추가된 델타 배치 반영 (신규 판례를 수 분 안에 검색 가능)
+                self._current.delta.refresh()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"⚠️ 코퍼스 감시 오류: {e}")
+
+    def start_watcher(self):
+        """감시 스레드 시작 (fork된 워커마다 시작해야 하므로 앱 startup에서 호출)"""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="corpus-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        corpus = self._current
+        return {
+            "version": corpus.version,
+            "rows": len(corpus.case_store),
+            "index_vectors": corpus.faiss_index.ntotal,
+            "deduplicated": corpus.case_store.main.clusters is not None,
+            "delta": {
+                "rows": len(corpus.delta),
+                "tombstones": len(corpus.delta.tombstones),
+                "batches": len(corpus.delta.applied_batches),
+            },
+            "loaded_at": datetime.fromtimestamp(corpus.loaded_at).isoformat(timespec="seconds"),
+            "manifest": corpus.manifest,
+            "swap_count": self.swap_count,
+            "failed_versions": sorted(self._failed),
+            "last_error": self.last_error,
+        }
+
+
+if __name__ == "__main__":
+    # 노트북 산출물을 새 버전으로 등록
+    # python -m app.corpus <root> <version> <case_index.faiss> <korean_precedents_clean.parquet>
+    import sys
+
+    if len(sys.argv) != 5:
+        print("usage: python -m app.corpus <root> <version> <index.faiss> <clean.parquet>")
+        sys.exit(1)
+    prepare_version(
+        sys.argv[1], sys.argv[2], sys.argv[3], sys.argv[4],
+        model_name="snunlp/KR-SBERT-V40K-klueNLI-augSTS",
+    )
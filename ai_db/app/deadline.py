@@ -0,0 +1,146 @@
+# app/deadline.py
+"""
+요청 단위 지연 예산 (deadline)
+- 호출자가 헤더(X-Deadline-Ms) 또는 요청 필드(deadline_ms)로 전체 지연 예산을 전달
+- 단계(encode / search / postprocess / summary)마다 남은 예산을 확인
+  → 인코딩/검색 후 예산이 없으면 전체 재검색/판결 결과 추출 생략
+  → LLM 단계가 예산 안에 끝나지 않으면 검색 결과 + 로컬/캐시 요약으로 응답 (degraded)
+- 단계별 소요 시간도 기록 (로그)
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+DEADLINE_HEADER = "X-Deadline-Ms"
+
+# 응답 직렬화/전송에 남겨둘 시간
+RESPONSE_RESERVE_MS = 50
+
+
+def resolve_budget_ms(header_value=None, field_value=None, default_ms: float = 0) -> Optional[float]:
+    """헤더 > 요청 필드 > 서버 기본값 (0 이하/없음이면 예산 없음)"""
+    for value in (header_value, field_value, default_ms):
+        if value is None or value == "":
+            continue
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            continue
+        return value if value > 0 else None
+    return None
+
+
+class Deadline:
+
+    def __init__(self, budget_ms: Optional[float] = None):
+        self.start = time.monotonic()
+        self.budget_ms = budget_ms
+        self.stages: Dict[str, float] = {}
+
+    def elapsed_ms(self) -> float:
+        return (time.monotonic() - self.start) * 1000
+
+    def remaining_sec(self, reserve_ms: float = RESPONSE_RESERVE_MS) -> Optional[float]:
+        """남은 예산(초), 예산이 없으면 None"""
+        if self.budget_ms is None:
+            return None
+        return (self.budget_ms - reserve_ms - self.elapsed_ms()) / 1000
+
+    def expired(self, reserve_ms: float = RESPONSE_RESERVE_MS) -> bool:
+        remaining = self.remaining_sec(reserve_ms)
+        return remaining is not None and remaining <= 0
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.stages[name] = round((time.monotonic() - start) * 1000, 1)
+
+    def describe(self) -> str:
+        stages = ", ".join(f"{k} {v:.0f}ms" for k, v in self.stages.items())
+        budget = f"{self.budget_ms:.0f}ms" if self.budget_ms else "없음"
+        return f"{stages} (총 {self.elapsed_ms():.0f}ms / 예산 {budget})"
+
+
+# LLM 호출은 요청 스레드가 아니라 여기서 실행 (요청은 남은 예산만큼만 기다림)
+# - 예산을 넘기면: 시작 전 작업은 취소, 이미 실행 중이면 끝까지 실행 (결과는 캐시에 저장)
+# - 늦은 작업(기다리는 요청이 없는 실행 중 작업) 수에 상한 → Gemini 가 계속 느려도 백로그가 쌓이지 않음
+LLM_THREADS = int(os.getenv("LEGAL_AI_LLM_THREADS", "8"))
+MAX_LATE_JOBS = int(os.getenv("LEGAL_AI_LLM_MAX_LATE_JOBS", str(max(1, LLM_THREADS // 2))))
+
+_pool = None
+_pool_pid = None
+_lock = threading.Lock()
+_outstanding = 0    # 제출됐지만 끝나지 않은 작업
+_late = 0           # 요청이 기다리기를 포기했지만 실행 중인 작업
+_cancelled = 0
+_skipped = 0
+
+
+def _job_done(future: Future) -> None:
+    global _outstanding
+    with _lock:
+        _outstanding -= 1
+
+
+def submit_background(fn: Callable, *args, **kwargs) -> Future:
+    global _pool, _pool_pid, _outstanding
+    if _pool_pid != os.getpid():
+        _pool = ThreadPoolExecutor(
+            max_workers=LLM_THREADS,
+            thread_name_prefix="llm-deadline",
+        )
+        _pool_pid = os.getpid()
+    with _lock:
+        _outstanding += 1
+    future = _pool.submit(fn, *args, **kwargs)
+    future.add_done_callback(_job_done)
+    return future
+
+
+def background_busy() -> bool:
+    """
+    빈 스레드가 없거나 (새 작업은 대기열에서 예산을 다 씀) 늦은 작업이 상한에 도달
+    → 호출자는 제출하지 않고 바로 대체 결과 사용
+    """
+    global _skipped
+    with _lock:
+        busy = _outstanding >= LLM_THREADS or _late >= MAX_LATE_JOBS
+        if busy:
+            _skipped += 1
+        return busy
+
+
+def _late_done(future: Future) -> None:
+    global _late
+    with _lock:
+        _late -= 1
+
+
+def abandon(future: Future) -> None:
+    """예산 초과로 기다리기를 포기한 작업: 시작 전이면 취소, 실행 중이면 늦은 작업으로 집계"""
+    global _late, _cancelled
+    if future.cancel():
+        with _lock:
+            _cancelled += 1
+        return
+    with _lock:
+        _late += 1
+    future.add_done_callback(_late_done)
+
+
+def background_stats() -> Dict:
+    with _lock:
+        return {
+            "threads": LLM_THREADS,
+            "outstanding": _outstanding,
+            "late": _late,
+            "max_late": MAX_LATE_JOBS,
+            "cancelled": _cancelled,
+            "skipped_busy": _skipped,
+        }
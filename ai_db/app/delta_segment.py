@@ -0,0 +1,322 @@
+# app/delta_segment.py
+"""
+증분 업데이트용 델타 세그먼트
+- 신규/변경 판례만 임베딩해서 버전 디렉터리의 delta/<batch_id>/ 에 추가 (pipeline/incremental.py)
+- 서비스는 메인 인덱스와 델타 인덱스를 함께 검색하고, 툼스톤(삭제/변경된 사건번호)은 결과에서 제외
+- 주기적인 병합(merge)이 메인 + 델타를 새 버전으로 압축 → CorpusManager가 무중단 교체
+
+배치 디렉터리 구성 (임시 디렉터리에 쓴 뒤 rename → 반쯤 쓰인 배치는 보이지 않음):
+    delta/<batch_id>/vectors.npy      추가 행 임베딩 (float32)
+    delta/<batch_id>/rows.parquet     추가 행 (저장소와 같은 컬럼 + _content_hash)
+    delta/<batch_id>/tombstones.json  메인/이전 델타에서 제거할 사건번호 목록
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import faiss
+import numpy as np
+import pandas as pd
+
+from app.search_engine import subset_mask
+from app.sections import SECTION_NAMES, section_columns
+
+DELTA_DIR = "delta"
+CONTENT_HASH_COLUMN = "_content_hash"
+
+
+def normalize_text(text) -> str:
+    """해시 비교용 텍스트 정규화 (공백 통일)"""
+    if text is None or (isinstance(text, float) and np.isnan(text)):
+        return ""
+    return re.sub(r"\s+", " ", str(text)).strip()
+
+
+def content_hash(text) -> str:
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def list_batches(delta_dir: str) -> List[str]:
+    """완성된 배치 id 목록 (이름순 = 생성순)"""
+    if not os.path.isdir(delta_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(delta_dir)
+        if not name.startswith(".") and os.path.isdir(os.path.join(delta_dir, name))
+    )
+
+
+def read_batch(delta_dir: str, batch_id: str):
+    batch_dir = os.path.join(delta_dir, batch_id)
+    vectors = np.load(os.path.join(batch_dir, "vectors.npy")).astype("float32")
+    rows = pd.read_parquet(os.path.join(batch_dir, "rows.parquet"))
+    with open(os.path.join(batch_dir, "tombstones.json"), encoding="utf-8") as f:
+        tombstones = json.load(f)
+    return vectors, rows, tombstones
+
+
+class DeltaSegment:
+    """
+    메인 인덱스 위에 얹는 추가 전용(append-only) 세그먼트
+    - 델타 행 위치는 메인 뒤에 이어 붙인 번호 (main_size + j)
+    - 툼스톤은 늘어나기만 하므로 검색 후 take 사이에 배치가 적용돼도 위치가 바뀌지 않음
+    """
+
+    def __init__(self, directory: str, main_store, dim: int, metric_type: int):
+        self.delta_dir = os.path.join(directory, DELTA_DIR)
+        self.main_store = main_store
+        self.main_size = len(main_store)
+        self.metric_type = metric_type
+
+        self.index = faiss.IndexFlat(dim, metric_type)
+        self.rows = pd.DataFrame()
+        self.live = np.zeros(0, dtype=bool)          # 델타 행별 유효 여부 (이후 배치에서 다시 바뀐 행은 False)
+        self.tombstones = set()                       # 제거된 사건번호
+        self.main_dead = np.zeros(self.main_size, dtype=bool)
+        self.case_id_to_delta: Dict[str, int] = {}
+        self.applied_batches: List[str] = []
+
+        self._lock = threading.RLock()
+        self._masks: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.rows) == 0 and not self.tombstones
+
+    def refresh(self) -> int:
+        """새로 완성된 배치를 적용하고 적용한 배치 수를 반환"""
+        new_batches = [b for b in list_batches(self.delta_dir) if b not in self.applied_batches]
+        for batch_id in new_batches:
+            vectors, rows, tombstones = read_batch(self.delta_dir, batch_id)
+            self._apply(batch_id, vectors, rows, tombstones)
+        if new_batches:
+            print(f"✅ 델타 배치 {len(new_batches)}개 적용 (델타 {len(self.rows)}행, 툼스톤 {len(self.tombstones)}건)")
+        return len(new_batches)
+
+    def _apply(self, batch_id: str, vectors: np.ndarray, rows: pd.DataFrame, tombstones: Sequence[str]):
+        with self._lock:
+            # 배치에 다시 들어온 사건번호 = 이전 버전은 제거 대상
+            incoming_ids = [
+                str(c).strip() if pd.notna(c) else ""
+                for c in rows.get("사건번호", pd.Series(dtype=str)).tolist()
+            ]
+            removed = (set(str(c).strip() for c in tombstones) | set(incoming_ids)) - {""}
+
+            for case_id in removed:
+                if case_id in self.case_id_to_delta:
+                    self.live[self.case_id_to_delta.pop(case_id)] = False
+                main_pos = self.main_store.case_id_to_idx.get(case_id)
+                if main_pos is not None:
+                    self.main_dead[main_pos] = True
+                self.tombstones.add(case_id)
+
+            start = len(self.rows)
+            if len(rows) > 0:
+                self.index.add(np.ascontiguousarray(vectors))
+                rows = rows.reset_index(drop=True)
+                self.rows = pd.concat([self.rows, rows], ignore_index=True)
+                self.live = np.concatenate([self.live, np.ones(len(rows), dtype=bool)])
+                for j, case_id in enumerate(incoming_ids):
+                    if case_id:
+                        self.case_id_to_delta[case_id] = start + j
+                        self.tombstones.discard(case_id)
+
+            self.applied_batches.append(batch_id)
+            self._masks = {}
+
+    def search(self, query_vec: np.ndarray, k: int):
+        """델타 인덱스 검색 (유효하지 않은 행 제외), 위치는 main_size + j"""
+        with self._lock:
+            if self.index.ntotal == 0:
+                return (np.zeros((query_vec.shape[0], 0), dtype="float32"),
+                        np.zeros((query_vec.shape[0], 0), dtype="int64"))
+            D, I = self.index.search(query_vec, min(k + int((~self.live).sum()), self.index.ntotal))
+            valid = (I >= 0) & self.live[np.clip(I, 0, None)]
+            D = np.where(valid, D, np.nan)
+            I = np.where(valid, I + self.main_size, -1)
+            return D, I
+
+    def subset_mask(self, case_type: str) -> Optional[np.ndarray]:
+        with self._lock:
+            if case_type not in self._masks:
+                if len(self.rows) == 0:
+                    mask = np.zeros(0, dtype=bool)
+                else:
+                    mask = subset_mask(case_type, self.rows)
+                self._masks[case_type] = mask
+            return self._masks[case_type]
+
+    def take(self, positions: Sequence[int]) -> pd.DataFrame:
+        with self._lock:
+            local = np.asarray(positions, dtype=np.int64) - self.main_size
+            df = self.rows.iloc[local].drop(columns=[CONTENT_HASH_COLUMN], errors="ignore")
+            df.index = np.asarray(positions, dtype=np.int64)
+            return df
+
+
+class SegmentedIndex:
+    """메인 인덱스 + 델타 세그먼트를 하나의 인덱스처럼 검색"""
+
+    def __init__(self, main_index, delta: DeltaSegment):
+        self.main = main_index
+        self.delta = delta
+
+    @property
+    def d(self) -> int:
+        return self.main.d
+
+    @property
+    def ntotal(self) -> int:
+        return self.main.ntotal + len(self.delta)
+
+    @property
+    def metric_type(self) -> int:
+        return self.main.metric_type
+
+    def search(self, query_vec: np.ndarray, k: int):
+        if self.delta.empty:
+            return self.main.search(query_vec, k)
+
+        # 툼스톤으로 빠질 만큼 여유있게 검색 → 살아있는 결과가 k개 안 되면 깊이를 2배씩 늘려 재검색
+        # (행마다 k개가 채워지거나, 인덱스 결과가 끝나면(-1) 중단)
+        k_search = k + min(int(self.delta.main_dead.sum()), k)
+        while True:
+            D_main, I_main = self.main.search(query_vec, k_search)
+            dead = (I_main >= 0) & self.delta.main_dead[np.clip(I_main, 0, None)]
+            live = ((I_main >= 0) & ~dead).sum(axis=1)
+            exhausted = (I_main < 0).any(axis=1)
+            if k_search >= self.main.ntotal or np.all((live >= k) | exhausted):
+                break
+            k_search = min(k_search * 2, max(self.main.ntotal, k))
+        D_main = np.where(dead | (I_main < 0), np.nan, D_main)
+        I_main = np.where(dead, -1, I_main)
+
+        D_delta, I_delta = self.delta.search(query_vec, k)
+
+        D_all = np.concatenate([D_main, D_delta], axis=1)
+        I_all = np.concatenate([I_main, I_delta], axis=1)
+
+        # 거리 기준 병합 (L2는 작을수록, inner product는 클수록 가까움, 빈 자리는 맨 뒤로)
+        if self.metric_type == faiss.METRIC_INNER_PRODUCT:
+            order = np.argsort(np.where(np.isnan(D_all), np.inf, -D_all), axis=1, kind="stable")
+        else:
+            order = np.argsort(np.where(np.isnan(D_all), np.inf, D_all), axis=1, kind="stable")
+        order = order[:, :k]
+
+        D_out = np.take_along_axis(D_all, order, axis=1)
+        I_out = np.take_along_axis(I_all, order, axis=1)
+        empty = np.isnan(D_out)
+        fill = np.finfo("float32").max if self.metric_type != faiss.METRIC_INNER_PRODUCT else -np.finfo("float32").max
+        D_out = np.where(empty, fill, D_out).astype("float32")
+        I_out = np.where(empty, -1, I_out)
+        return D_out, I_out
+
+
+class SegmentedStore:
+    """메인 저장소 + 델타 행을 하나의 저장소처럼 조회 (CaseStore와 같은 인터페이스)"""
+
+    def __init__(self, main_store, delta: DeltaSegment):
+        self.main = main_store
+        self.delta = delta
+        self._id_map_generation = None
+        self._case_id_to_idx = main_store.case_id_to_idx
+        self._masks: Dict[str, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self.main) + len(self.delta)
+
+    @property
+    def columns(self):
+        return self.main.columns
+
+    @property
+    def case_id_to_idx(self) -> Dict[str, int]:
+        generation = len(self.delta.applied_batches)
+        if self.delta.empty:
+            return self.main.case_id_to_idx
+        if generation != self._id_map_generation:
+            merged = {
+                case_id: idx for case_id, idx in self.main.case_id_to_idx.items()
+                if case_id not in self.delta.tombstones
+            }
+            merged.update({
+                case_id: self.delta.main_size + j
+                for case_id, j in self.delta.case_id_to_delta.items()
+            })
+            self._case_id_to_idx = merged
+            self._id_map_generation = generation
+        return self._case_id_to_idx
+
+    @property
+    def indexed_count(self) -> int:
+        # 델타 행은 중복 제거 없이 모두 인덱스에 들어감
+        return self.main.indexed_count + len(self.delta)
+
+    def canonical_position(self, position: int) -> int:
+        if position >= self.delta.main_size:
+            return position
+        return self.main.canonical_position(position)
+
+    def duplicates(self, position: int) -> np.ndarray:
+        """같은 근사 중복 클러스터의 행 위치 (툼스톤 제외, 델타 행은 자기 자신만)"""
+        if position >= self.delta.main_size:
+            return np.array([position], dtype=np.int64)
+        members = self.main.duplicates(position)
+        return members[~self.delta.main_dead[members]]
+
+    def subset_mask(self, case_type: str) -> Optional[np.ndarray]:
+        main_mask = self.main.subset_mask(case_type)
+        if main_mask is None or self.delta.empty:
+            return main_mask
+        generation = len(self.delta.applied_batches)
+        cached = self._masks.get(case_type)
+        if cached is None or cached[0] != generation:
+            mask = np.concatenate([np.asarray(main_mask), self.delta.subset_mask(case_type)])
+            self._masks[case_type] = (generation, mask)
+        return self._masks[case_type][1]
+
+    def take(self, positions: Sequence[int], columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        positions = np.asarray(positions, dtype=np.int64)
+        in_main = positions < self.delta.main_size
+        if in_main.all():
+            return self.main.take(positions, columns=columns)
+
+        parts = []
+        if in_main.any():
+            parts.append(self.main.take(positions[in_main], columns=columns))
+        delta_df = self.delta.take(positions[~in_main])
+        if columns is not None:
+            delta_df = delta_df.reindex(columns=list(columns))
+        parts.append(delta_df)
+        # 원래 순서(유사도 순) 유지
+        return pd.concat(parts).loc[positions]
+
+    def row(self, position: int) -> dict:
+        if position < self.delta.main_size:
+            return self.main.row(position)
+        return self.delta.take([position]).iloc[0].to_dict()
+
+    def section(self, position: int, name: str) -> Optional[str]:
+        if position < self.delta.main_size:
+            return self.main.section(position, name)
+        if name not in SECTION_NAMES:
+            raise ValueError(f"Unknown section: {name}")
+        row = self.row(position)
+        start_col, end_col = section_columns(name)
+        start, end = row.get(start_col), row.get(end_col)
+        if start is None or pd.isna(start) or start < 0:
+            return None
+        return str(row["case_text"]).encode("utf-8")[int(start):int(end)].decode("utf-8")
+
+    def value_counts(self, column: str) -> pd.Series:
+        counts = self.main.value_counts(column)
+        if len(self.delta) == 0:
+            return counts
+        delta_counts = self.delta.rows.loc[self.delta.live, column].value_counts()
+        return counts.add(delta_counts, fill_value=0).sort_values(ascending=False)
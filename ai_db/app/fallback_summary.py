@@ -0,0 +1,67 @@
+# app/fallback_summary.py
+"""
+LLM 없이 구조화된 분석 결과로 만드는 /analyze 요약 (템플릿)
+- 지연 예산 초과(degraded), LLM 오류 시 사용
+"""
+from collections import Counter
+
+import pandas as pd
+
+DISCLAIMER = "본 내용은 법률 자문이 아니며 참고용 분석입니다."
+
+
+def template_analysis_summary(top_cases: pd.DataFrame, overall_risk_level: str,
+                              case_type_label: str = "") -> str:
+    if len(top_cases) == 0:
+        return f"입력하신 사건과 유사한 판례를 찾지 못했습니다. {DISCLAIMER}"
+
+    sentences = []
+    scope = f"{case_type_label} 판례 중 " if case_type_label else ""
+    sentences.append(f"{scope}입력하신 사건과 유사한 판례 {len(top_cases)}건을 찾았습니다.")
+
+    best = top_cases.iloc[0]
+    best_name = str(best.get("사건명", "") or "").strip()
+    court = str(best.get("법원명", "") or "").strip()
+    if best_name:
+        where = f"({court}) " if court else ""
+        sentences.append(
+            f"가장 유사한 판례는 '{best_name}' {where}사건으로, "
+            f"{best.get('similarity_band', '유사')} 수준에 해당합니다."
+        )
+
+    if "decision_result" in top_cases.columns:
+        counts = Counter(str(v) for v in top_cases["decision_result"] if pd.notna(v))
+        known = [(label, n) for label, n in counts.most_common() if label != "판단불명"]
+        if known:
+            dist = ", ".join(f"{label} {n}건" for label, n in known)
+            sentences.append(f"유사 판례의 판단 결과는 {dist}입니다.")
+
+    sentences.append(f"이를 종합한 법적 리스크 수준은 '{overall_risk_level}'으로 평가됩니다.")
+    sentences.append(DISCLAIMER)
+    return " ".join(sentences)
+
+
+def template_combined_summary(similar_cases: list, overall_risk_level: str,
+                              case_type_label: str, predictions: dict) -> str:
+    """/analyze/all 템플릿: 유사 판례 요약 + BERT 예측값 (similar_cases 는 /analyze 응답 형식)"""
+    top_cases = pd.DataFrame([
+        {
+            "사건명": c.get("case_name"),
+            "법원명": c.get("court"),
+            "decision_result": c.get("decision_result"),
+        }
+        for c in similar_cases[:5]
+    ])
+    base = template_analysis_summary(top_cases, overall_risk_level, case_type_label)
+    base = base[:-len(DISCLAIMER)].rstrip()
+
+    sentences = [
+        f"AI 예측 승소율은 {predictions.get('win_rate', 0):.1f}%, "
+        f"위험도는 {predictions.get('risk', 0):.1f}/100입니다."
+    ]
+    if predictions.get("sentence", 0) > 0.1:
+        sentences.append(f"예상 형량은 약 {predictions['sentence']:.1f}년입니다.")
+    if predictions.get("fine", 0) > 10000:
+        sentences.append(f"예상 벌금은 약 {predictions['fine']:,.0f}원입니다.")
+    sentences.append(DISCLAIMER)
+    return " ".join([base] + sentences)
@@ -0,0 +1,88 @@
+# app/local_summary.py
+"""
+로컬 추출 요약 (LLM 호출 없음)
+- 판시사항 / 판결요지 / 주문은 구조화 섹션을 그대로 사용
+- 이유(없으면 전문)는 문장 중심성 점수로 핵심 문장만 추출
+  (다른 문장과 공유하는 단어가 많을수록 문서 전체 내용을 대표한다고 봄)
+- 저장소 생성 시 판례마다 1회 계산해서 local_summary 컬럼에 저장 (app/sections.py)
+"""
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+SENTENCE_SPLIT_RE = re.compile(r"(?<=[.?!])\s+|\n+")
+TOKEN_RE = re.compile(r"[가-힣A-Za-z0-9]{2,}")
+
+MIN_SENTENCE_LEN = 15
+MAX_SENTENCE_LEN = 200
+REASON_SENTENCES = 3
+
+# 섹션별 최대 길이 (글자)
+SECTION_LIMITS = {
+    "판시사항": 300,
+    "판결요지": 400,
+    "주문": 200,
+}
+
+
+def _clean(text: Optional[str]) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def _clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit].rstrip() + "…"
+
+
+def split_sentences(text: str) -> List[str]:
+    sentences = []
+    for part in SENTENCE_SPLIT_RE.split(text or ""):
+        part = _clean(part)
+        if len(part) >= MIN_SENTENCE_LEN:
+            sentences.append(part)
+    return sentences
+
+
+def rank_sentences(sentences: List[str], k: int = REASON_SENTENCES) -> List[str]:
+    """
+    문장 중심성 상위 k개 (원래 순서 유지)
+    점수 = 문장 단어들이 등장하는 문장 수의 평균 (+ 첫 문장 가중치)
+    """
+    if len(sentences) <= k:
+        return sentences
+
+    tokens = [set(TOKEN_RE.findall(s)) for s in sentences]
+    doc_freq = Counter(t for toks in tokens for t in toks)
+
+    scores = []
+    for i, toks in enumerate(tokens):
+        if not toks:
+            scores.append(0.0)
+            continue
+        centrality = sum(doc_freq[t] - 1 for t in toks) / len(toks)
+        lead_bonus = 1.2 if i == 0 else 1.0
+        scores.append(centrality * lead_bonus)
+
+    top = sorted(range(len(sentences)), key=lambda i: scores[i], reverse=True)[:k]
+    return [sentences[i] for i in sorted(top)]
+
+
+def extractive_summary(sections: Dict[str, Optional[str]], full_text: str = "") -> str:
+    """
+    섹션 텍스트 → 요약
+
+    Args:
+        sections: {"판시사항": ..., "판결요지": ..., "주문": ..., "이유": ...} (없는 섹션은 None)
+        full_text: 이유 섹션이 없을 때 핵심 문장을 뽑을 원문
+    """
+    parts = []
+    for name, limit in SECTION_LIMITS.items():
+        text = _clean(sections.get(name))
+        if text:
+            parts.append(f"{name}: {_clip(text, limit)}")
+
+    reason = sections.get("이유") or ("" if parts else full_text)
+    key_sentences = rank_sentences(split_sentences(reason))
+    if key_sentences:
+        parts.append("주요 이유: " + " ".join(_clip(s, MAX_SENTENCE_LEN) for s in key_sentences))
+
+    return "\n".join(parts)
@@ -1,7 +1,14 @@
-from fastapi import FastAPI, HTTPException
+from typing import Optional
+
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware  # ✅ 추가
-from app.schemas import CaseRequest, CaseResponse, CaseSummaryResponse, CaseFullTextResponse
-from app.service import analyze_case, get_case_summary, get_case_full_text
+from app.deadline import background_stats
+from app.schemas import CaseRequest, CaseResponse, CaseSummaryResponse, CaseFullTextResponse, CaseDuplicatesResponse, CaseSectionResponse
+from app.service import (
+    analyze_case, get_case_summary, get_case_full_text, get_case_duplicates, get_case_section,
+    corpus_manager, summary_store, summary_prefetcher, llm_stats,
+    combined_summary, summarize_analysis,  # 게이트웨이 /analyze, /analyze/all 에서 호출 (라우트 없음)
+)
 
 app = FastAPI(title="Legal AI Analysis API")
 
@@ -16,23 +23,82 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 새 코퍼스 버전 감시 시작 (fork된 워커마다 각자 실행)
+@app.on_event("startup")
+def start_corpus_watcher():
+    corpus_manager.start_watcher()
+
 # 1️⃣ /analyze
 @app.post("/analyze", response_model=CaseResponse)
-def analyze(request: CaseRequest):
-    return analyze_case(request)
+def analyze(request: CaseRequest, x_deadline_ms: Optional[str] = Header(None)):
+    return analyze_case(request, deadline_ms=x_deadline_ms)
 
 # 2️⃣ /case/{case_id}/summary
 @app.get("/case/{case_id}/summary", response_model=CaseSummaryResponse)
-def case_summary(case_id: str):
+def case_summary(case_id: str, enrich: bool = False):
     try:
-        return get_case_summary(case_id)
+        return get_case_summary(case_id, enrich)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 # 3️⃣ /case/{case_id}/full
 @app.get("/case/{case_id}/full", response_model=CaseFullTextResponse)
-def case_full(case_id: str):
+def case_full(case_id: str, enrich: bool = False):
+    try:
+        return get_case_full_text(case_id, enrich)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+# 4️⃣ /case/{case_id}/duplicates
+@app.get("/case/{case_id}/duplicates", response_model=CaseDuplicatesResponse)
+def case_duplicates(case_id: str):
     try:
-        return get_case_full_text(case_id)
+        return get_case_duplicates(case_id)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+
+# 5️⃣ /case/{case_id}/section/{section}
+@app.get("/case/{case_id}/section/{section}", response_model=CaseSectionResponse)
+def case_section(case_id: str, section: str):
+    try:
+        return get_case_section(case_id, section)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+# 6️⃣ /metrics
+@app.get("/metrics")
+def metrics():
+    return {
+        "corpus": corpus_manager.stats(),
+        "summary_store": summary_store.stats(),
+        "summary_prefetch": summary_prefetcher.stats(),
+        "llm": llm_stats(),
+        "llm_background": background_stats(),
+    }
+
+
+# -------------------------------
+# 실행: python -m app.main
+# LEGAL_AI_WORKERS > 1 이면 데이터/인덱스/인코더를 먼저 로드한 뒤 워커를 fork
+# -------------------------------
+if __name__ == "__main__":
+    import os
+    import uvicorn
+
+    workers = int(os.getenv("LEGAL_AI_WORKERS", "1"))
+    port = int(os.getenv("LEGAL_AI_PORT", "8000"))
+
+    if workers > 1:
+        from app import service
+        from app.prefork import serve_prefork
+
+        serve_prefork(
+            app,
+            service.model,
+            host="0.0.0.0",
+            port=port,
+            workers=workers,
+            threads_per_worker=int(os.getenv("LEGAL_AI_THREADS_PER_WORKER", "0")) or None,
+        )
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port)
@@ -0,0 +1,90 @@
+# app/prefork.py
+"""
+Preload-then-fork 서빙
+- 부모 프로세스에서 service 모듈(판례 저장소, FAISS 인덱스, 인코더)을 먼저 로드
+- 인코더 가중치는 공유 메모리로 옮긴 뒤 워커 N개를 fork
+- 워커들은 같은 리스닝 소켓을 공유 → mmap 페이지 캐시와 가중치를 함께 사용
+"""
+import gc
+import os
+import signal
+import socket
+import time
+import multiprocessing as mp
+
+import torch
+import uvicorn
+
+
+def _bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _worker_main(app, sock, num_threads):
+    # 재시작된 워커는 부모의 stop 핸들러를 물려받음 → 기본 동작으로 되돌려야 terminate() 로 바로 종료
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    torch.set_num_threads(num_threads)
+    print(f"👷 워커 시작 (pid={os.getpid()}, threads={num_threads})")
+    config = uvicorn.Config(app, log_level="info")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve_prefork(app, encoder, host: str = "0.0.0.0", port: int = 8000,
+                  workers: int = 2, threads_per_worker: int = None):
+    """
+    Args:
+        app: FastAPI 앱 (service 모듈이 이미 import된 상태)
+        encoder: 부모에서 로드한 SentenceTransformer (공유 메모리로 이동)
+        workers: 워커 프로세스 수
+        threads_per_worker: 워커별 torch 스레드 수 (None이면 코어 수 / 워커 수)
+    """
+    if threads_per_worker is None:
+        threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+
+    encoder.eval()
+    encoder.share_memory()
+
+    # fork 전에 객체들을 GC 대상에서 제외 → copy-on-write 최소화
+    gc.collect()
+    gc.freeze()
+
+    sock = _bind_socket(host, port)
+    ctx = mp.get_context("fork")
+
+    def start_worker():
+        proc = ctx.Process(target=_worker_main, args=(app, sock, threads_per_worker))
+        proc.start()
+        return proc
+
+    procs = [start_worker() for _ in range(workers)]
+    print(f"🚀 preload-then-fork 서빙: http://{host}:{port} (workers={workers})")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    try:
+        while not stopping:
+            for i, proc in enumerate(procs):
+                if not proc.is_alive():
+                    print(f"⚠️ 워커 종료 감지 (pid={proc.pid}, exitcode={proc.exitcode}) → 재시작")
+                    procs[i] = start_worker()
+            time.sleep(1.0)
+    finally:
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+        for proc in procs:
+            proc.join(timeout=10)
+        sock.close()
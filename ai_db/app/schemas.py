@@ -9,6 +9,7 @@ from typing import List, Optional
 class CaseRequest(BaseModel):
     case_type: Optional[str] = None  # ✅ Optional로 변경 (UI에서 안 보내도 됨)
     case_text: str                   # 사건 본문 텍스트 (필수)
+    deadline_ms: Optional[int] = None  # 지연 예산 (X-Deadline-Ms 헤더가 우선)
 
 
 # -----------------------------
@@ -26,6 +27,7 @@ class SimilarCase(BaseModel):
     similarity: float                # 0~1
     case_type_label: str             # ✅ 추가: 판례의 사건종류명 (민사/형사/가사 등)
     xai_reason: str                  # 유사도 근거 설명
+    duplicate_count: int = 0         # 근사 중복 판례 수 (/case/{case_id}/duplicates 로 펼쳐보기)
 
 
 class CaseResponse(BaseModel):
@@ -39,6 +41,14 @@ class CaseResponse(BaseModel):
     case_type_confidence: float      # 신뢰도 0.0 ~ 1.0
     case_type_description: str       # 사용자에게 보여줄 설명
 
+    corpus_version: Optional[str] = None  # 검색에 사용한 판례 코퍼스 버전 (캐시 무효화용)
+
+    # ✅ 지연 예산 안에 LLM 요약이 끝나지 않으면 검색 결과 + 템플릿 요약 (degraded=True)
+    #    인코딩/검색에서 이미 예산을 다 쓰면 전체 재검색/판결 결과 추출도 생략 (deadline_encode / deadline_search)
+    degraded: bool = False
+    degraded_reason: Optional[str] = None   # deadline / deadline_encode / deadline_search / circuit_open / llm_error / llm_busy
+    summary_source: Optional[str] = "llm"   # llm / cache / template
+
 
 # -----------------------------
 # /case/{case_id}/summary 관련 모델
@@ -46,6 +56,8 @@ class CaseResponse(BaseModel):
 class CaseSummaryResponse(BaseModel):
     case_id: str
     summary: str                     # 판시사항 / 주문 중심 요약
+    summary_source: Optional[str] = "local"   # local: 저장소 추출 요약, llm: LLM 보강
+    corpus_version: Optional[str] = None
 
 
 # -----------------------------
@@ -55,4 +67,34 @@ class CaseFullTextResponse(BaseModel):
     case_id: str
     case_name: str
     full_text: str                   # 판례 전체 전문
-    summary: Optional[str] = ""      # ✅ 추가: 요약도 함께 반환
\ No newline at end of file
+    summary: Optional[str] = ""      # ✅ 추가: 요약도 함께 반환
+    summary_source: Optional[str] = "local"
+    corpus_version: Optional[str] = None
+
+
+# -----------------------------
+# /case/{case_id}/duplicates 관련 모델
+# -----------------------------
+class DuplicateCase(BaseModel):
+    case_id: Optional[str]
+    case_name: str
+    court: str
+    decision_date: Optional[str] = None  # 선고일자_norm
+    is_canonical: bool               # 검색 인덱스에 들어간 대표 판례 여부
+
+
+class CaseDuplicatesResponse(BaseModel):
+    case_id: str
+    canonical_case_id: Optional[str]  # 클러스터 대표 판례 사건번호
+    duplicates: List[DuplicateCase]   # 요청한 판례를 제외한 같은 클러스터 판례
+    corpus_version: Optional[str] = None
+
+
+# -----------------------------
+# /case/{case_id}/section/{section} 관련 모델
+# -----------------------------
+class CaseSectionResponse(BaseModel):
+    case_id: str
+    section: str                     # 판시사항 / 판결요지 / 주문 / 이유
+    text: str
+    corpus_version: Optional[str] = None
@@ -2,47 +2,59 @@
 """
 사건 유형별 Subset 검색 엔진
 """
+import faiss
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
-def get_search_subset(case_type: str, df: pd.DataFrame) -> pd.DataFrame:
+# 노동은 민사/일반행정에 섞여있으므로 키워드 필터 필수
+LABOR_KEYWORDS = r"근로자|임금|해고|퇴직금|부당해고|근로계약|노동위원회|산재|근로기준법"
+
+# 사전 계산(비트맵)하는 subset 유형
+SUBSET_CASE_TYPES = ("형사", "가사", "노동")
+
+
+def subset_mask(case_type: str, df: pd.DataFrame) -> Optional[np.ndarray]:
     """
-    사건 유형에 따라 검색 대상 subset을 반환
-    
+    사건 유형에 해당하는 행을 True로 표시한 bool 배열 ("전체"/기타는 None)
+
     Args:
         case_type: "형사", "가사", "노동", "전체" 중 하나
-        df: 전체 판례 DataFrame
-        
-    Returns:
-        필터링된 DataFrame
+        df: 사건종류명, case_text 컬럼을 가진 DataFrame (전체 또는 배치 일부)
     """
-    if case_type == "형사":
-        # 사건종류명이 "형사"인 것만
-        subset = df[df["사건종류명"] == "형사"]
-        print(f"✅ 형사 subset: {len(subset)} rows")
-        return subset
-    
-    if case_type == "가사":
-        # 사건종류명이 "가사"인 것만
-        subset = df[df["사건종류명"] == "가사"]
-        print(f"✅ 가사 subset: {len(subset)} rows")
-        return subset
-    
+    if case_type in ("형사", "가사"):
+        # 사건종류명이 해당 유형인 것만
+        return (df["사건종류명"] == case_type).to_numpy()
+
     if case_type == "노동":
-        # 노동은 민사/일반행정에 섞여있으므로 키워드 필터 필수
-        labor_keywords = r"근로자|임금|해고|퇴직금|부당해고|근로계약|노동위원회|산재|근로기준법"
-        
-        subset = df[
+        return (
             (df["사건종류명"].isin(["민사", "일반행정"])) &
             (df["case_text"].str.contains(
-                labor_keywords,
+                LABOR_KEYWORDS,
                 regex=True,
                 na=False,
                 case=False
             ))
-        ]
-        print(f"✅ 노동 subset: {len(subset)} rows")
+        ).to_numpy()
+
+    return None
+
+
+def get_search_subset(case_type: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    사건 유형에 따라 검색 대상 subset을 반환
+    
+    Args:
+        case_type: "형사", "가사", "노동", "전체" 중 하나
+        df: 전체 판례 DataFrame
+        
+    Returns:
+        필터링된 DataFrame
+    """
+    mask = subset_mask(case_type, df)
+    if mask is not None:
+        subset = df[mask]
+        print(f"✅ {case_type} subset: {len(subset)} rows")
         return subset
     
     # "전체" 또는 기타
@@ -50,13 +62,38 @@ def get_search_subset(case_type: str, df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+def read_index_mmap(path: str):
+    """
+    FAISS 인덱스를 메모리 맵 모드로 열기
+    - 워커마다 인덱스를 private 메모리로 복사하지 않고 OS 페이지 캐시를 공유
+    - Flat 인덱스의 mmap(IO_FLAG_MMAP_IFC)은 faiss 1.8+ 에서 지원, 그 이전 버전은 일반 로드로 대체
+    """
+    flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None) or faiss.IO_FLAG_MMAP
+    try:
+        index = faiss.read_index(path, flag)
+        print(f"✅ FAISS 인덱스 mmap 로드: {path} ({index.ntotal} vectors)")
+        return index
+    except RuntimeError as e:
+        print(f"⚠️ mmap 로드 실패 → 일반 로드로 대체: {e}")
+        return faiss.read_index(path)
+
+
+def _normalize_distances(distances: np.ndarray, metric_type: int = faiss.METRIC_L2) -> np.ndarray:
+    """Distance → 0~1 similarity (min-max 정규화, inner product 인덱스는 클수록 유사)"""
+    d_min, d_max = distances.min(), distances.max()
+    if metric_type == faiss.METRIC_INNER_PRODUCT:
+        return ((distances - d_min) / (d_max - d_min + 1e-8)).clip(0, 1)
+    return ((d_max - distances) / (d_max - d_min + 1e-8)).clip(0, 1)
+
+
 def search_with_fallback(
     query_vec: np.ndarray,
     faiss_index,
-    df_full: pd.DataFrame,
+    case_store,
     case_type: str,
     top_k: int = 10,
-    fallback_threshold: int = 3
+    fallback_threshold: int = 3,
+    allow_fallback: bool = True
 ) -> pd.DataFrame:
     """
     Subset 검색 + Fallback 로직
@@ -64,53 +101,47 @@ def search_with_fallback(
     Args:
         query_vec: 쿼리 임베딩 벡터
         faiss_index: FAISS 인덱스
-        df_full: 전체 판례 DataFrame
+        case_store: 판례 저장소 (CaseStore, 인덱스 위치 = 저장소 행 위치)
         case_type: 추정된 사건 유형
         top_k: 최종 반환할 결과 수
         fallback_threshold: 이 개수 미만이면 전체 검색으로 확장
+        allow_fallback: False면 전체 재검색 생략 (지연 예산을 이미 다 쓴 요청)
         
     Returns:
-        검색 결과 DataFrame
+        검색 결과 DataFrame (index = 저장소 행 위치)
     """
-    # 1️⃣ Subset 결정
-    subset_df = get_search_subset(case_type, df_full)
+    # 1️⃣ Subset 결정 (사전 계산된 비트맵, 전체 검색이면 None)
+    mask = case_store.subset_mask(case_type)
     
     # 2️⃣ FAISS 검색 (여유있게)
     D, I = faiss_index.search(query_vec, top_k * 5)
     
-    # 3️⃣ Subset mask 적용
-    candidates = df_full.iloc[I[0]].copy()
-    filtered = candidates[candidates.index.isin(subset_df.index)]
+    # 3️⃣ Subset mask 적용 (필요한 행만 저장소에서 꺼냄)
+    keep = I[0] >= 0
+    if mask is not None:
+        keep &= mask[np.where(keep, I[0], 0)]
+    positions = I[0][keep]
     
-    print(f"📊 Subset 검색 결과: {len(filtered)} 건")
+    print(f"📊 Subset 검색 결과: {len(positions)} 건")
     
     # 4️⃣ Fallback: 결과가 너무 적으면 전체 검색
-    if len(filtered) < fallback_threshold and case_type != "전체":
-        print(f"⚠️ 결과 부족 ({len(filtered)} < {fallback_threshold}) → 전체 검색으로 확장")
+    if len(positions) < fallback_threshold and case_type != "전체" and allow_fallback:
+        print(f"⚠️ 결과 부족 ({len(positions)} < {fallback_threshold}) → 전체 검색으로 확장")
         
         # 전체 다시 검색
         D_full, I_full = faiss_index.search(query_vec, top_k * 3)
-        filtered = df_full.iloc[I_full[0]].copy()
+        similarity = _normalize_distances(D_full[0], faiss_index.metric_type)
         
-        # Distance 정규화
-        d_min, d_max = D_full[0].min(), D_full[0].max()
-        filtered["similarity"] = ((d_max - D_full[0]) / (d_max - d_min + 1e-8)).clip(0, 1)
-        
-        return filtered.head(top_k)
+        filtered = case_store.take(I_full[0][:top_k])
+        filtered["similarity"] = similarity[:top_k]
+        return filtered
     
-    # 5️⃣ 정상 반환 (similarity 계산)
-    if len(filtered) > 0:
-        d_min, d_max = D[0].min(), D[0].max()
-        
-        # 원본 인덱스 기준으로 distance 매핑
-        distance_map = dict(zip(I[0], D[0]))
-        filtered["_distance"] = filtered.index.map(distance_map)
-        filtered["similarity"] = (
-            (d_max - filtered["_distance"]) / (d_max - d_min + 1e-8)
-        ).clip(0, 1)
-        filtered = filtered.drop(columns=["_distance"])
+    # 5️⃣ 정상 반환 (similarity 계산, 정규화 범위는 후보 전체 기준)
+    similarity = _normalize_distances(D[0], faiss_index.metric_type)[keep]
     
-    return filtered.head(top_k)
+    filtered = case_store.take(positions[:top_k])
+    filtered["similarity"] = similarity[:top_k]
+    return filtered
 
 
 def format_search_results(results_df: pd.DataFrame, case_type: str, confidence: float) -> List[Dict[str, Any]]:
@@ -0,0 +1,154 @@
+# app/sections.py
+"""
+판례 구조화 섹션 + 판결 결과 라벨 (수집/저장소 생성 시 1회 계산)
+- case_text 안의 판시사항 / 판결요지 / 주문 / 이유 위치를 UTF-8 바이트 오프셋으로 저장
+  → 서비스는 mmap 저장소에서 해당 구간 바이트만 읽음 (전문 전체를 읽지 않음)
+- 판결 결과(decision_result)와 위험도(risk_score)도 컬럼으로 저장
+  → /analyze 후처리가 정규식 대신 컬럼 읽기
+- 섹션 기반 로컬 추출 요약(local_summary, app/local_summary.py)도 함께 저장
+  → /case/{case_id}/summary 는 LLM 호출 없이 컬럼 조회
+
+case_text 구성 (pipeline/ingest.py):
+    [사건명] ...\\n[판시사항] ...\\n[판결요지] ...\\n[전문] ... 【주 문】 ... 【이 유】 ...
+"""
+import re
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from app.local_summary import extractive_summary
+
+SECTION_NAMES = ("판시사항", "판결요지", "주문", "이유")
+
+DECISION_RISK_MAP = {
+    "상고기각": 0.85,
+    "기각": 0.8,
+    "파기환송": 0.5,
+    "인용": 0.2,
+    "판단불명": 0.5
+}
+
+DECISION_PATTERNS = {
+    "파기환송": re.compile(r"(파기|파훼).*(환송|차려)"),
+    "상고기각": re.compile(r"상고.*기각"),
+    "인용": re.compile(r"청구.*인용|원고.*승소"),
+    "기각": re.compile(r"청구.*기각"),
+}
+
+_ORDER_RE = re.compile(r"【주\s*문】(.+?)(【이\s*유】|$)", re.DOTALL)
+_REASON_RE = re.compile(r"【이\s*유】")
+_LABEL_RE = re.compile(r"(?:^|\n)\[(사건명|판시사항|판결요지|전문)\] ")
+
+
+def section_columns(name: str) -> Tuple[str, str]:
+    return f"{name}_start", f"{name}_end"
+
+
+# 저장소에 추가되는 컬럼 (섹션 오프셋은 없으면 -1)
+SECTION_FIELDS = [
+    pa.field(col, pa.int32()) for name in SECTION_NAMES for col in section_columns(name)
+] + [
+    pa.field("decision_result", pa.string()),
+    pa.field("risk_score", pa.float32()),
+    pa.field("local_summary", pa.string()),
+]
+
+
+def extract_decision_result(case_text: str) -> str:
+    """주문(없으면 전체)에서 판결 결과 라벨 추출"""
+    if not case_text:
+        return "판단불명"
+
+    order_match = _ORDER_RE.search(case_text)
+    target = order_match.group(1) if order_match else case_text
+
+    for label, pattern in DECISION_PATTERNS.items():
+        if pattern.search(target):
+            return label
+    return "판단불명"
+
+
+def _char_spans(text: str) -> Dict[str, Tuple[int, int]]:
+    """섹션별 (시작, 끝) 문자 위치"""
+    spans = {}
+
+    # [판시사항] / [판결요지]: 라벨 뒤부터 다음 라벨 직전까지
+    labels = list(_LABEL_RE.finditer(text))
+    for i, m in enumerate(labels):
+        if m.group(1) in ("판시사항", "판결요지"):
+            end = labels[i + 1].start() if i + 1 < len(labels) else len(text)
+            spans[m.group(1)] = (m.end(), end)
+
+    # 【주 문】 ~ 【이 유】, 【이 유】 ~ 끝
+    order = _ORDER_RE.search(text)
+    if order:
+        spans["주문"] = (order.start(1), order.end(1))
+    reason = _REASON_RE.search(text, order.end(1) if order else 0)
+    if reason:
+        spans["이유"] = (reason.end(), len(text))
+    return spans
+
+
+def parse_sections(text) -> dict:
+    """
+    한 판례의 섹션 바이트 오프셋 + 판결 결과/위험도 + 로컬 요약
+
+    Returns:
+        {"판시사항_start": ..., "판시사항_end": ..., ..., "decision_result": ..., "risk_score": ...,
+         "local_summary": ...}
+    """
+    text = "" if text is None or (isinstance(text, float) and np.isnan(text)) else str(text)
+    spans = _char_spans(text)
+
+    out = {}
+    for name in SECTION_NAMES:
+        start_col, end_col = section_columns(name)
+        if name in spans:
+            start, end = spans[name]
+            # 문자 위치 → UTF-8 바이트 위치 (저장소 버퍼를 바로 잘라 읽기 위해)
+            byte_start = len(text[:start].encode("utf-8"))
+            out[start_col] = byte_start
+            out[end_col] = byte_start + len(text[start:end].encode("utf-8"))
+        else:
+            out[start_col] = out[end_col] = -1
+
+    label = extract_decision_result(text)
+    out["decision_result"] = label
+    out["risk_score"] = DECISION_RISK_MAP.get(label, 0.5)
+    out["local_summary"] = extractive_summary(
+        {name: text[start:end] for name, (start, end) in spans.items()}, full_text=text
+    )
+    return out
+
+
+def section_frame(texts: Iterable) -> pd.DataFrame:
+    """텍스트 목록 → 섹션/판결 결과 컬럼 DataFrame"""
+    df = pd.DataFrame([parse_sections(t) for t in texts], columns=[f.name for f in SECTION_FIELDS])
+    for field in SECTION_FIELDS:
+        df[field.name] = df[field.name].astype(field.type.to_pandas_dtype())
+    return df
+
+
+def with_section_schema(schema: pa.Schema) -> pa.Schema:
+    """섹션 컬럼이 없는 스키마에 추가"""
+    for field in SECTION_FIELDS:
+        if field.name not in schema.names:
+            schema = schema.append(field)
+    return schema
+
+
+def add_section_columns(batch: pa.RecordBatch, schema: Optional[pa.Schema] = None) -> pa.RecordBatch:
+    """배치에 섹션 컬럼이 없으면 case_text를 파싱해서 추가"""
+    if all(f.name in batch.schema.names for f in SECTION_FIELDS):
+        return batch if schema is None else batch.select(schema.names)
+
+    parsed = section_frame(batch.column("case_text").to_pylist())
+    arrays = {name: batch.column(name) for name in batch.schema.names}
+    for field in SECTION_FIELDS:
+        if field.name not in arrays:
+            arrays[field.name] = pa.array(parsed[field.name].to_numpy(), type=field.type)
+
+    schema = schema or with_section_schema(batch.schema)
+    return pa.RecordBatch.from_arrays([arrays[name] for name in schema.names], schema=schema)
@@ -4,91 +4,117 @@
 - case_type이 있으면 그대로 사용 (하위 호환)
 - case_type이 없으면 자동 분류
 """
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import numpy as np
 import pandas as pd
-import faiss
-import re
-from sentence_transformers import SentenceTransformer
-from app.llm.summarizer import generate_case_summary
-from app.schemas import CaseSummaryResponse, CaseFullTextResponse
-from app.classifier import infer_case_type, get_case_type_label, get_case_type_description
-from app.search_engine import get_search_subset, search_with_fallback
+from app.llm.summarizer import (
+    CircuitOpenError, generate_case_summary, generate_combined_summary, generate_single_case_summary,
+    llm_available, llm_stats
+)
+from app.llm.gemini_client import MODEL_NAME as SUMMARY_MODEL_NAME
+from app.schemas import CaseSummaryResponse, CaseFullTextResponse, CaseDuplicatesResponse, DuplicateCase, CaseSectionResponse
+from app.bert_encoder import BertEncoder, is_bert_encoder, load_encoder
+from app.classifier import infer_case_type, infer_case_type_from_probs, get_case_type_label, get_case_type_description
+from app.search_engine import search_with_fallback
+from app.corpus import CorpusManager
+from app.delta_segment import content_hash
+from app.summary_store import SUMMARY_STORE_FILE, SummaryStore
+from app.summary_prefetch import SummaryPrefetcher
+from app.deadline import Deadline, abandon, background_busy, resolve_budget_ms, submit_background
+from app.fallback_summary import template_analysis_summary, template_combined_summary
+from app.sections import DECISION_RISK_MAP, SECTION_NAMES, extract_decision_result, parse_sections
 
 # ------------------------
 # 0️⃣ 데이터 로드
 # ------------------------
+# 아티팩트 루트: versions/<version>/ (case_index.faiss + cases.arrow + subset 비트맵 + manifest.json)
+# versions/ 가 없으면 루트 자체를 단일 버전으로 사용 (cases.arrow가 없으면 원본 parquet에서 최초 1회 변환)
+ARTIFACT_DIR = os.getenv("LEGAL_AI_ARTIFACT_DIR", r"C:\LawAI\notebooks")
+SOURCE_PARQUET = os.getenv(
+    "LEGAL_AI_SOURCE_PARQUET",
+    os.path.join(ARTIFACT_DIR, "korean_precedents_clean.parquet")
+)
+# "legal-bert:<ai_hj 체크포인트 폴더>" 면 MultiTaskLegalBERT 인코더 (app/bert_encoder.py)
+# → 인덱스도 같은 이름으로 빌드해야 함 (manifest model_name 검사)
+EMBEDDING_MODEL_NAME = os.getenv("LEGAL_AI_EMBEDDING_MODEL", "snunlp/KR-SBERT-V40K-klueNLI-augSTS")
+
+# 판례 요약은 저장소의 로컬 추출 요약(local_summary)을 기본으로 사용
+# 1이면 /case 요약 요청마다 LLM 보강 (요청별로는 enrich=true)
+SUMMARY_ENRICH = os.getenv("LEGAL_AI_SUMMARY_ENRICH", "0") == "1"
+# LLM 요약 저장소 (pipeline/precompute_summaries.py 가 미리 채움, enrich 결과도 저장)
+SUMMARY_STORE_PATH = os.getenv(
+    "LEGAL_AI_SUMMARY_STORE",
+    os.path.join(ARTIFACT_DIR, SUMMARY_STORE_FILE)
+)
+# /analyze 유사 판례 요약 선행 생성 스레드 수 (0이면 사용 안 함)
+# 유사 판례 5건이 동시에 요청되어야 llm 배처가 프롬프트 하나로 묶음
+SUMMARY_PREFETCH_WORKERS = int(os.getenv("LEGAL_AI_SUMMARY_PREFETCH_WORKERS", "5"))
+# 생성 중인 요약을 조회 요청이 기다리는 최대 시간 (초과하면 로컬 요약)
+SUMMARY_WAIT_SEC = float(os.getenv("LEGAL_AI_SUMMARY_WAIT_SEC", "20"))
+# /analyze 기본 지연 예산 (ms, 0이면 없음) - 요청별로는 X-Deadline-Ms 헤더 / deadline_ms 필드
+ANALYZE_BUDGET_MS = float(os.getenv("LEGAL_AI_ANALYZE_BUDGET_MS", "0"))
+ANALYSIS_SUMMARY_CACHE_SIZE = 512
+
 print("\n" + "=" * 80)
 print("🚀 서비스 초기화 중...")
 print("=" * 80)
 
-df_analysis = pd.read_parquet(
-    r"C:\LawAI\notebooks\korean_precedents_embedded.parquet",
-    engine="pyarrow"
+model = load_encoder(EMBEDDING_MODEL_NAME)
+
+# ✅ 버전별 판례 코퍼스 (mmap 인덱스 + mmap Arrow 저장소), 새 버전은 무중단 교체
+corpus_manager = CorpusManager(
+    ARTIFACT_DIR,
+    encoder=model,
+    model_name=EMBEDDING_MODEL_NAME,
+    source_parquet=SOURCE_PARQUET,
+    poll_interval=float(os.getenv("LEGAL_AI_CORPUS_POLL_SEC", "30")),
 )
 
-df_full = pd.read_csv(
-    r"C:\LawAI\notebooks\korean_precedents_clean.csv"
+summary_store = SummaryStore(
+    SUMMARY_STORE_PATH,
+    SUMMARY_MODEL_NAME,
+    view_flush_sec=float(os.getenv("LEGAL_AI_VIEW_FLUSH_SEC", "10")),
 )
 
-print(f"✅ Parquet 로드: {len(df_analysis)} rows")
-print(f"✅ CSV 로드: {len(df_full)} rows")
 
-# ✅ 사건번호 → 인덱스 매핑
-case_id_to_idx = {}
-for idx, row in df_full.iterrows():
-    case_num = row.get("사건번호")
-    if pd.notna(case_num):
-        normalized = str(case_num).strip()
-        if normalized:
-            case_id_to_idx[normalized] = idx
+summary_prefetcher = SummaryPrefetcher(
+    summary_store,
+    generate_single_case_summary,
+    workers=SUMMARY_PREFETCH_WORKERS,
+)
 
-print(f"✅ case_id_to_idx 크기: {len(case_id_to_idx)}")
+_corpus = corpus_manager.current()
+print(f"✅ case_id_to_idx 크기: {len(_corpus.case_id_to_idx)}")
 
 # 사건종류명 분포 출력
 print("\n📊 사건종류명 분포:")
-print(df_analysis["사건종류명"].value_counts().head(10))
+print(_corpus.case_store.value_counts("사건종류명").head(10))
 print("=" * 80 + "\n")
 
-faiss_index = faiss.read_index(
-    r"C:\LawAI\notebooks\case_index.faiss"
-)
-
-model = SentenceTransformer(
-    "snunlp/KR-SBERT-V40K-klueNLI-augSTS"
-)
-
 # ------------------------
-# 판결 결과 추출
+# 판결 결과: 저장소 생성 시 미리 계산된 컬럼 사용 (app/sections.py)
+# 컬럼이 없는 행(구버전 저장소)만 그 자리에서 계산
 # ------------------------
-def extract_decision_result(case_text: str) -> str:
-    if not case_text:
-        return "판단불명"
-
-    order_match = re.search(
-        r"【주\s*문】(.+?)(【이\s*유】|$)",
-        case_text,
-        re.DOTALL
-    )
-    target = order_match.group(1) if order_match else case_text
-
-    patterns = {
-        "파기환송": r"(파기|파훼).*(환송|차려)",
-        "상고기각": r"상고.*기각",
-        "인용": r"청구.*인용|원고.*승소",
-        "기각": r"청구.*기각",
-    }
-
-    for label, pattern in patterns.items():
-        if re.search(pattern, target):
-            return label
-    return "판단불명"
-
-DECISION_RISK_MAP = {
-    "상고기각": 0.85,
-    "기각": 0.8,
-    "파기환송": 0.5,
-    "인용": 0.2,
-    "판단불명": 0.5
-}
+def fill_decision_columns(results: pd.DataFrame, extract: bool = True) -> pd.DataFrame:
+    """extract=False: 본문에서 판결 결과를 추출하지 않고 "판단불명" (지연 예산을 이미 다 쓴 요청)"""
+    if "decision_result" not in results.columns:
+        results["decision_result"] = None
+    missing = results["decision_result"].isna()
+    if missing.any():
+        if extract:
+            results.loc[missing, "decision_result"] = results.loc[missing, "case_text"].apply(extract_decision_result)
+        else:
+            results.loc[missing, "decision_result"] = "판단불명"
+
+    if "risk_score" not in results.columns:
+        results["risk_score"] = None
+    results["risk_score"] = results["risk_score"].astype(float).fillna(
+        results["decision_result"].map(DECISION_RISK_MAP)
+    ).fillna(0.5)
+    return results
 
 def similarity_band(sim: float) -> str:
     if sim >= 0.85:
@@ -100,12 +126,172 @@ def similarity_band(sim: float) -> str:
     else:
         return "참고 수준"
 
+# ------------------------
+# /analyze 종합 요약
+# - 남은 지연 예산 안에서만 LLM 결과를 기다림, 넘기면 템플릿 요약으로 응답 (degraded)
+# - 예산을 넘긴 LLM 호출은 시작 전이면 취소, 실행 중이면 끝까지 실행되고 결과는 캐시
+#   → 같은 사건/같은 검색 결과로 다시 요청하면 캐시된 LLM 요약 사용
+# - LLM 스레드가 모두 차 있거나 늦은 작업이 상한이면 예산이 있는 요청은 바로 템플릿 요약
+# ------------------------
+_analysis_summary_cache = OrderedDict()
+_analysis_summary_lock = threading.Lock()
+
+
+def _cache_analysis_summary(key: str, future) -> None:
+    if future.cancelled() or future.exception() is not None:
+        return
+    with _analysis_summary_lock:
+        _analysis_summary_cache[key] = future.result()
+        _analysis_summary_cache.move_to_end(key)
+        while len(_analysis_summary_cache) > ANALYSIS_SUMMARY_CACHE_SIZE:
+            _analysis_summary_cache.popitem(last=False)
+
+
+def _summary_within_deadline(key: str, fallback: str, deadline: Deadline, generate, **kwargs):
+    """
+    Returns:
+        (요약, 출처, degraded 사유) - 출처는 "llm" / "cache" / "template"
+    """
+    with _analysis_summary_lock:
+        cached = _analysis_summary_cache.get(key)
+    if cached is not None:
+        return cached, "cache", None
+
+    if deadline.expired():
+        return fallback, "template", "deadline"
+    if not llm_available():
+        # Gemini 장애 중 (서킷 브레이커 OPEN) → 기다리지 않고 바로 템플릿 요약
+        return fallback, "template", "circuit_open"
+    if deadline.budget_ms is not None and background_busy():
+        # 제출해도 대기열에서 예산을 넘길 가능성이 큼 → Gemini 백로그를 늘리지 않음
+        return fallback, "template", "llm_busy"
+
+    future = submit_background(generate, **kwargs)
+    future.add_done_callback(lambda f: _cache_analysis_summary(key, f))
+    try:
+        return future.result(timeout=deadline.remaining_sec()), "llm", None
+    except FutureTimeoutError:
+        abandon(future)
+        print("⏱️ 요약 지연 예산 초과 → 템플릿 요약 (시작 전이면 취소, 실행 중이면 백그라운드에서 계속)")
+        return fallback, "template", "deadline"
+    except CircuitOpenError:
+        return fallback, "template", "circuit_open"
+    except Exception as e:
+        print(f"⚠️ 요약 생성 오류: {e}")
+        return fallback, "template", "llm_error"
+
+
+def analysis_summary(case_text: str, top_cases: pd.DataFrame, overall_risk: str,
+                     type_label: str, deadline: Deadline):
+    key = "|".join(
+        [content_hash(case_text), overall_risk] + [str(v) for v in top_cases.get("사건번호", [])]
+    )
+    return _summary_within_deadline(
+        key,
+        template_analysis_summary(top_cases, overall_risk, type_label),
+        deadline,
+        generate_case_summary,
+        user_case=case_text,
+        results_df=top_cases,
+        overall_risk_level=overall_risk
+    )
+
+
+def summarize_analysis(case_text: str, analysis: dict, deadline_ms=None) -> dict:
+    """
+    analyze_case(..., summarize=False) 응답 → /analyze 종합 요약
+    (게이트웨이가 검색은 cpu 입장 풀, LLM 대기는 io 입장 풀에서 따로 실행)
+    """
+    deadline = Deadline(resolve_budget_ms(deadline_ms, None, ANALYZE_BUDGET_MS))
+    top_cases = pd.DataFrame([
+        {
+            "사건명": c.get("case_name"),
+            "법원명": c.get("court"),
+            "사건번호": c.get("case_number"),
+            "판결유형": c.get("decision_type"),
+            "decision_result": c.get("decision_result"),
+            "similarity_band": similarity_band(c.get("similarity", 0)),
+            "xai_reason": c.get("xai_reason"),
+        }
+        for c in analysis["similar_cases"]
+    ])
+    summary, summary_source, degraded_reason = analysis_summary(
+        case_text, top_cases, analysis["overall_risk_level"], analysis.get("case_type_label", ""), deadline
+    )
+    # 검색 단계에서 이미 예산을 다 쓴 경우 그 사유를 유지
+    degraded_reason = analysis.get("degraded_reason") or degraded_reason
+    return {
+        "summary": summary,
+        "summary_source": summary_source,
+        "degraded": degraded_reason is not None,
+        "degraded_reason": degraded_reason,
+    }
+
+
+def combined_summary(case_text: str, analysis: dict, predictions: dict, deadline_ms=None) -> dict:
+    """
+    /analyze/all 종합 설명 (판례 검색 결과 + BERT 예측값 → LLM 호출 1번)
+    analysis 는 analyze_case(..., summarize=False) 응답, predictions 는 ai_hj predict_bert 결과
+    """
+    deadline = Deadline(resolve_budget_ms(deadline_ms, None, ANALYZE_BUDGET_MS))
+    similar_cases = analysis["similar_cases"]
+    overall_risk = analysis["overall_risk_level"]
+
+    prediction_key = ",".join(
+        f"{predictions.get(k, 0):.1f}" for k in ("win_rate", "sentence", "fine", "risk")
+    )
+    key = "|".join(
+        ["combined", content_hash(case_text), overall_risk, prediction_key]
+        + [str(c.get("case_number")) for c in similar_cases[:5]]
+    )
+    summary, summary_source, degraded_reason = _summary_within_deadline(
+        key,
+        template_combined_summary(similar_cases, overall_risk, analysis.get("case_type_label", ""), predictions),
+        deadline,
+        generate_combined_summary,
+        user_case=case_text,
+        similar_cases=similar_cases,
+        overall_risk_level=overall_risk,
+        predictions=predictions
+    )
+    # 검색 단계에서 이미 예산을 다 쓴 경우 그 사유를 유지
+    degraded_reason = analysis.get("degraded_reason") or degraded_reason
+    return {
+        "summary": summary,
+        "summary_source": summary_source,
+        "degraded": degraded_reason is not None,
+        "degraded_reason": degraded_reason,
+    }
+
 # ------------------------
 # 1️⃣ /analyze
 # ------------------------
-def analyze_case(request):
+def shared_query_vector(shared, corpus):
+    """
+    ai_hj predict_shared 결과의 검색 벡터를 쓸 수 있으면 (1, dim) 배열, 아니면 None
+    인덱스가 같은 BERT 인코더로 만들어졌을 때만 사용 (다른 인코더 벡터로 검색하면 결과가 무의미)
+    """
+    if not shared or shared.get("embedding") is None:
+        return None
+    if not is_bert_encoder(corpus.manifest.get("model_name")):
+        print("⚠️ 인덱스가 BERT 인코더로 빌드되지 않음 → 공유 벡터 대신 자체 인코딩")
+        return None
+    query_vec = np.asarray([shared["embedding"]], dtype="float32")
+    if query_vec.shape[1] != corpus.faiss_index.d:
+        print(f"⚠️ 공유 벡터 차원 불일치 ({query_vec.shape[1]} != {corpus.faiss_index.d}) → 자체 인코딩")
+        return None
+    return query_vec
+
+
+def analyze_case(request, deadline_ms=None, summarize=True, shared=None, prefetch=True):
+    """
+    summarize=False: 검색/후처리만 (요약은 게이트웨이가 따로 생성)
+    prefetch=False: 유사 판례 요약 선행 생성 생략 (/analyze/all 은 LLM 호출 1번만)
+    shared: ai_hj predict_shared 결과 (embedding, case_type_probs) → 인코딩/분류 forward 생략
+    """
     import time
     start = time.time()
+    deadline = Deadline(resolve_budget_ms(deadline_ms, getattr(request, "deadline_ms", None), ANALYZE_BUDGET_MS))
     
     print("\n" + "=" * 80)
     print("🚀 analyze_case START")
@@ -115,12 +301,34 @@ def analyze_case(request):
     if not request.case_text or not request.case_text.strip():
         raise ValueError("case_text is empty")
 
+    # ✅ 요청 동안 사용할 코퍼스 버전 고정 (도중에 교체돼도 이 요청은 이전 버전으로 완료)
+    corpus = corpus_manager.current()
+
+    # ✅ 쿼리 임베딩 (BERT 인코더면 같은 forward 에서 소송 유형 확률도 계산)
+    case_type_probs = None
+    with deadline.stage("encode"):
+        query_vec = shared_query_vector(shared, corpus)
+        if query_vec is not None:
+            case_type_probs = shared.get("case_type_probs")
+            print("♻️ ai_hj 예측 forward 의 검색 벡터 사용 (인코딩 생략)")
+        elif isinstance(model, BertEncoder):
+            query_vec, case_type_probs = model.encode_with_case_type(request.case_text)
+        else:
+            query_vec = model.encode([request.case_text]).astype("float32")
+
+    # ✅ 인코딩/검색 후에도 남은 예산 확인 → 다 썼으면 전체 재검색/판결 결과 추출 생략
+    stage_degraded = "deadline_encode" if deadline.expired() else None
+
     # ✅ case_type 처리: 있으면 사용, 없으면 자동 추정
     if request.case_type:
         # 기존 방식 (하위 호환)
         inferred_type = request.case_type
         confidence = 1.0  # 사용자가 직접 선택했으므로 100%
         print(f"📌 사용자 지정 case_type: {inferred_type}")
+    elif case_type_probs:
+        # BERT 분류 헤드 (검색 벡터와 같은 forward)
+        inferred_type, confidence = infer_case_type_from_probs(case_type_probs, request.case_text)
+        print(f"🔍 BERT 분류: {inferred_type} (확률: {confidence:.2f})")
     else:
         # 새로운 방식 (자동 분류)
         inferred_type, confidence = infer_case_type(request.case_text)
@@ -129,43 +337,44 @@ def analyze_case(request):
     type_label = get_case_type_label(inferred_type)
     type_desc = get_case_type_description(inferred_type, confidence)
 
-    # ✅ 쿼리 임베딩
-    query_vec = model.encode([request.case_text]).astype("float32")
-
     # ✅ Subset 검색 + Fallback
-    results = search_with_fallback(
-        query_vec=query_vec,
-        faiss_index=faiss_index,
-        df_full=df_analysis,
-        case_type=inferred_type,
-        top_k=10,
-        fallback_threshold=3
-    )
+    with deadline.stage("search"):
+        results = search_with_fallback(
+            query_vec=query_vec,
+            faiss_index=corpus.faiss_index,
+            case_store=corpus.case_store,
+            case_type=inferred_type,
+            top_k=10,
+            fallback_threshold=3,
+            allow_fallback=stage_degraded is None
+        )
+    if stage_degraded is None and deadline.expired():
+        stage_degraded = "deadline_search"
 
     print(f"\n📊 최종 검색 결과: {len(results)} 건")
+    if stage_degraded:
+        print(f"⏱️ 지연 예산 소진 ({stage_degraded}) → 검색 결과만 간단히 후처리")
 
     # ✅ 후처리
-    results["similarity_band"] = results["similarity"].apply(similarity_band)
-    results["decision_result"] = results["case_text"].apply(extract_decision_result)
-    results["risk_score"] = results["decision_result"].map(DECISION_RISK_MAP).fillna(0.5)
+    with deadline.stage("postprocess"):
+        results["similarity_band"] = results["similarity"].apply(similarity_band)
+        results = fill_decision_columns(results, extract=stage_degraded is None)
 
-    avg_risk = results["risk_score"].mean() if len(results) > 0 else 0.5
-    overall_risk = (
-        "높음" if avg_risk >= 0.7 else "중간" if avg_risk >= 0.4 else "낮음"
-    )
+        avg_risk = results["risk_score"].mean() if len(results) > 0 else 0.5
+        overall_risk = (
+            "높음" if avg_risk >= 0.7 else "중간" if avg_risk >= 0.4 else "낮음"
+        )
 
-    top_cases = results.head(5)
+        top_cases = results.head(5)
 
-    # ✅ 요약 생성
-    try:
-        summary = generate_case_summary(
-            user_case=request.case_text,
-            results_df=top_cases,
-            overall_risk_level=overall_risk
-        )
-    except Exception as e:
-        print(f"⚠️ 요약 생성 오류: {e}")
-        summary = "요약 생성 중 오류가 발생했습니다."
+    # ✅ 요약 생성 (남은 지연 예산 안에서만 LLM 대기)
+    summary, summary_source, degraded_reason = None, "skipped", None
+    if summarize:
+        with deadline.stage("summary"):
+            summary, summary_source, degraded_reason = analysis_summary(
+                request.case_text, top_cases, overall_risk, type_label, deadline
+            )
+    degraded_reason = stage_degraded or degraded_reason
 
     # ✅ 응답 생성
     similar_cases_list = []
@@ -176,7 +385,7 @@ def analyze_case(request):
         case_id = None
         if pd.notna(case_num_raw):
             normalized = str(case_num_raw).strip()
-            if normalized in case_id_to_idx:
+            if normalized in corpus.case_id_to_idx:
                 case_id = normalized
         
         similar_cases_list.append({
@@ -191,8 +400,15 @@ def analyze_case(request):
             "xai_reason": (
                 f"{r['similarity_band']}에 해당하며 판단 결과는 '{r['decision_result']}'입니다."
             ),
+            # 인덱스에서 빠진 근사 중복 판례 수 (펼쳐보기는 /case/{case_id}/duplicates)
+            "duplicate_count": len(corpus.case_store.duplicates(i)) - 1,
         })
 
+    # ✅ 유사 판례 요약 선행 생성 (UI가 곧 /case/{case_id}/summary 를 조회)
+    if prefetch:
+        prefetch_case_summaries(corpus, top_cases)
+
+    print(f"⏱️ 단계별 소요: {deadline.describe()}")
     print(f"\n✅ analyze_case END: {time.time() - start:.2f}s")
     print("=" * 80 + "\n")
 
@@ -205,48 +421,113 @@ def analyze_case(request):
         "case_type_label": type_label,
         "case_type_confidence": confidence,
         "case_type_description": type_desc,
+        "corpus_version": corpus.version,
+        # ✅ 지연 예산 초과/LLM 오류로 템플릿 요약을 사용했는지
+        "degraded": degraded_reason is not None,
+        "degraded_reason": degraded_reason,
+        "summary_source": summary_source,
     }
 
+def prefetch_case_summaries(corpus, top_cases: pd.DataFrame) -> None:
+    if not llm_available():
+        return
+    items = []
+    for pos, r in top_cases.iterrows():
+        case_num_raw = r.get("사건번호")
+        if pd.isna(case_num_raw):
+            continue
+        items.append((
+            str(case_num_raw).strip(),
+            content_hash(r.get("case_text")),
+            lambda pos=pos: corpus.case_store.take([pos]),
+        ))
+    try:
+        scheduled = summary_prefetcher.prefetch(items)
+        if scheduled:
+            print(f"🧾 유사 판례 요약 선행 생성 예약: {scheduled}건")
+    except Exception as e:
+        print(f"⚠️ 요약 선행 생성 예약 오류: {e}")
+
+# ------------------------
+# 판례 요약 조회 순서
+# 1) 요약 저장소의 LLM 요약 (사전/선행 생성 또는 이전 enrich 결과, 내용이 바뀐 판례는 제외)
+# 2) 같은 판례 요약이 생성 중이면 그 작업 결과를 기다림 (새로 호출하지 않음)
+# 3) enrich 요청이면 LLM 호출 후 저장소에 저장 (역시 판례당 하나의 작업으로 합침)
+# 4) 저장소 생성 시 미리 계산된 local_summary 컬럼 (app/local_summary.py)
+#    컬럼이 없는 행(구버전 저장소)만 그 자리에서 계산
+# ------------------------
+def load_local_summary(corpus, idx: int) -> str:
+    store = corpus.case_store
+    if "local_summary" in store.columns:
+        summary = store.take([idx], columns=["local_summary"]).iloc[0]["local_summary"]
+        if isinstance(summary, str) and summary:
+            return summary
+    return parse_sections(store.row(idx).get("case_text"))["local_summary"]
+
+
+def resolve_case_summary(corpus, idx: int, case_id: str, enrich: bool = False):
+    """
+    Returns:
+        (요약, 출처) - 출처는 "local" 또는 "llm"
+    """
+    summary_store.record_view(case_id)
+    text_hash = content_hash(corpus.case_store.take([idx], columns=["case_text"]).iloc[0]["case_text"])
+    stored = summary_store.get(case_id, text_hash)
+    if stored:
+        return stored, "llm"
+
+    future = summary_prefetcher.attach(case_id, text_hash)
+    if future is None:
+        # 저장소 조회와 attach 사이에 선행 생성이 끝났을 수 있음 → 한 번 더 확인
+        stored = summary_store.get(case_id, text_hash, record_miss=False)
+        if stored:
+            return stored, "llm"
+    if future is None and (enrich or SUMMARY_ENRICH) and llm_available():
+        future = summary_prefetcher.submit(case_id, text_hash, lambda: corpus.case_store.take([idx]))
+    if future is not None:
+        try:
+            return future.result(timeout=SUMMARY_WAIT_SEC), "llm"
+        except Exception as e:
+            print(f"⚠️ 요약 생성 오류/지연 (로컬 요약 사용): {e!r}")
+    return load_local_summary(corpus, idx), "local"
+
 # ------------------------
 # 2️⃣ /case/{case_id}/summary
 # ------------------------
-def get_case_summary(case_id: str) -> CaseSummaryResponse:
+def get_case_summary(case_id: str, enrich: bool = False) -> CaseSummaryResponse:
     """사건 요약 조회"""
     case_id_norm = case_id.strip()
+    corpus = corpus_manager.current()
     
-    if case_id_norm not in case_id_to_idx:
+    if case_id_norm not in corpus.case_id_to_idx:
         raise ValueError(f"Case not found: {case_id}")
     
-    idx = case_id_to_idx[case_id_norm]
-    row = df_full.iloc[idx:idx+1]
-
-    try:
-        summary = generate_case_summary(
-            user_case="",
-            results_df=row,
-            overall_risk_level=""
-        )
-    except Exception as e:
-        print(f"⚠️ 요약 생성 오류: {e}")
-        summary = "요약 생성 불가"
+    idx = corpus.case_id_to_idx[case_id_norm]
+    summary, source = resolve_case_summary(corpus, idx, case_id_norm, enrich)
 
-    return CaseSummaryResponse(case_id=case_id, summary=summary)
+    return CaseSummaryResponse(
+        case_id=case_id,
+        summary=summary,
+        summary_source=source,
+        corpus_version=corpus.version
+    )
 
 # ------------------------
 # 3️⃣ /case/{case_id}/full
 # ------------------------
-def get_case_full_text(case_id: str) -> CaseFullTextResponse:
+def get_case_full_text(case_id: str, enrich: bool = False) -> CaseFullTextResponse:
     """판례 전문 조회"""
     print(f"📂 get_case_full_text: '{case_id}'")
     
     case_id_norm = case_id.strip()
+    corpus = corpus_manager.current()
     
-    if case_id_norm not in case_id_to_idx:
+    if case_id_norm not in corpus.case_id_to_idx:
         print(f"❌ Case not found: {case_id}")
         raise ValueError(f"Case not found: {case_id}")
     
-    idx = case_id_to_idx[case_id_norm]
-    r = df_full.iloc[idx]
+    idx = corpus.case_id_to_idx[case_id_norm]
+    r = corpus.case_store.row(idx)
     
     full_text = r.get("case_text", "")
     
@@ -257,19 +538,82 @@ def get_case_full_text(case_id: str) -> CaseFullTextResponse:
         print(f"✅ full_text 로드 성공: {len(full_text)} chars")
     
     # 요약
-    try:
-        summary = generate_case_summary(
-            user_case="",
-            results_df=df_full.iloc[idx:idx+1],
-            overall_risk_level=""
-        )
-    except Exception as e:
-        print(f"⚠️ 요약 생성 오류: {e}")
-        summary = ""
+    summary, source = resolve_case_summary(corpus, idx, case_id_norm, enrich)
 
     return CaseFullTextResponse(
         case_id=case_id,
         case_name=str(r.get("사건명", "")),
         full_text=full_text,
-        summary=summary
-    )
\ No newline at end of file
+        summary=summary,
+        summary_source=source,
+        corpus_version=corpus.version
+    )
+
+# ------------------------
+# 4️⃣ /case/{case_id}/duplicates
+# ------------------------
+def get_case_duplicates(case_id: str) -> CaseDuplicatesResponse:
+    """근사 중복 판례 펼쳐보기 (검색 인덱스에는 클러스터 대표만 들어 있음)"""
+    case_id_norm = case_id.strip()
+    corpus = corpus_manager.current()
+
+    if case_id_norm not in corpus.case_id_to_idx:
+        raise ValueError(f"Case not found: {case_id}")
+
+    store = corpus.case_store
+    idx = corpus.case_id_to_idx[case_id_norm]
+    members = store.duplicates(idx)
+    canonical = store.canonical_position(idx)
+
+    columns = [c for c in ("사건번호", "사건명", "법원명", "선고일자_norm") if c in store.columns]
+    rows = store.take(members, columns=columns)
+
+    canonical_case_id = None
+    duplicates = []
+    for pos, r in rows.iterrows():
+        case_num_raw = r.get("사건번호")
+        member_id = str(case_num_raw).strip() if pd.notna(case_num_raw) else None
+        if pos == canonical:
+            canonical_case_id = member_id
+        if pos == idx:
+            continue
+        decision_date = r.get("선고일자_norm")
+        duplicates.append(DuplicateCase(
+            case_id=member_id,
+            case_name=str(r.get("사건명", "")),
+            court=str(r.get("법원명", "")),
+            decision_date=str(decision_date) if pd.notna(decision_date) else None,
+            is_canonical=bool(pos == canonical),
+        ))
+
+    return CaseDuplicatesResponse(
+        case_id=case_id,
+        canonical_case_id=canonical_case_id,
+        duplicates=duplicates,
+        corpus_version=corpus.version,
+    )
+
+# ------------------------
+# 5️⃣ /case/{case_id}/section/{section}
+# ------------------------
+def get_case_section(case_id: str, section: str) -> CaseSectionResponse:
+    """판례의 한 섹션(판시사항/판결요지/주문/이유)만 조회 (전문 전체를 읽지 않음)"""
+    case_id_norm = case_id.strip()
+    corpus = corpus_manager.current()
+
+    if section not in SECTION_NAMES:
+        raise ValueError(f"Unknown section: {section} (가능: {', '.join(SECTION_NAMES)})")
+    if case_id_norm not in corpus.case_id_to_idx:
+        raise ValueError(f"Case not found: {case_id}")
+
+    idx = corpus.case_id_to_idx[case_id_norm]
+    text = corpus.case_store.section(idx, section)
+    if text is None:
+        raise ValueError(f"Section not found: {case_id} / {section}")
+
+    return CaseSectionResponse(
+        case_id=case_id,
+        section=section,
+        text=text.strip(),
+        corpus_version=corpus.version,
+    )
@@ -0,0 +1,133 @@
+# app/summary_prefetch.py
+"""
+판례 요약 선행 생성 (speculative prefetch)
+- /analyze 가 돌려준 유사 판례는 곧바로 /case/{case_id}/summary 로 조회되는 경우가 대부분
+  → 응답 직후 백그라운드 스레드에서 LLM 요약을 미리 생성해 요약 저장소(app/summary_store.py)에 저장
+- 같은 판례(case_id + text_hash)의 생성 작업은 하나만 실행
+  → 생성 중에 들어온 조회/enrich 요청은 새로 호출하지 않고 진행 중인 작업 결과를 기다림
+- 동시 생성 수는 워커 스레드 수로, 대기 작업 수는 max_pending 으로 제한
+  (한도를 넘는 선행 생성은 버림, 사용자가 직접 요청한 생성은 항상 접수)
+"""
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+
+class SummaryPrefetcher:
+
+    def __init__(self, summary_store, generate: Callable, workers: int = 2, max_pending: int = 32):
+        """
+        Args:
+            summary_store: SummaryStore (생성 결과 저장)
+            generate: 1행 DataFrame → 요약 문자열 (LLM 호출)
+            workers: 동시 생성 수 (0이면 선행 생성 안 함, 직접 요청은 스레드 1개로 처리)
+        """
+        self.summary_store = summary_store
+        self.generate = generate
+        self.workers = workers
+        self.max_pending = max_pending
+
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Tuple[str, str], Future] = {}
+        self._pool = None
+        self._pid = None
+
+        self.scheduled = 0
+        self.attached = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def _executor(self) -> ThreadPoolExecutor:
+        # fork된 워커는 부모의 스레드를 물려받지 않으므로 프로세스마다 새로 생성
+        if self._pid != os.getpid():
+            self._pool = ThreadPoolExecutor(max_workers=max(self.workers, 1), thread_name_prefix="summary-prefetch")
+            self._in_flight = {}
+            self._pid = os.getpid()
+        return self._pool
+
+    def _run(self, case_id: str, text_hash: str, load_row: Callable) -> str:
+        try:
+            summary = self.generate(load_row())
+        except Exception as e:
+            self.failed += 1
+            print(f"⚠️ 요약 선행 생성 오류 {case_id}: {e}")
+            raise
+        self.summary_store.put(case_id, text_hash, summary)
+        return summary
+
+    def _finish(self, key: Tuple[str, str]) -> None:
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def in_flight(self, case_id: str, text_hash: str) -> Optional[Future]:
+        with self._lock:
+            return self._in_flight.get((case_id, text_hash))
+
+    def attach(self, case_id: str, text_hash: str) -> Optional[Future]:
+        """생성 중인 작업이 있으면 반환 (조회 요청이 결과를 기다릴 때)"""
+        future = self.in_flight(case_id, text_hash)
+        if future is not None:
+            self.attached += 1
+        return future
+
+    def submit(self, case_id: str, text_hash: str, load_row: Callable,
+               speculative: bool = False) -> Optional[Future]:
+        """
+        생성 작업 등록 (같은 판례가 진행 중이면 그 작업을 반환)
+
+        Returns:
+            Future (선행 생성이 대기 한도로 버려지면 None)
+        """
+        key = (case_id, text_hash)
+        with self._lock:
+            pool = self._executor()
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.attached += 1
+                return future
+            if speculative and len(self._in_flight) >= self.max_pending:
+                self.dropped += 1
+                return None
+
+            future = pool.submit(self._run, case_id, text_hash, load_row)
+            self._in_flight[key] = future
+            self.scheduled += 1
+        future.add_done_callback(lambda _: self._finish(key))
+        return future
+
+    def prefetch(self, items: Iterable[Tuple[str, str, Callable]]) -> int:
+        """
+        items: (case_id, text_hash, 1행 로더) - 저장소에 이미 요약이 있는 판례는 건너뜀
+
+        Returns:
+            새로 예약한 작업 수
+        """
+        if not self.enabled:
+            return 0
+        items = [item for item in items if item[0]]
+        fresh = self.summary_store.fresh_case_ids({case_id: h for case_id, h, _ in items})
+
+        count = 0
+        for case_id, text_hash, load_row in items:
+            if case_id in fresh or self.in_flight(case_id, text_hash) is not None:
+                continue
+            if self.submit(case_id, text_hash, load_row, speculative=True) is not None:
+                count += 1
+        return count
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            in_flight = len(self._in_flight) if self._pid == os.getpid() else 0
+        return {
+            "workers": self.workers,
+            "in_flight": in_flight,
+            "scheduled": self.scheduled,
+            "attached": self.attached,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
@@ -0,0 +1,197 @@
+# app/summary_store.py
+"""
+판례별 LLM 요약 저장소 (sqlite)
+- pipeline/precompute_summaries.py 가 코퍼스를 돌며 미리 생성해서 저장
+- /case/{case_id}/summary, /full 은 이 저장소를 먼저 조회 → 첫 조회자도 LLM 지연 없음
+- 행마다 text_hash(정규화 case_text의 sha1)와 모델 이름을 같이 저장
+  → 판례 내용이 바뀌거나 모델이 바뀐 요약은 조회되지 않고, 배치 작업에서 다시 생성
+- 요약 조회 횟수(views)도 기록 → 배치 작업이 인기순으로 먼저 생성
+  (요청 경로에서는 메모리에만 더하고, 백그라운드 스레드가 주기적으로 모아서 기록)
+
+여러 워커 프로세스가 같은 파일을 공유 (WAL 모드)
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+
+SUMMARY_STORE_FILE = "summary_store.sqlite"
+
+# sqlite 바인딩 변수 개수 제한 안쪽으로 나눠 조회
+_QUERY_CHUNK = 900
+
+
+class SummaryStore:
+    """서비스(조회/조회수 기록)와 배치 작업(저장)이 함께 쓰는 요약 저장소"""
+
+    def __init__(self, path: str, model_name: str, view_flush_sec: float = 10.0):
+        self.path = path
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # 서비스는 스레드풀에서 호출되므로 연결 하나를 락으로 보호해서 공유
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        # 조회수는 메모리에 모았다가 view_flush_sec 마다 기록 (sqlite 잠금이 요청을 막지 않도록)
+        self.view_flush_sec = view_flush_sec
+        self._views_lock = threading.Lock()
+        self._pending_views = Counter()
+        self._flusher_pid = None
+        self.view_flush_errors = 0
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            " case_id TEXT PRIMARY KEY,"
+            " text_hash TEXT NOT NULL,"
+            " model TEXT NOT NULL,"
+            " summary TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS views ("
+            " case_id TEXT PRIMARY KEY,"
+            " count INTEGER NOT NULL)"
+        )
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        프로세스별 연결 (preload-then-fork 서빙에서 부모의 연결을 워커가 물려받지 않도록
+        fork 후 첫 사용 시 다시 연결)
+        """
+        if self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, case_id: str, text_hash: str, record_miss: bool = True) -> Optional[str]:
+        """
+        현재 내용/모델로 만든 요약만 반환 (없거나 오래된 요약이면 None)
+        record_miss=False: 같은 조회의 재확인 (miss 를 두 번 세지 않음)
+        """
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT summary FROM summaries WHERE case_id = ? AND text_hash = ? AND model = ?",
+                (case_id, text_hash, self.model_name),
+            ).fetchone()
+        if row is None:
+            if record_miss:
+                self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def fresh_case_ids(self, hashes: Dict[str, str]) -> set:
+        """{case_id: text_hash} 중 현재 요약이 이미 있는 case_id"""
+        fresh = set()
+        case_ids = list(hashes)
+        with self._lock:
+            for i in range(0, len(case_ids), _QUERY_CHUNK):
+                part = case_ids[i:i + _QUERY_CHUNK]
+                rows = self._connection().execute(
+                    f"SELECT case_id, text_hash FROM summaries"
+                    f" WHERE model = ? AND case_id IN ({','.join('?' * len(part))})",
+                    [self.model_name] + part,
+                ).fetchall()
+                fresh.update(cid for cid, h in rows if hashes.get(cid) == h)
+        return fresh
+
+    def put(self, case_id: str, text_hash: str, summary: str) -> None:
+        self.put_many([(case_id, text_hash, summary)])
+
+    def put_many(self, items: Sequence[tuple]) -> None:
+        """items: [(case_id, text_hash, summary), ...]"""
+        now = time.time()
+        with self._lock:
+            self._connection().executemany(
+                "INSERT OR REPLACE INTO summaries (case_id, text_hash, model, summary, created_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [(cid, h, self.model_name, s, now) for cid, h, s in items],
+            )
+            self._connection().commit()
+
+    def record_view(self, case_id: str) -> None:
+        """메모리에만 더함 (기록은 백그라운드 flush, 실패해도 요청에는 영향 없음)"""
+        self._ensure_flusher()
+        with self._views_lock:
+            self._pending_views[case_id] += 1
+
+    def _ensure_flusher(self) -> None:
+        # fork 된 워커는 부모의 스레드를 물려받지 않으므로 pid 가 바뀌면 새로 시작
+        if self._flusher_pid == os.getpid():
+            return
+        with self._views_lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            self._pending_views = Counter()  # 부모 프로세스 몫은 부모가 기록
+        threading.Thread(target=self._flush_loop, name="summary-views", daemon=True).start()
+
+    def _flush_loop(self) -> None:
+        pid = os.getpid()
+        while self._flusher_pid == pid:
+            time.sleep(self.view_flush_sec)
+            self.flush_views()
+
+    def flush_views(self) -> int:
+        """모아 둔 조회수 기록 → 기록한 case_id 수 (실패하면 다음 주기에 다시 시도)"""
+        with self._views_lock:
+            pending, self._pending_views = self._pending_views, Counter()
+        if not pending:
+            return 0
+        try:
+            with self._lock:
+                self._connection().executemany(
+                    "INSERT INTO views (case_id, count) VALUES (?, ?)"
+                    " ON CONFLICT(case_id) DO UPDATE SET count = count + excluded.count",
+                    list(pending.items()),
+                )
+                self._connection().commit()
+        except sqlite3.Error as e:
+            print(f"⚠️ 조회수 기록 실패 (다음 주기에 재시도): {e}")
+            self.view_flush_errors += 1
+            with self._views_lock:
+                self._pending_views.update(pending)
+            return 0
+        return len(pending)
+
+    def popular_case_ids(self, limit: Optional[int] = None) -> List[str]:
+        """조회수 내림차순 case_id"""
+        query = "SELECT case_id FROM views ORDER BY count DESC, case_id"
+        with self._lock:
+            if limit:
+                rows = self._connection().execute(query + " LIMIT ?", (limit,)).fetchall()
+            else:
+                rows = self._connection().execute(query).fetchall()
+        return [r[0] for r in rows]
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stored = self._connection().execute(
+                "SELECT COUNT(*) FROM summaries WHERE model = ?", (self.model_name,)
+            ).fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "stored": stored,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "pending_views": len(self._pending_views),
+            "view_flush_errors": self.view_flush_errors,
+        }
+
+    def close(self) -> None:
+        if self._flusher_pid == os.getpid():
+            self.flush_views()
+            self._flusher_pid = None
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+        self._pid = None
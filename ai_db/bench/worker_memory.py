@@ -0,0 +1,110 @@
+# bench/worker_memory.py
+"""
+워커별 추가 메모리(RSS/USS/PSS) 측정 벤치마크
+
+  cd ai_db
+  python bench/worker_memory.py --workers 4 --mode baseline   # uvicorn --workers (워커마다 개별 로드)
+  python bench/worker_memory.py --workers 4 --mode prefork    # preload-then-fork + mmap
+
+- USS: 해당 프로세스만 쓰는 private 메모리 = 워커 1개를 늘릴 때 실제로 추가되는 메모리
+- PSS: 공유 페이지를 프로세스 수로 나눠 합산한 값
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+import psutil
+
+MB = 1024 * 1024
+
+
+def wait_until_ready(port: int, timeout: float) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/docs", timeout=2)
+            return
+        except Exception:
+            time.sleep(2)
+    raise TimeoutError("서버가 준비되지 않았습니다.")
+
+
+def warm_up(port: int, requests: int) -> None:
+    """각 워커가 실제 검색 경로를 타도록 요청을 보냄"""
+    body = '{"case_text": "임대인이 보증금을 돌려주지 않고 연락을 피하고 있습니다."}'.encode("utf-8")
+    for _ in range(requests):
+        req = urllib.request.Request(
+            f"http://127.0.0.1:{port}/analyze",
+            data=body,
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            urllib.request.urlopen(req, timeout=120).read()
+        except Exception as e:
+            print(f"⚠️ warm-up 요청 실패: {e}")
+
+
+def measure(root: psutil.Process) -> list:
+    rows = []
+    for proc in [root] + root.children(recursive=True):
+        try:
+            info = proc.memory_full_info()
+        except psutil.Error:
+            continue
+        rows.append({
+            "pid": proc.pid,
+            "role": "parent" if proc.pid == root.pid else "worker",
+            "rss": info.rss / MB,
+            "uss": info.uss / MB,
+            "pss": getattr(info, "pss", 0) / MB,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--mode", choices=["baseline", "prefork"], default="prefork")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--warmup", type=int, default=20)
+    args = parser.parse_args()
+
+    env = dict(os.environ, LEGAL_AI_PORT=str(args.port))
+    if args.mode == "baseline":
+        cmd = [sys.executable, "-m", "uvicorn", "app.main:app",
+               "--port", str(args.port), "--workers", str(args.workers)]
+    else:
+        env["LEGAL_AI_WORKERS"] = str(args.workers)
+        cmd = [sys.executable, "-m", "app.main"]
+
+    server = subprocess.Popen(cmd, env=env)
+    try:
+        wait_until_ready(args.port, args.timeout)
+        warm_up(args.port, args.warmup)
+        rows = measure(psutil.Process(server.pid))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    print("=" * 60)
+    print(f"📊 mode={args.mode} workers={args.workers}")
+    print(f"{'pid':>8} {'role':>8} {'RSS(MB)':>10} {'USS(MB)':>10} {'PSS(MB)':>10}")
+    for r in rows:
+        print(f"{r['pid']:>8} {r['role']:>8} {r['rss']:>10.1f} {r['uss']:>10.1f} {r['pss']:>10.1f}")
+
+    workers = [r for r in rows if r["role"] == "worker"]
+    if workers:
+        avg_uss = sum(r["uss"] for r in workers) / len(workers)
+        total_pss = sum(r["pss"] for r in rows)
+        print("-" * 60)
+        print(f"워커당 추가 메모리(평균 USS): {avg_uss:.1f} MB")
+        print(f"전체 메모리(PSS 합계): {total_pss:.1f} MB")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# src/llm/batcher.py
+"""
+판례별 요약 요청 마이크로 배칭
+- 결과 화면이 열리면 UI가 여러 판례의 /case/{case_id}/summary 를 거의 동시에 호출
+  → 짧은 창(window) 안에 들어온 요청을 모아 여러 판례를 한 번에 요약하는 프롬프트 1개로 전송
+- 응답(JSON)을 판례별로 나눠 각 호출자에게 돌려줌
+- 응답에서 특정 판례 요약을 못 찾으면 그 판례만 단건 호출로 대체
+- 별도 스레드 없이 창을 연 첫 요청(리더)이 창이 끝나면 모인 요청을 대표로 전송
+"""
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+
+class SummaryBatcher:
+
+    def __init__(self, summarize_many: Callable, summarize_one: Callable,
+                 window_ms: float = 30.0, max_batch: int = 5):
+        """
+        Args:
+            summarize_many: 판례 dict 목록 → 같은 순서의 요약 목록 (못 나눈 항목은 None)
+            summarize_one: 판례 dict → 요약 (단건 대체 호출)
+            window_ms: 첫 요청 후 다른 요청을 기다리는 시간
+            max_batch: 한 프롬프트에 넣는 최대 판례 수 (차면 창을 기다리지 않고 바로 전송)
+        """
+        self.summarize_many = summarize_many
+        self.summarize_one = summarize_one
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+
+        self._lock = threading.Lock()
+        self._pending: List[tuple] = []
+
+        self.requests = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.fallbacks = 0
+
+    def submit(self, case: dict) -> str:
+        future = Future()
+        with self._lock:
+            self._pending.append((case, future))
+            self.requests += 1
+            if len(self._pending) >= self.max_batch:
+                batch, self._pending = self._pending, []
+            else:
+                batch = None
+            leader = batch is None and len(self._pending) == 1
+
+        if leader and self.max_batch > 1:
+            time.sleep(self.window)
+            with self._lock:
+                batch, self._pending = self._pending, []
+        if batch:
+            self._flush(batch)
+
+        summary, batched = future.result()
+        if summary:
+            return summary
+        # 혼자 들어온 요청이거나 묶음 응답에서 못 찾은 판례 → 호출자 스레드에서 단건 호출
+        if batched:
+            self.fallbacks += 1
+        return self.summarize_one(case)
+
+    def _flush(self, batch: List[tuple]) -> None:
+        if len(batch) == 1:
+            batch[0][1].set_result((None, False))
+            return
+
+        self.batches += 1
+        self.batched_requests += len(batch)
+        try:
+            results = self.summarize_many([case for case, _ in batch])
+        except Exception as e:
+            print(f"⚠️ 묶음 요약 실패, 판례별 호출로 대체: {e}")
+            results = [None] * len(batch)
+        for (_, future), summary in zip(batch, results):
+            future.set_result((summary, True))
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "batched_prompts": self.batches,
+            "batched_requests": self.batched_requests,
+            "avg_batch_size": round(self.batched_requests / self.batches, 2) if self.batches else 0.0,
+            "fallback_calls": self.fallbacks,
+        }
@@ -0,0 +1,129 @@
+# circuit_breaker.py
+"""
+LLM(Gemini) 호출 서킷 브레이커
+- 최근 window건 호출의 실패율(오류 + 느린 호출)이 임계값을 넘으면 OPEN
+  → OPEN 동안은 호출하지 않고 즉시 CircuitOpenError (호출부는 템플릿 요약/피드백으로 대체)
+- open_sec 가 지나면 HALF_OPEN: 탐색 호출 1건만 허용, 성공하면 CLOSED / 실패하면 다시 OPEN
+- 장애 중에 요청 스레드가 타임아웃까지 쌓이지 않도록 하는 것이 목적
+
+ai_db/llm/ 와 ai_hj/llm/ 에 같은 파일이 있음 (두 서비스는 따로 배포·실행되므로 복사본 유지, 수정은 두 곳 함께)
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """브레이커가 열려 있어 호출하지 않음"""
+
+
+class CircuitBreaker:
+
+    def __init__(self, name: str, failure_threshold: float = 0.5, slow_call_sec: float = 20.0,
+                 window: int = 20, min_calls: int = 5, open_sec: float = 30.0):
+        """
+        Args:
+            failure_threshold: OPEN 전환 실패율 (오류 + slow_call_sec 초과 호출)
+            window: 실패율을 계산할 최근 호출 수
+            min_calls: 실패율을 판단하기 위한 최소 호출 수
+            open_sec: OPEN 유지 시간 (이후 HALF_OPEN 탐색)
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_sec = slow_call_sec
+        self.min_calls = min_calls
+        self.open_sec = open_sec
+
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+
+        self.opened_count = 0
+        self.short_circuited = 0
+        self.last_error = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_sec:
+            self._state = HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def available(self) -> bool:
+        """지금 호출하면 실행될 수 있는지 (OPEN이면 False)"""
+        return self.state != OPEN
+
+    def _allow(self) -> bool:
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.short_circuited += 1
+            return False
+
+    def _open(self) -> None:
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probing = False
+        self._outcomes.clear()
+        self.opened_count += 1
+        print(f"🔌 서킷 브레이커 OPEN: {self.name} ({self.open_sec:.0f}s 후 탐색 호출)")
+
+    def _record(self, failed: bool) -> None:
+        with self._lock:
+            if self._state == HALF_OPEN:
+                if failed:
+                    self._open()
+                else:
+                    self._state = CLOSED
+                    self._probing = False
+                    self._outcomes.clear()
+                    print(f"🔌 서킷 브레이커 CLOSED: {self.name}")
+                return
+
+            self._outcomes.append(failed)
+            if len(self._outcomes) >= self.min_calls and \
+                    sum(self._outcomes) / len(self._outcomes) >= self.failure_threshold:
+                self._open()
+
+    def call(self, fn: Callable):
+        if not self._allow():
+            raise CircuitOpenError(f"{self.name} circuit open")
+
+        start = time.monotonic()
+        try:
+            result = fn()
+        except Exception as e:
+            self.last_error = repr(e)
+            self._record(True)
+            raise
+        self._record(time.monotonic() - start > self.slow_call_sec)
+        return result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            state = self._current_state()
+            recent = len(self._outcomes)
+            failures = sum(self._outcomes)
+        return {
+            "state": state,
+            "recent_calls": recent,
+            "recent_failure_rate": round(failures / recent, 4) if recent else 0.0,
+            "opened_count": self.opened_count,
+            "short_circuited": self.short_circuited,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,76 @@
+# src/llm/prompt_budget.py
+"""
+토큰 예산 기반 프롬프트 조립
+- 템플릿별 입력 토큰 상한(budget) 안에서 프롬프트를 만듦 → 입력 토큰/LLM 지연/비용 상한 고정
+- 줄이는 순서: 중복 판례 블록 제거 → 사용자 사연 축약 → 우선순위 낮은(뒤쪽) 판례 블록 제거
+  → 남은 블록 하나도 넘치면 블록 내용 축약 → 사연 추가 축약 (예산은 항상 지킴)
+- 사연은 앞부분(사건 경위)과 끝부분(현재 상황/질문)을 남기고 가운데를 생략
+- 요청마다 최종 프롬프트 토큰 수를 기록 (/metrics 의 llm.prompts)
+
+토큰 추정/축약과 통계는 token_budget.py (ai_hj 와 같은 코드)
+"""
+import re
+from typing import Callable, List, Optional
+
+from .token_budget import OMISSION, PromptStats, estimate_tokens, truncate_tokens  # 기존 import 경로 유지
+
+TEMPLATE_BUDGETS = {
+    "summary": 2000,
+    "combined": 2400,
+}
+
+MIN_STORY_TOKENS = 200
+
+# 여러 판례를 한 번에 요약하는 프롬프트(판례 수가 정해져 있음)의 판례 블록당 상한
+CASE_BLOCK_TOKENS = 400
+
+
+def dedupe_blocks(blocks: List[str]) -> List[str]:
+    """공백만 다른 블록까지 같은 블록으로 보고 첫 번째만 유지"""
+    seen, out = set(), []
+    for block in blocks:
+        key = re.sub(r"\s+", " ", block).strip()
+        if key not in seen:
+            seen.add(key)
+            out.append(block)
+    return out
+
+
+prompt_stats = PromptStats(TEMPLATE_BUDGETS)
+
+
+def compile_prompt(name: str, render: Callable[[str, List[str]], str], story: str,
+                   blocks: List[str], budget: Optional[int] = None,
+                   min_story_tokens: int = MIN_STORY_TOKENS) -> str:
+    """
+    Args:
+        name: 템플릿 이름 (TEMPLATE_BUDGETS 키, 통계 키)
+        render: (사연, 블록 목록) → 프롬프트 문자열
+        story: 사용자 사연 (줄일 수 있음)
+        blocks: 우선순위 순 블록 (중복 제거, 뒤에서부터 제거 가능, 최소 1개 유지 - 넘치면 내용 축약)
+    """
+    budget = budget or TEMPLATE_BUDGETS[name]
+    story = story or ""
+    kept = dedupe_blocks(blocks)
+    trimmed = len(kept) < len(blocks)
+
+    prompt = render(story, kept)
+    if estimate_tokens(prompt) > budget:
+        trimmed = True
+        # 사연은 최소 길이까지만 줄이고, 그래도 넘치면 뒤쪽 블록부터 제거
+        while True:
+            fixed = estimate_tokens(render("", kept))
+            story_budget = budget - fixed
+            if story_budget >= min(min_story_tokens, estimate_tokens(story)) or len(kept) <= 1:
+                break
+            kept = kept[:-1]
+        min_story = min(min_story_tokens, estimate_tokens(story))
+        if story_budget < min_story and kept:
+            # 남은 블록 하나만으로도 넘침 (예: 아주 긴 사건명) → 블록 내용 자체를 축약
+            block_budget = budget - estimate_tokens(render("", [""])) - min_story
+            kept = [truncate_tokens(kept[0], max(block_budget, 0))]
+            story_budget = budget - estimate_tokens(render("", kept))
+        prompt = render(truncate_tokens(story, max(story_budget, 0)), kept)
+
+    prompt_stats.record(name, estimate_tokens(prompt), trimmed)
+    return prompt
@@ -1,18 +1,31 @@
 # src/llm/prompt_templates.py
+from .prompt_budget import CASE_BLOCK_TOKENS, compile_prompt, estimate_tokens, prompt_stats, truncate_tokens
 
-def build_summary_prompt(user_case, cases, overall_risk_level):
-    case_blocks = []
-
-    for c in cases:
-        case_blocks.append(
-            f"""
+def build_case_block(c):
+    return f"""
 사건명: {c.get('사건명')}
 판결유형: {c.get('판결유형')}
 유사성 평가: {c.get('similarity_band')}
 판단 근거 요약: {c.get('xai_reason')}
 """.strip()
-        )
 
+
+def build_summary_prompt(user_case, cases, overall_risk_level):
+    """토큰 예산(prompt_budget.TEMPLATE_BUDGETS["summary"]) 안에서 조립"""
+    case_blocks = []
+
+    for c in cases:
+        case_blocks.append(build_case_block(c))
+
+    return compile_prompt(
+        "summary",
+        lambda story, blocks: _render_summary_prompt(story, blocks, overall_risk_level),
+        user_case,
+        case_blocks,
+    )
+
+
+def _render_summary_prompt(user_case, case_blocks, overall_risk_level):
     cases_text = "\n\n".join(case_blocks)
 
     return f"""
@@ -52,3 +65,112 @@ def build_summary_prompt(user_case, cases, overall_risk_level):
   "본 내용은 법률 자문이 아니며 참고용 분석입니다."
 """.strip()
 
+
+def build_multi_case_summary_prompt(cases):
+    """여러 판례를 한 번에 요약 (판례 번호를 키로 하는 JSON 응답)"""
+    blocks = [build_case_block(c) for c in cases]
+    capped = [truncate_tokens(b, CASE_BLOCK_TOKENS) for b in blocks]
+    case_blocks = [
+        f"[판례 {i}]\n{b}" for i, b in enumerate(capped, 1)
+    ]
+    cases_text = "\n\n".join(case_blocks)
+    keys = ", ".join(f'"{i}": "..."' for i in range(1, len(cases) + 1))
+
+    prompt = f"""
+당신은 법률 분석 시스템의 내부 결과를
+일반 사용자에게 전달하기 위해
+'설명문 형태의 요약 텍스트'를 생성하는 역할입니다.
+
+아래 {len(cases)}개 판례 정보는 이미 분석된 결과이며,
+새로운 사실이나 판단을 추가해서는 안 됩니다.
+판례마다 따로 요약하고, 서로 다른 판례의 내용을 섞지 마세요.
+
+{cases_text}
+
+판례마다 다음 내용을 하나의 설명문으로 작성하세요.
+- 이 사건에서 핵심적으로 문제되는 쟁점
+- 판단 경향과 그 의미
+
+작성 조건:
+- 판례당 6~8문장 이내, 2~3개 문단 이내
+- 제목, 소제목, 번호, 마크다운 기호(##, ###, -, *)를 사용하지 말 것
+- 객관적인 설명만 사용할 것
+- 법률 비전문가도 이해할 수 있는 한국어
+- 추측, 조언, 단정적 표현 금지
+- 각 요약의 마지막 문장은 반드시 다음 문구로 끝낼 것:
+  "본 내용은 법률 자문이 아니며 참고용 분석입니다."
+
+출력 형식:
+- 판례 번호를 키로 하는 JSON 객체 하나만 출력 (코드 블록, 설명 없이)
+- {{{keys}}}
+""".strip()
+    # 판례 번호와 응답 키가 맞아야 하므로 블록을 빼지 않고 블록마다 CASE_BLOCK_TOKENS 이내로 축약
+    prompt_stats.record("multi_case_summary", estimate_tokens(prompt), capped != blocks)
+    return prompt
+
+
+def build_evidence_block(c):
+    """/analyze 응답의 similar_cases 항목 → 판례 근거 블록"""
+    return f"""
+사건명: {c.get('case_name')}
+판결유형: {c.get('decision_type')}
+판단 결과: {c.get('decision_result')}
+판단 근거 요약: {c.get('xai_reason')}
+""".strip()
+
+
+def build_combined_prompt(user_case, similar_cases, overall_risk_level, predictions):
+    """
+    /analyze/all: 유사 판례 근거 + BERT 예측값을 프롬프트 하나로 (토큰 예산 "combined")
+    → 판례 요약과 승소율/형량 피드백을 LLM 호출 1번으로 생성
+    """
+    return compile_prompt(
+        "combined",
+        lambda story, blocks: _render_combined_prompt(story, blocks, overall_risk_level, predictions),
+        user_case,
+        [build_evidence_block(c) for c in similar_cases],
+    )
+
+
+def _render_combined_prompt(user_case, case_blocks, overall_risk_level, predictions):
+    cases_text = "\n\n".join(case_blocks)
+
+    return f"""
+당신은 법률 분석 시스템의 내부 결과를
+일반 사용자에게 전달하기 위해
+'설명문 형태의 종합 분석 텍스트'를 생성하는 역할입니다.
+
+아래 정보는 이미 분석된 결과이며,
+새로운 사실이나 판단을 추가해서는 안 됩니다.
+
+사용자 사건 요약:
+{user_case}
+
+AI 예측 결과:
+- 소송 유형: {predictions.get('case_type')}
+- 승소율: {predictions.get('win_rate', 0):.1f}%
+- 예상 형량: {predictions.get('sentence', 0):.1f}년
+- 예상 벌금: {predictions.get('fine', 0):,.0f}원
+- 위험도: {predictions.get('risk', 0):.1f}/100
+
+유사 판례 분석 요약:
+{cases_text}
+
+종합 법적 리스크 수준:
+{overall_risk_level}
+
+위 정보를 바탕으로 다음 내용을 설명문으로 작성하세요.
+- 이 사건에서 핵심적으로 문제되는 쟁점
+- 유사 판례들이 공통적으로 보여주는 판단 경향과 AI 예측 결과의 관계
+- 사용자 사건에서 유리하거나 불리하게 작용할 수 있는 요소
+- 증거 확보 등 일반적으로 확인해 볼 사항과 전문가 상담 필요성 (상/중/하)
+
+작성 조건:
+- 제목, 소제목, 번호, 마크다운 기호(##, ###, -, *)를 사용하지 말 것
+- 3~4개 문단, 10~12문장 이내
+- 객관적인 설명만 사용할 것
+- 법률 비전문가도 이해할 수 있는 한국어
+- 추측, 단정적 표현 금지
+- 마지막 문장은 반드시 다음 문구로 끝낼 것:
+  "본 내용은 법률 자문이 아니며 참고용 분석입니다."
+""".strip()
@@ -1,7 +1,38 @@
 # src/llm/summarizer.py
+import json
+import os
+import re
+from typing import List, Optional
 
-from .gemini_client import call_gemini
-from .prompt_templates import build_summary_prompt
+from .batcher import SummaryBatcher
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .gemini_client import MODEL_NAME, call_gemini
+from .prompt_budget import prompt_stats
+from .prompt_templates import build_combined_prompt, build_multi_case_summary_prompt, build_summary_prompt
+from .single_flight import SingleFlight, prompt_key
+
+# 같은 프롬프트의 동시 요청은 Gemini 호출 1번으로 합침
+_flight = SingleFlight()
+
+# Gemini 장애/지연이 이어지면 호출하지 않고 바로 CircuitOpenError (호출부가 로컬 요약으로 대체)
+_breaker = CircuitBreaker(
+    "gemini",
+    failure_threshold=float(os.getenv("LEGAL_AI_LLM_BREAKER_FAILURE_RATE", "0.5")),
+    slow_call_sec=float(os.getenv("LEGAL_AI_LLM_BREAKER_SLOW_SEC", "20")),
+    open_sec=float(os.getenv("LEGAL_AI_LLM_BREAKER_OPEN_SEC", "30")),
+)
+
+
+def _call(prompt: str) -> str:
+    return _flight.do(
+        prompt_key(prompt, MODEL_NAME),
+        lambda: _breaker.call(lambda: call_gemini(prompt))
+    )
+
+
+def llm_available() -> bool:
+    """서킷 브레이커가 열려 있으면 False (호출해도 바로 CircuitOpenError)"""
+    return _breaker.available()
 
 
 def generate_case_summary(
@@ -26,4 +57,79 @@ def generate_case_summary(
         overall_risk_level=overall_risk_level
     )
 
-    return call_gemini(prompt)
+    return _call(prompt)
+
+
+def generate_combined_summary(user_case: str, similar_cases: List[dict],
+                              overall_risk_level: str, predictions: dict) -> str:
+    """
+    /analyze/all 종합 설명: 유사 판례 근거 + BERT 예측값 (LLM 호출 1번)
+    similar_cases 는 /analyze 응답 형식 (case_name, decision_type, xai_reason ...)
+    """
+    prompt = build_combined_prompt(
+        user_case=user_case,
+        similar_cases=similar_cases[:5],
+        overall_risk_level=overall_risk_level,
+        predictions=predictions,
+    )
+    return _call(prompt)
+
+
+# ------------------------
+# 판례 1건 요약 (/case/{case_id}/summary)
+# 동시에 들어온 요청은 여러 판례 프롬프트 하나로 묶어서 호출
+# ------------------------
+def _summarize_one(case: dict) -> str:
+    return _call(build_summary_prompt(user_case="", cases=[case], overall_risk_level=""))
+
+
+def parse_multi_case_summaries(text: str, count: int) -> List[Optional[str]]:
+    """JSON 응답 → 판례 순서대로 요약 (못 찾은 판례는 None)"""
+    body = re.sub(r"^```(?:json)?\s*|\s*```$", "", (text or "").strip())
+    try:
+        parsed = json.loads(body[body.find("{"):body.rfind("}") + 1])
+    except ValueError:
+        return [None] * count
+    if not isinstance(parsed, dict):
+        return [None] * count
+
+    out = []
+    for i in range(1, count + 1):
+        summary = parsed.get(str(i))
+        out.append(summary.strip() if isinstance(summary, str) and summary.strip() else None)
+    return out
+
+
+def _summarize_many(cases: List[dict]) -> List[Optional[str]]:
+    text = _call(build_multi_case_summary_prompt(cases))
+    return parse_multi_case_summaries(text, len(cases))
+
+
+_batcher = SummaryBatcher(
+    _summarize_many,
+    _summarize_one,
+    window_ms=float(os.getenv("LEGAL_AI_SUMMARY_BATCH_WINDOW_MS", "30")),
+    max_batch=int(os.getenv("LEGAL_AI_SUMMARY_BATCH_SIZE", "5")),
+)
+
+
+def generate_single_case_summary(results_df) -> str:
+    """판례 1건 요약 (첫 행)"""
+    case = results_df.head(1).to_dict(orient="records")[0]
+    return _batcher.submit(case)
+
+
+def llm_stats() -> dict:
+    """
+    Gemini 호출 통계
+    - coalescing: 같은 프롬프트 합치기 (saved_calls = 생략된 호출 수)
+    - batching: 판례 요약 묶음 호출
+    - prompts: 템플릿별 프롬프트 토큰 수 (추정)
+    - circuit_breaker: Gemini 서킷 브레이커 상태
+    """
+    return {
+        "circuit_breaker": _breaker.stats(),
+        "coalescing": _flight.stats(),
+        "batching": _batcher.stats(),
+        "prompts": prompt_stats.stats(),
+    }
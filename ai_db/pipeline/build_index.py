@@ -0,0 +1,384 @@
+# pipeline/build_index.py
+"""
+오프라인 인덱스 빌드 CLI (02_embedding / 03_XAI 노트북 대체, ai_db 디렉터리에서 실행)
+
+  python -m pipeline.build_index --root <artifact_root> --input korean_precedents_clean.parquet \
+      [--workers 4] [--dtype float16] [--metric l2] [--chunk-rows 4096]
+
+- parquet을 pyarrow.dataset으로 스트리밍 → 전체를 pandas로 올리지 않음
+- 청크 단위로 프로세스 풀에 분배, 청크 안에서는 길이순 정렬 후 배치 인코딩 (패딩 최소화)
+- 청크가 끝날 때마다 임베딩 memmap flush + build_state.json 체크포인트
+  → 빌드가 중단되면 같은 명령을 다시 실행해서 남은 청크부터 이어서 빌드
+- 임베딩 캐시(pipeline/embedding_cache.py)를 먼저 조회해서 미스만 인코딩 (--no-cache로 끔)
+- --model legal-bert:<ai_hj 체크포인트 폴더>: MultiTaskLegalBERT 토큰 평균 벡터로 빌드 (app/bert_encoder.py)
+  → ai_hj 예측 forward 의 벡터로 바로 검색 가능 (서비스는 LEGAL_AI_EMBEDDING_MODEL 을 같은 값으로)
+- --dedup-threshold: 근사 중복 판례는 대표 행만 인덱스에 넣음 (pipeline/dedup.py)
+- 산출물: versions/<version>/ 에 cases.arrow, embeddings.npy, case_index.faiss, manifest.json
+  manifest.json은 마지막에 기록되므로 서비스(CorpusManager)는 완성된 뒤에만 교체
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+from typing import Iterator, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from app.bert_encoder import load_encoder
+from app.case_store import CASE_STORE_FILE, CLUSTERS_FILE, build_case_store, open_parquet_source
+from app.corpus import (
+    INDEX_FILE, MANIFEST_FILE, VERSIONS_DIR,
+    new_version_name, write_manifest,
+)
+from pipeline import dedup
+from pipeline.embedding_cache import CACHE_FILE, EmbeddingCache
+
+DEFAULT_MODEL_NAME = "snunlp/KR-SBERT-V40K-klueNLI-augSTS"
+EMBEDDINGS_FILE = "embeddings.npy"
+STATE_FILE = "build_state.json"
+METRICS = {"l2": faiss.METRIC_L2, "ip": faiss.METRIC_INNER_PRODUCT}
+
+# 워커 프로세스 전역 (initializer에서 한 번만 로드)
+_worker_model = None
+
+
+# ------------------------
+# 워커
+# ------------------------
+def _init_worker(model_name: str, threads: int, max_seq_length: Optional[int]):
+    """워커마다 모델 1회 로드 + torch 스레드 수 제한 (코어 과다 구독 방지)"""
+    global _worker_model
+    import torch
+
+    torch.set_num_threads(threads)
+    _worker_model = load_encoder(model_name, device="cpu")
+    if max_seq_length:
+        _worker_model.max_seq_length = max_seq_length
+
+
+def _encode_chunk(chunk_id: int, texts: list, batch_size: int):
+    """청크 인코딩: 길이순 정렬 → 배치 인코딩 → 원래 순서로 복원 (float32, 캐시 저장용)"""
+    order = np.argsort([len(t) for t in texts], kind="stable")[::-1]
+    vectors = _worker_model.encode(
+        [texts[i] for i in order],
+        batch_size=batch_size,
+        show_progress_bar=False,
+        convert_to_numpy=True
+    )
+    out = np.empty_like(vectors)
+    out[order] = vectors
+    return chunk_id, out.astype("float32")
+
+
+# ------------------------
+# 체크포인트
+# ------------------------
+def _read_state(directory: str) -> dict:
+    path = os.path.join(directory, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_state(directory: str, state: dict) -> None:
+    path = os.path.join(directory, STATE_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+def find_unfinished_build(root: str, input_path: str) -> Optional[str]:
+    """같은 입력으로 시작했다가 manifest.json 없이 중단된 가장 최근 빌드"""
+    versions_dir = os.path.join(root, VERSIONS_DIR)
+    if not os.path.isdir(versions_dir):
+        return None
+    candidates = []
+    for name in os.listdir(versions_dir):
+        directory = os.path.join(versions_dir, name)
+        if os.path.exists(os.path.join(directory, MANIFEST_FILE)):
+            continue
+        if _read_state(directory).get("input") == os.path.abspath(input_path):
+            candidates.append(name)
+    return max(candidates) if candidates else None
+
+
+# ------------------------
+# 입력 스트리밍
+# ------------------------
+def iter_chunks(input_path: str, chunk_rows: int, skip=()) -> Iterator[Tuple[int, int, list]]:
+    """
+    case_text 컬럼만 스트리밍해서 고정 크기 청크로 묶음
+    Yields:
+        (청크 번호, 시작 행, 텍스트 목록) — 이미 끝난 청크(skip)는 건너뜀
+    """
+    dataset = open_parquet_source(input_path)
+    buffer, chunk_id, start = [], 0, 0
+    for batch in dataset.to_batches(columns=["case_text"], batch_size=chunk_rows):
+        buffer.extend("" if t is None else str(t) for t in batch.column(0).to_pylist())
+        while len(buffer) >= chunk_rows:
+            if chunk_id not in skip:
+                yield chunk_id, start, buffer[:chunk_rows]
+            buffer = buffer[chunk_rows:]
+            chunk_id += 1
+            start += chunk_rows
+    if buffer and chunk_id not in skip:
+        yield chunk_id, start, buffer
+
+
+# ------------------------
+# 빌드
+# ------------------------
+def build_index_file(embeddings: np.ndarray, metric: str, out_path: str, chunk_rows: int,
+                     clusters: Optional[np.ndarray] = None):
+    """
+    memmap 임베딩 → Flat 인덱스 (청크 단위로 float32 변환해서 추가)
+    clusters가 있으면 대표 행만 IndexIDMap2에 넣음 (id = 저장소 행 위치)
+    """
+    flat = faiss.IndexFlat(embeddings.shape[1], METRICS[metric])
+    index = faiss.IndexIDMap2(flat) if clusters is not None else flat
+    for offset in range(0, embeddings.shape[0], chunk_rows):
+        vectors = np.ascontiguousarray(embeddings[offset:offset + chunk_rows], dtype="float32")
+        if metric == "ip":
+            # inner product = 코사인 유사도가 되도록 정규화
+            faiss.normalize_L2(vectors)
+        if clusters is None:
+            index.add(vectors)
+            continue
+        positions = np.arange(offset, offset + len(vectors), dtype=np.int64)
+        canonical = clusters[offset:offset + len(vectors)] == positions
+        if canonical.any():
+            index.add_with_ids(np.ascontiguousarray(vectors[canonical]), positions[canonical])
+    faiss.write_index(index, out_path + ".tmp")
+    os.replace(out_path + ".tmp", out_path)
+    return index
+
+
+def build(root: str, input_path: str, version: Optional[str] = None,
+          model_name: str = DEFAULT_MODEL_NAME, workers: Optional[int] = None,
+          threads_per_worker: Optional[int] = None, dtype: str = "float16",
+          metric: str = "l2", chunk_rows: int = 4096, batch_size: int = 32,
+          max_seq_length: Optional[int] = None, cache_path: Optional[str] = None,
+          use_cache: bool = True, dedup_threshold: float = 0.0) -> str:
+    """
+    새 버전 디렉터리에 저장소 + 임베딩 + 인덱스 + manifest 생성 (중단 시 이어서 빌드)
+
+    Returns:
+        완성된 버전 디렉터리 경로
+    """
+    start_time = time.time()
+    workers = workers or os.cpu_count() or 1
+    threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+
+    version = version or find_unfinished_build(root, input_path) or new_version_name()
+    directory = os.path.join(root, VERSIONS_DIR, version)
+    if os.path.exists(os.path.join(directory, MANIFEST_FILE)):
+        raise FileExistsError(f"이미 완성된 버전입니다: {directory}")
+    os.makedirs(directory, exist_ok=True)
+
+    rows = open_parquet_source(input_path).count_rows()
+    state = _read_state(directory)
+    if state:
+        params = {"input": os.path.abspath(input_path), "model_name": model_name,
+                  "dtype": dtype, "chunk_rows": chunk_rows, "rows": rows}
+        if max_seq_length:
+            params["max_seq_length"] = max_seq_length
+        if "max_seq_length" not in state:
+            # 예전 build_state.json (max_seq_length 기록 전) → 완료된 청크는 모델 기본값으로 인코딩됨
+            probe = load_encoder(model_name, device="cpu")
+            state["max_seq_length"] = probe.max_seq_length
+            del probe
+            _write_state(directory, state)
+        changed = {k: (state.get(k), v) for k, v in params.items() if state.get(k) != v}
+        if changed:
+            raise ValueError(f"이전 빌드와 설정이 다릅니다 (새 --version 사용): {changed}")
+        dim = state["dim"]
+        max_seq_length = state["max_seq_length"]
+        print(f"🔄 중단된 빌드 이어서 진행: {version} ({len(state['done'])}개 청크 완료)")
+    else:
+        # 차원/최대 길이만 확인하고 바로 해제 (인코딩은 워커에서)
+        probe = load_encoder(model_name, device="cpu")
+        dim = probe.get_sentence_embedding_dimension()
+        max_seq_length = max_seq_length or probe.max_seq_length
+        del probe
+        state = {
+            "input": os.path.abspath(input_path), "model_name": model_name,
+            "dtype": dtype, "chunk_rows": chunk_rows, "rows": rows, "dim": dim,
+            "max_seq_length": max_seq_length, "done": [],
+        }
+        _write_state(directory, state)
+        print(f"🚀 인덱스 빌드 시작: {version} ({rows} rows, dim={dim}, workers={workers})")
+
+    # 1️⃣ 판례 저장소 (rename으로 생성되므로 파일이 있으면 완성본)
+    if not os.path.exists(os.path.join(directory, CASE_STORE_FILE)):
+        build_case_store(input_path, directory)
+
+    # 2️⃣ 임베딩 (연속 memmap, 청크 단위 체크포인트)
+    emb_path = os.path.join(directory, EMBEDDINGS_FILE)
+    if os.path.exists(emb_path):
+        embeddings = np.load(emb_path, mmap_mode="r+")
+    else:
+        embeddings = np.lib.format.open_memmap(emb_path, mode="w+", dtype=dtype, shape=(rows, dim))
+
+    cache = None
+    if use_cache:
+        cache = EmbeddingCache(cache_path or os.path.join(root, CACHE_FILE), model_name, max_seq_length)
+
+    done = set(state["done"])
+    total_chunks = (rows + chunk_rows - 1) // chunk_rows
+    chunk_info = {}
+    encode_start = time.time()
+    encoded_rows = 0
+
+    def finish_chunk(chunk_id: int, start: int, vectors: np.ndarray):
+        nonlocal encoded_rows
+        embeddings[start:start + len(vectors)] = vectors
+        embeddings.flush()
+
+        done.add(chunk_id)
+        state["done"] = sorted(done)
+        _write_state(directory, state)
+
+        encoded_rows += len(vectors)
+        elapsed = time.time() - encode_start
+        print(f"   청크 {len(done)}/{total_chunks} 완료 ({encoded_rows / max(elapsed, 1e-6):.0f} rows/s)")
+
+    # spawn: torch 스레드가 있는 부모를 fork하지 않음
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(model_name, threads_per_worker, max_seq_length),
+    ) as pool:
+        pending = set()
+        chunks = iter_chunks(input_path, chunk_rows, skip=done)
+
+        def submit_next() -> bool:
+            """다음 청크 제출 (캐시로 모두 채워지는 청크는 바로 기록하고 그 다음 청크로)"""
+            for chunk_id, start, texts in chunks:
+                vectors = np.zeros((len(texts), dim), dtype="float32")
+                keys, missing = None, list(range(len(texts)))
+                if cache is not None:
+                    keys = cache.keys(texts)
+                    found = cache.get_many(keys)
+                    missing = [i for i, k in enumerate(keys) if k not in found]
+                    for i, k in enumerate(keys):
+                        if k in found:
+                            vectors[i] = found[k]
+
+                if not missing:
+                    finish_chunk(chunk_id, start, vectors)
+                    continue
+
+                chunk_info[chunk_id] = (start, vectors, keys, missing)
+                pending.add(pool.submit(
+                    _encode_chunk, chunk_id, [texts[i] for i in missing], batch_size
+                ))
+                return True
+            return False
+
+        # 메모리에 올라오는 텍스트는 (워커 수 × 2) 청크로 제한
+        while len(pending) < workers * 2 and submit_next():
+            pass
+
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                pending.discard(future)
+                chunk_id, encoded = future.result()
+                start, vectors, keys, missing = chunk_info.pop(chunk_id)
+                vectors[missing] = encoded
+                if cache is not None:
+                    cache.put_many([keys[i] for i in missing], encoded)
+                finish_chunk(chunk_id, start, vectors)
+                submit_next()
+
+    cache_stats = cache.stats() if cache is not None else None
+    if cache is not None:
+        cache.close()
+        print(f"📦 임베딩 캐시: 히트 {cache_stats['hits']}건 / 미스 {cache_stats['misses']}건")
+
+    # 3️⃣ 근사 중복 제거 (선택): 대표 행만 인덱스에 넣고 클러스터 소속은 clusters.npy로 저장
+    clusters, dedup_stats = None, None
+    if dedup_threshold > 0:
+        dedup_start = time.time()
+        signatures = dedup.compute_signatures(iter_chunks(input_path, chunk_rows), rows, workers=workers)
+        clusters = dedup.lsh_clusters(signatures, threshold=dedup_threshold)
+        np.save(os.path.join(directory, CLUSTERS_FILE), clusters)
+        print(f"✅ 근사 중복 탐지 완료 ({time.time() - dedup_start:.1f}s)")
+
+    # 4️⃣ FAISS 인덱스
+    index = build_index_file(embeddings, metric, os.path.join(directory, INDEX_FILE), chunk_rows, clusters)
+    index_rows = index.ntotal
+    if clusters is not None:
+        dedup_stats = dedup.dedup_report(
+            embeddings, clusters, index, METRICS[metric], normalize=(metric == "ip")
+        )
+        dedup_stats["threshold"] = dedup_threshold
+        dedup.print_report(dedup_stats)
+    del embeddings, index
+
+    # 5️⃣ manifest (마지막 기록 → 서비스가 새 버전으로 교체)
+    build_seconds = round(time.time() - start_time, 1)
+    write_manifest(
+        directory,
+        version=version,
+        model_name=model_name,
+        dim=dim,
+        metric=metric,
+        rows=index_rows,
+        store_rows=rows,
+        embeddings_file=EMBEDDINGS_FILE,
+        embeddings_dtype=dtype,
+        max_seq_length=max_seq_length,
+        workers=workers,
+        embedding_cache=cache_stats,
+        dedup=dedup_stats,
+        build_seconds=build_seconds,
+    )
+    os.remove(os.path.join(directory, STATE_FILE))
+    print(f"✅ 인덱스 빌드 완료: {directory} ({index_rows} rows, {build_seconds}s)")
+    return directory
+
+
+def main():
+    parser = argparse.ArgumentParser(description="병렬/재개 가능한 인덱스 빌드")
+    parser.add_argument("--root", required=True, help="아티팩트 루트 디렉터리")
+    parser.add_argument("--input", required=True, help="정제된 판례 parquet 파일 또는 pipeline.ingest 출력 디렉터리")
+    parser.add_argument("--version", help="버전 이름 (기본: 중단된 빌드가 있으면 이어서, 없으면 타임스탬프)")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--workers", type=int, help="인코딩 프로세스 수 (기본: CPU 코어 수)")
+    parser.add_argument("--threads-per-worker", type=int, help="워커당 torch 스레드 수 (기본: 코어 수 / 워커 수)")
+    parser.add_argument("--dtype", choices=["float16", "float32"], default="float16", help="임베딩 memmap 저장 타입")
+    parser.add_argument("--metric", choices=sorted(METRICS), default="l2")
+    parser.add_argument("--chunk-rows", type=int, default=4096, help="체크포인트 단위 행 수")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-seq-length", type=int)
+    parser.add_argument("--cache", help=f"임베딩 캐시 경로 (기본: <root>/{CACHE_FILE})")
+    parser.add_argument("--no-cache", action="store_true", help="임베딩 캐시 사용 안 함")
+    parser.add_argument("--dedup-threshold", type=float, default=0.0,
+                        help="근사 중복 제거 자카드 임계값 (예: 0.8, 0이면 사용 안 함)")
+    args = parser.parse_args()
+
+    build(
+        args.root, args.input,
+        version=args.version,
+        model_name=args.model,
+        workers=args.workers,
+        threads_per_worker=args.threads_per_worker,
+        dtype=args.dtype,
+        metric=args.metric,
+        chunk_rows=args.chunk_rows,
+        batch_size=args.batch_size,
+        max_seq_length=args.max_seq_length,
+        cache_path=args.cache,
+        use_cache=not args.no_cache,
+        dedup_threshold=args.dedup_threshold,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+# pipeline/dedup.py
+"""
+근사 중복 판례 탐지 (MinHash + LSH)
+- 함께 선고된 관련 사건, 반복되는 정형 문구 때문에 거의 같은 판례가 많음
+  → 검색 top-k를 같은 내용이 채우고 인덱스 크기/검색 시간만 늘어남
+- case_text를 문자 n-gram으로 쪼개 MinHash 시그니처 계산 → LSH 밴드 버킷으로 후보 탐색
+  → 시그니처 일치율(추정 자카드)로 검증 후 union-find로 클러스터 구성
+- 클러스터마다 대표(가장 앞 행) 하나만 벡터 인덱스에 넣고, 소속 정보는 clusters.npy로 저장
+  (clusters[i] = 행 i가 속한 클러스터의 대표 행 위치, 서비스에서 중복 판례 펼쳐보기에 사용)
+
+build_index --dedup-threshold 0.8 로 인덱스 빌드 단계에서 실행
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, Iterable, Tuple
+
+import faiss
+import numpy as np
+
+from app.delta_segment import normalize_text
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+NUM_BANDS = 16
+DEFAULT_THRESHOLD = 0.8
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_SEED = 20240101
+
+
+def _permutations(num_perm: int) -> Tuple[np.ndarray, np.ndarray]:
+    """MinHash 해시 함수 (a * h + b) mod p 의 계수 (빌드마다 같은 값)"""
+    rng = np.random.RandomState(_SEED)
+    a = rng.randint(1, (1 << 31) - 1, size=num_perm).astype(np.uint64)
+    b = rng.randint(0, (1 << 31) - 1, size=num_perm).astype(np.uint64)
+    return a, b
+
+
+def shingle_hashes(text, shingle_size: int = SHINGLE_SIZE) -> np.ndarray:
+    """정규화 텍스트의 문자 n-gram 해시 (32bit, 중복 제거)"""
+    codes = np.frombuffer(normalize_text(text).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if len(codes) == 0:
+        return np.zeros(1, dtype=np.uint64)
+    k = min(shingle_size, len(codes))
+    n = len(codes) - k + 1
+    # 다항식 롤링 해시 (uint64 오버플로는 의도된 wrap-around)
+    with np.errstate(over="ignore"):
+        h = np.zeros(n, dtype=np.uint64)
+        for j in range(k):
+            h = h * np.uint64(1000003) + codes[j:j + n]
+        h ^= h >> np.uint64(29)
+    return np.unique(h & _MAX_HASH)
+
+
+def minhash_signatures(texts, num_perm: int = NUM_PERM,
+                       shingle_size: int = SHINGLE_SIZE) -> np.ndarray:
+    """텍스트 목록 → (len, num_perm) uint32 MinHash 시그니처"""
+    a, b = _permutations(num_perm)
+    out = np.empty((len(texts), num_perm), dtype=np.uint32)
+    with np.errstate(over="ignore"):
+        for i, text in enumerate(texts):
+            h = shingle_hashes(text, shingle_size)
+            out[i] = (((np.outer(h, a) + b) % _MERSENNE_PRIME) & _MAX_HASH).min(axis=0)
+    return out
+
+
+def _signature_chunk(chunk_id: int, texts: list, num_perm: int, shingle_size: int):
+    return chunk_id, minhash_signatures(texts, num_perm, shingle_size)
+
+
+def compute_signatures(chunks: Iterable[Tuple[int, int, list]], rows: int,
+                       workers: int = 1, num_perm: int = NUM_PERM,
+                       shingle_size: int = SHINGLE_SIZE) -> np.ndarray:
+    """
+    (청크 번호, 시작 행, 텍스트 목록) 스트림 → 전체 시그니처 (rows, num_perm)
+    workers > 1 이면 청크를 프로세스 풀에 분배
+    """
+    signatures = np.zeros((rows, num_perm), dtype=np.uint32)
+    starts = {}
+
+    def tasks():
+        for chunk_id, start, texts in chunks:
+            starts[chunk_id] = start
+            yield chunk_id, texts
+
+    if workers <= 1:
+        for chunk_id, texts in tasks():
+            _, sig = _signature_chunk(chunk_id, texts, num_perm, shingle_size)
+            signatures[starts[chunk_id]:starts[chunk_id] + len(sig)] = sig
+        return signatures
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+        pending = []
+        for chunk_id, texts in tasks():
+            pending.append(pool.submit(_signature_chunk, chunk_id, texts, num_perm, shingle_size))
+            # 메모리에 올라오는 텍스트는 (워커 수 × 2) 청크로 제한
+            if len(pending) >= workers * 2:
+                chunk_id, sig = pending.pop(0).result()
+                signatures[starts[chunk_id]:starts[chunk_id] + len(sig)] = sig
+        for future in pending:
+            chunk_id, sig = future.result()
+            signatures[starts[chunk_id]:starts[chunk_id] + len(sig)] = sig
+    return signatures
+
+
+def _find(parent: np.ndarray, i: int) -> int:
+    root = i
+    while parent[root] != root:
+        root = parent[root]
+    while parent[i] != root:
+        parent[i], i = root, parent[i]
+    return root
+
+
+def lsh_clusters(signatures: np.ndarray, threshold: float = DEFAULT_THRESHOLD,
+                 num_bands: int = NUM_BANDS) -> np.ndarray:
+    """
+    LSH 밴드 버킷 → 후보 쌍 검증(시그니처 일치율 ≥ threshold) → union-find
+
+    Returns:
+        clusters: 행마다 대표 행 위치 (대표 = 클러스터에서 가장 앞 행, 중복 없는 행은 자기 자신)
+    """
+    n, num_perm = signatures.shape
+    rows_per_band = num_perm // num_bands
+    parent = np.arange(n, dtype=np.int64)
+
+    for band in range(num_bands):
+        cols = signatures[:, band * rows_per_band:(band + 1) * rows_per_band]
+        keys = np.ascontiguousarray(cols).view(np.dtype((np.void, cols.dtype.itemsize * cols.shape[1]))).ravel()
+        _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        if counts.max(initial=0) < 2:
+            continue
+
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.cumsum(counts)[:-1]
+        for members in np.split(order, bounds):
+            if len(members) < 2:
+                continue
+            head = members[0]
+            # 버킷 첫 행과의 추정 자카드로 거짓 양성 제거
+            similarity = (signatures[members[1:]] == signatures[head]).mean(axis=1)
+            for m in members[1:][similarity >= threshold]:
+                ra, rb = _find(parent, head), _find(parent, int(m))
+                if ra != rb:
+                    parent[max(ra, rb)] = min(ra, rb)
+
+    # 루트 = 클러스터 최소 행 위치 (항상 작은 쪽으로 합치므로)
+    return np.array([_find(parent, i) for i in range(n)], dtype=np.int64)
+
+
+def canonical_positions(clusters: np.ndarray) -> np.ndarray:
+    """대표 행 위치 (벡터 인덱스에 들어가는 행)"""
+    return np.flatnonzero(clusters == np.arange(len(clusters)))
+
+
+def _search_latency(index, queries: np.ndarray, k: int, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        index.search(queries, k)
+        best = min(best, time.perf_counter() - start)
+    return best / len(queries) * 1000
+
+
+def dedup_report(embeddings: np.ndarray, clusters: np.ndarray, dedup_index,
+                 metric_type: int, queries: int = 200, k: int = 50,
+                 normalize: bool = False) -> Dict[str, float]:
+    """
+    인덱스 축소율 + 검색 지연 비교 (전체 행 Flat 인덱스 vs 대표 행만 넣은 인덱스)
+    쿼리는 코퍼스 임베딩에서 무작위 추출
+    """
+    rows = len(clusters)
+    canonical = int(len(canonical_positions(clusters)))
+    report = {
+        "rows": rows,
+        "canonical_rows": canonical,
+        "duplicate_rows": rows - canonical,
+        "clusters_with_duplicates": int((np.bincount(clusters, minlength=rows) > 1).sum()),
+        "index_shrink_ratio": round(1 - canonical / rows, 4) if rows else 0.0,
+    }
+    if rows == 0:
+        return report
+
+    rng = np.random.RandomState(_SEED)
+    sample = np.sort(rng.choice(rows, size=min(queries, rows), replace=False))
+    query_vecs = np.ascontiguousarray(embeddings[sample], dtype="float32")
+
+    full = faiss.IndexFlat(embeddings.shape[1], metric_type)
+    for offset in range(0, rows, 8192):
+        vectors = np.ascontiguousarray(embeddings[offset:offset + 8192], dtype="float32")
+        if normalize:
+            faiss.normalize_L2(vectors)
+        full.add(vectors)
+
+    full_ms = _search_latency(full, query_vecs, k)
+    dedup_ms = _search_latency(dedup_index, query_vecs, k)
+    report.update({
+        "latency_full_ms": round(full_ms, 3),
+        "latency_dedup_ms": round(dedup_ms, 3),
+        "latency_speedup": round(full_ms / dedup_ms, 2) if dedup_ms > 0 else None,
+    })
+    return report
+
+
+def print_report(report: Dict[str, float]) -> None:
+    print("=" * 60)
+    print("📊 근사 중복 제거 결과")
+    print(f"   전체 {report['rows']}행 → 인덱스 {report['canonical_rows']}행 "
+          f"(중복 {report['duplicate_rows']}행, {report['index_shrink_ratio'] * 100:.1f}% 축소)")
+    print(f"   중복이 있는 클러스터: {report['clusters_with_duplicates']}개")
+    if "latency_full_ms" in report:
+        print(f"   검색 지연: {report['latency_full_ms']:.3f} ms → {report['latency_dedup_ms']:.3f} ms "
+              f"(x{report['latency_speedup']})")
+    print("=" * 60)
@@ -0,0 +1,87 @@
+# pipeline/embedding_cache.py
+"""
+내용 주소 기반 임베딩 캐시 (sqlite)
+- 키 = sha1(정규화 텍스트 + 인코더 모델 이름 + max_seq_length)
+- 재빌드/재수집 시 캐시를 먼저 조회하고 미스만 인코딩
+  → 재빌드 비용이 코퍼스 크기가 아니라 바뀐 텍스트 양에 비례
+- 벡터는 float32 원본 그대로 저장 (memmap dtype과 무관하게 재사용)
+"""
+import hashlib
+import os
+import sqlite3
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from app.delta_segment import normalize_text
+
+CACHE_FILE = "embedding_cache.sqlite"
+
+# sqlite 바인딩 변수 개수 제한 (구버전 기본값 999) 안쪽으로 나눠 조회
+_QUERY_CHUNK = 900
+
+
+def cache_key(text, model_name: str, max_seq_length: Optional[int]) -> str:
+    payload = "\x00".join([normalize_text(text), model_name, str(max_seq_length)])
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """단일 프로세스(빌드 부모 프로세스)에서 읽고 쓰는 임베딩 캐시"""
+
+    def __init__(self, path: str, model_name: str, max_seq_length: Optional[int]):
+        self.path = path
+        self.model_name = model_name
+        self.max_seq_length = max_seq_length
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " dim INTEGER NOT NULL,"
+            " vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def keys(self, texts: Sequence) -> list:
+        return [cache_key(t, self.model_name, self.max_seq_length) for t in texts]
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """캐시에 있는 키만 {키: 벡터}로 반환"""
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        for i in range(0, len(unique), _QUERY_CHUNK):
+            part = unique[i:i + _QUERY_CHUNK]
+            rows = self._conn.execute(
+                f"SELECT key, dim, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})",
+                part,
+            ).fetchall()
+            for key, dim, blob in rows:
+                found[key] = np.frombuffer(blob, dtype="float32", count=dim)
+        self.hits += sum(1 for k in keys if k in found)
+        self.misses += sum(1 for k in keys if k not in found)
+        return found
+
+    def put_many(self, keys: Sequence[str], vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors, dtype="float32")
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, dim, vector) VALUES (?, ?, ?)",
+            [(k, int(v.shape[0]), v.tobytes()) for k, v in zip(keys, vectors)],
+        )
+        self._conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def close(self) -> None:
+        self._conn.close()
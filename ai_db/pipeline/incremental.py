@@ -0,0 +1,375 @@
+# pipeline/incremental.py
+"""
+증분 인덱스 업데이트 CLI (ai_db 디렉터리에서 실행)
+
+  # 신규/변경 판례만 임베딩해서 델타 배치로 추가 → 서비스 감시 주기(기본 30초) 안에 검색 가능
+  python -m pipeline.incremental append --root <artifact_root> --input new_cases.parquet [--removed removed_ids.txt]
+
+  # 메인 + 델타를 새 버전으로 병합 (툼스톤 제거, --every 초 간격으로 반복 실행)
+  python -m pipeline.incremental merge --root <artifact_root> [--every 3600] [--min-rows 1]
+
+비용은 전체 코퍼스가 아니라 추가/변경분(delta) 크기에 비례
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+from typing import Optional
+
+import faiss
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from app.bert_encoder import load_encoder
+from app.case_store import CLUSTERS_FILE, CaseStore, write_case_store
+from app.corpus import (
+    INDEX_FILE, VERSIONS_DIR,
+    active_version_dir, new_version_name, read_manifest, write_manifest,
+)
+from app.delta_segment import (
+    CONTENT_HASH_COLUMN, DELTA_DIR,
+    DeltaSegment, content_hash, list_batches,
+)
+from app.search_engine import read_index_mmap
+from app.sections import section_frame
+from pipeline.embedding_cache import CACHE_FILE, EmbeddingCache
+
+DEFAULT_MODEL_NAME = "snunlp/KR-SBERT-V40K-klueNLI-augSTS"
+CHUNK_ROWS = 8192
+
+
+def _open_active(root: str):
+    """현재 버전의 저장소/인덱스/델타 열기"""
+    version, directory = active_version_dir(root)
+    store = CaseStore(directory)
+    main_index = read_index_mmap(os.path.join(directory, INDEX_FILE))
+    delta = DeltaSegment(directory, store, main_index.d, main_index.metric_type)
+    delta.refresh()
+    return version, directory, store, main_index, delta
+
+
+def _max_seq_length(root: str, directory: str) -> Optional[int]:
+    """
+    빌드 때 임베딩에 쓴 max_seq_length (manifest, 없으면 parent_version 을 따라 올라가며 찾음)
+    → 예전 병합 manifest 에 빠져 있어도 캐시 키/인코딩 길이를 빌드 때와 맞춤
+    """
+    manifest = read_manifest(directory)
+    while manifest:
+        if manifest.get("max_seq_length"):
+            return manifest["max_seq_length"]
+        parent = manifest.get("parent_version")
+        if not parent:
+            break
+        manifest = read_manifest(os.path.join(root, VERSIONS_DIR, parent))
+    return None
+
+
+def _normalize_id(value) -> str:
+    return str(value).strip() if pd.notna(value) else ""
+
+
+# ------------------------
+# append
+# ------------------------
+def append(root: str, input_path: str, removed_path: Optional[str] = None,
+           model_name: Optional[str] = None, batch_size: int = 32,
+           use_cache: bool = True) -> Optional[str]:
+    """
+    신규/변경 판례만 임베딩해서 델타 배치 생성
+
+    Returns:
+        생성된 배치 id (변경 없으면 None)
+    """
+    start = time.time()
+    version, directory, store, main_index, delta = _open_active(root)
+    model_name = model_name or read_manifest(directory).get("model_name", DEFAULT_MODEL_NAME)
+    max_seq_length = _max_seq_length(root, directory)
+
+    incoming = pd.read_parquet(input_path)
+    incoming["_id"] = incoming["사건번호"].map(_normalize_id)
+    # 같은 사건번호가 여러 번 들어오면 마지막 것만 사용
+    incoming = incoming[incoming["_id"] != ""].drop_duplicates("_id", keep="last")
+    incoming[CONTENT_HASH_COLUMN] = incoming["case_text"].map(content_hash)
+
+    # 기존 내용 해시 (사건번호가 겹치는 행만 계산)
+    old_hash = {}
+    main_ids = [i for i in incoming["_id"] if i in store.case_id_to_idx and i not in delta.case_id_to_delta]
+    if main_ids:
+        positions = [store.case_id_to_idx[i] for i in main_ids]
+        texts = store.take(positions, columns=["case_text"])["case_text"].tolist()
+        old_hash.update({i: content_hash(t) for i, t in zip(main_ids, texts)})
+    for i in incoming["_id"]:
+        if i in delta.case_id_to_delta:
+            old_hash[i] = delta.rows.at[delta.case_id_to_delta[i], CONTENT_HASH_COLUMN]
+
+    changed = incoming[incoming["_id"].map(old_hash.get) != incoming[CONTENT_HASH_COLUMN]]
+
+    removed = []
+    if removed_path:
+        with open(removed_path, encoding="utf-8") as f:
+            removed = [line.strip() for line in f if line.strip()]
+
+    print(f"📥 입력 {len(incoming)}건 → 신규/변경 {len(changed)}건, 삭제 {len(removed)}건 (버전 {version})")
+    if len(changed) == 0 and not removed:
+        print("✅ 변경 없음")
+        return None
+
+    # 변경분만 임베딩 (임베딩 캐시에 있는 텍스트는 재사용)
+    if len(changed) > 0:
+        texts = changed["case_text"].fillna("").tolist()
+        vectors = np.zeros((len(texts), main_index.d), dtype="float32")
+        missing = list(range(len(texts)))
+        cache, keys, model = None, None, None
+        if max_seq_length is None:
+            # 기록이 없는 예전 버전 → 빌드 때처럼 모델 기본값 (None 으로 캐시 키를 만들면 전부 miss)
+            model = load_encoder(model_name)
+            max_seq_length = model.max_seq_length
+            print(f"⚠️ manifest 에 max_seq_length 없음 → 모델 기본값 {max_seq_length} 사용")
+        if use_cache:
+            cache = EmbeddingCache(os.path.join(root, CACHE_FILE), model_name, max_seq_length)
+            keys = cache.keys(texts)
+            found = cache.get_many(keys)
+            missing = [i for i, k in enumerate(keys) if k not in found]
+            for i, k in enumerate(keys):
+                if k in found:
+                    vectors[i] = found[k]
+
+        if missing:
+            model = model or load_encoder(model_name)
+            model.max_seq_length = max_seq_length
+            encoded = model.encode(
+                [texts[i] for i in missing],
+                batch_size=batch_size,
+                show_progress_bar=True,
+                convert_to_numpy=True
+            ).astype("float32")
+            if encoded.shape[1] != main_index.d:
+                raise ValueError(f"차원 불일치: {encoded.shape[1]} != {main_index.d}")
+            vectors[missing] = encoded
+            if cache is not None:
+                cache.put_many([keys[i] for i in missing], encoded)
+        if cache is not None:
+            print(f"📦 임베딩 캐시: 히트 {cache.hits}건 / 미스 {cache.misses}건")
+            cache.close()
+
+        if main_index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            # build_index --metric ip 와 같은 정규화
+            faiss.normalize_L2(vectors)
+    else:
+        vectors = np.zeros((0, main_index.d), dtype="float32")
+
+    # 섹션 오프셋/판결 결과는 추가 시점에 1회 계산
+    sections = section_frame(changed["case_text"].tolist())
+    sections.index = changed.index
+    changed = changed.drop(columns=[c for c in sections.columns if c in changed.columns]).join(sections)
+    rows = changed.reindex(columns=list(store.columns) + [CONTENT_HASH_COLUMN])
+
+    # 임시 디렉터리에 쓴 뒤 rename → 서비스는 완성된 배치만 봄
+    batch_id = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    delta_dir = os.path.join(directory, DELTA_DIR)
+    tmp_dir = os.path.join(delta_dir, f".tmp-{batch_id}")
+    os.makedirs(tmp_dir, exist_ok=True)
+    np.save(os.path.join(tmp_dir, "vectors.npy"), vectors)
+    rows.to_parquet(os.path.join(tmp_dir, "rows.parquet"), index=False)
+    with open(os.path.join(tmp_dir, "tombstones.json"), "w", encoding="utf-8") as f:
+        json.dump(removed, f, ensure_ascii=False)
+    os.rename(tmp_dir, os.path.join(delta_dir, batch_id))
+
+    print(f"✅ 델타 배치 생성: {batch_id} ({len(rows)}행, {time.time() - start:.1f}s)")
+    return batch_id
+
+
+# ------------------------
+# merge
+# ------------------------
+def _main_vectors(main_index):
+    """메인 인덱스 벡터를 (저장소 행 위치, 벡터) 청크로 순회 (IndexIDMap2면 id = 행 위치)"""
+    if hasattr(main_index, "id_map"):
+        ids = faiss.vector_to_array(main_index.id_map).astype(np.int64)
+        base = faiss.downcast_index(main_index.index)
+    else:
+        ids, base = np.arange(main_index.ntotal, dtype=np.int64), main_index
+    for offset in range(0, base.ntotal, CHUNK_ROWS):
+        n = min(CHUNK_ROWS, base.ntotal - offset)
+        yield ids[offset:offset + n], base.reconstruct_n(offset, n)
+
+
+def _row_vectors(directory: str, store: CaseStore, positions: np.ndarray, metric_type: int) -> np.ndarray:
+    """인덱스에 없는 행(중복 클러스터 구성원)의 벡터: embeddings.npy가 있으면 사용, 없으면 재인코딩"""
+    manifest = read_manifest(directory)
+    emb_path = os.path.join(directory, manifest.get("embeddings_file", "embeddings.npy"))
+    if os.path.exists(emb_path):
+        vectors = np.asarray(np.load(emb_path, mmap_mode="r")[positions], dtype="float32")
+    else:
+        model = load_encoder(manifest.get("model_name", DEFAULT_MODEL_NAME))
+        texts = store.take(positions, columns=["case_text"])["case_text"].fillna("").tolist()
+        vectors = model.encode(texts, convert_to_numpy=True).astype("float32")
+    if metric_type == faiss.METRIC_INNER_PRODUCT:
+        faiss.normalize_L2(vectors)
+    return vectors
+
+
+def _merge_deduplicated(directory: str, store: CaseStore, main_index, delta: DeltaSegment,
+                        keep: np.ndarray, new_dir: str):
+    """
+    근사 중복 제거 버전 병합: 클러스터 위치를 새 행 번호로 옮기고 대표 행만 IndexIDMap2에 추가
+    - 대표 행이 툼스톤으로 빠진 클러스터는 남은 구성원 중 가장 앞 행을 새 대표로 승격
+    - 델타 행은 각자 자기 자신이 대표
+    """
+    clusters = np.asarray(store.clusters)
+    kept_old = np.flatnonzero(keep)
+    new_pos = np.cumsum(keep) - 1
+    main_kept = len(kept_old)
+    live_count = int(delta.live.sum())
+
+    new_clusters = np.arange(main_kept + live_count, dtype=np.int64)
+    canonical_old = clusters[kept_old]
+    alive = keep[canonical_old]
+    new_clusters[:main_kept][alive] = new_pos[canonical_old[alive]]
+
+    promoted = {}
+    for pos in np.flatnonzero(~alive):
+        # 새 위치 오름차순 → 각 클러스터에서 처음 만난 행이 새 대표
+        new_clusters[pos] = promoted.setdefault(int(canonical_old[pos]), int(pos))
+
+    index = faiss.IndexIDMap2(faiss.IndexFlat(main_index.d, main_index.metric_type))
+    for ids, vectors in _main_vectors(main_index):
+        mask = keep[ids]
+        if mask.any():
+            index.add_with_ids(np.ascontiguousarray(vectors[mask]), new_pos[ids[mask]])
+    if promoted:
+        promoted_new = np.array(sorted(promoted.values()), dtype=np.int64)
+        vectors = _row_vectors(directory, store, kept_old[promoted_new], main_index.metric_type)
+        index.add_with_ids(np.ascontiguousarray(vectors), promoted_new)
+        print(f"🔄 대표 행이 삭제된 중복 클러스터 {len(promoted)}개 → 새 대표 승격")
+    if delta.index.ntotal > 0 and live_count:
+        vectors = delta.index.reconstruct_n(0, delta.index.ntotal)[delta.live]
+        index.add_with_ids(
+            np.ascontiguousarray(vectors),
+            np.arange(main_kept, main_kept + live_count, dtype=np.int64)
+        )
+
+    np.save(os.path.join(new_dir, CLUSTERS_FILE), new_clusters)
+    return index
+
+
+def merge(root: str, min_rows: int = 1) -> Optional[str]:
+    """
+    메인 + 델타를 새 버전으로 압축 (툼스톤 행 제거)
+    manifest.json을 마지막에 기록하므로 서비스는 완성된 뒤에만 교체
+
+    Returns:
+        새 버전 이름 (병합할 것이 없으면 None)
+    """
+    start = time.time()
+    version, directory, store, main_index, delta = _open_active(root)
+    dead = int(delta.main_dead.sum())
+    live_rows = delta.rows[delta.live] if len(delta) else delta.rows
+
+    if len(live_rows) < min_rows and dead == 0:
+        print(f"✅ 병합할 델타 없음 (버전 {version}, 델타 {len(live_rows)}행)")
+        return None
+
+    new_version = new_version_name()
+    new_dir = os.path.join(root, VERSIONS_DIR, new_version)
+    keep = ~delta.main_dead
+    schema = store.table.schema
+
+    # 1️⃣ 판례 저장소: 메인(툼스톤 제외) + 델타 유효 행
+    def batches():
+        for offset in range(0, len(store), CHUNK_ROWS):
+            chunk = store.table.slice(offset, CHUNK_ROWS)
+            mask = keep[offset:offset + CHUNK_ROWS]
+            if not mask.all():
+                chunk = chunk.filter(pa.array(mask))
+            yield from chunk.to_batches()
+        if len(live_rows) > 0:
+            df = live_rows.drop(columns=[CONTENT_HASH_COLUMN], errors="ignore")
+            yield pa.RecordBatch.from_pandas(
+                df.reindex(columns=schema.names), schema=schema, preserve_index=False
+            )
+
+    write_case_store(batches(), schema, new_dir)
+
+    # 2️⃣ 인덱스: 메인 벡터(툼스톤 제외) + 델타 유효 벡터 (재임베딩 없음)
+    if store.clusters is None:
+        index = faiss.IndexFlat(main_index.d, main_index.metric_type)
+        for ids, vectors in _main_vectors(main_index):
+            index.add(np.ascontiguousarray(vectors[keep[ids]]))
+        if delta.index.ntotal > 0:
+            vectors = delta.index.reconstruct_n(0, delta.index.ntotal)
+            index.add(np.ascontiguousarray(vectors[delta.live]))
+    else:
+        index = _merge_deduplicated(directory, store, main_index, delta, keep, new_dir)
+    faiss.write_index(index, os.path.join(new_dir, INDEX_FILE))
+
+    # 3️⃣ 병합 도중 도착한 배치는 새 버전의 델타로 이어 붙임
+    carried = [b for b in list_batches(delta.delta_dir) if b not in delta.applied_batches]
+    for batch_id in carried:
+        shutil.copytree(
+            os.path.join(delta.delta_dir, batch_id),
+            os.path.join(new_dir, DELTA_DIR, batch_id)
+        )
+
+    manifest = read_manifest(directory)
+    write_manifest(
+        new_dir,
+        version=new_version,
+        model_name=manifest.get("model_name", DEFAULT_MODEL_NAME),
+        max_seq_length=_max_seq_length(root, directory),
+        dim=main_index.d,
+        metric="ip" if main_index.metric_type == faiss.METRIC_INNER_PRODUCT else "l2",
+        rows=index.ntotal,
+        store_rows=int(keep.sum()) + len(live_rows),
+        parent_version=version,
+        merged_batches=delta.applied_batches,
+        carried_batches=carried,
+    )
+    print(
+        f"✅ 병합 완료: {version} → {new_version} "
+        f"(제거 {dead}행, 델타 {len(live_rows)}행, 총 {index.ntotal}행, {time.time() - start:.1f}s)"
+    )
+    return new_version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="증분 인덱스 업데이트")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_append = sub.add_parser("append", help="신규/변경 판례를 델타 배치로 추가")
+    p_append.add_argument("--root", required=True, help="아티팩트 루트 디렉터리")
+    p_append.add_argument("--input", required=True, help="신규/변경 판례 parquet (clean 스키마)")
+    p_append.add_argument("--removed", help="삭제할 사건번호 목록 파일 (한 줄에 하나)")
+    p_append.add_argument("--model", help="임베딩 모델 (기본: manifest의 model_name)")
+    p_append.add_argument("--batch-size", type=int, default=32)
+    p_append.add_argument("--no-cache", action="store_true", help="임베딩 캐시 사용 안 함")
+
+    p_merge = sub.add_parser("merge", help="메인 + 델타를 새 버전으로 병합")
+    p_merge.add_argument("--root", required=True)
+    p_merge.add_argument("--min-rows", type=int, default=1, help="이 행 수 미만이면 (툼스톤이 없을 때) 병합 생략")
+    p_merge.add_argument("--every", type=float, default=0, help="N초마다 반복 병합 (0이면 1회)")
+
+    args = parser.parse_args()
+
+    if args.command == "append":
+        append(args.root, args.input, args.removed, args.model, args.batch_size,
+               use_cache=not args.no_cache)
+        return
+
+    while True:
+        try:
+            merge(args.root, args.min_rows)
+        except Exception as e:
+            if not args.every:
+                raise
+            print(f"⚠️ 병합 실패: {e}")
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
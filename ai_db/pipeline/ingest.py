@@ -0,0 +1,180 @@
+# pipeline/ingest.py
+"""
+판례 원본 수집/정제 (01_dataset 노트북 대체, ai_db 디렉터리에서 실행)
+
+  python -m pipeline.ingest --source <원본 parquet 파일/디렉터리>... --out korean_precedents_clean
+
+- 원본: joonhok-exo-ai/korean_law_open_data_precedents 의 parquet 파일 (로컬에 내려받은 것)
+- 배치 단위 스트리밍 + pyarrow.compute 벡터 연산으로 case_text / 선고일자_norm 생성
+  (행 단위 apply 없음, 메모리는 입력 크기와 무관하게 배치 크기로 제한)
+- 길이 필터도 스트리밍 중에 적용
+- 섹션 오프셋(판시사항/판결요지/주문/이유)과 판결 결과/위험도도 여기서 1회 계산 (app/sections.py)
+- 출력: 사건종류명 파티션 parquet 데이터셋 (사건종류명=형사/part-0.parquet ...)
+  → pipeline.build_index --input, LEGAL_AI_SOURCE_PARQUET 에 디렉터리를 그대로 사용
+"""
+import argparse
+import os
+import time
+from typing import Iterator, List, Union
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from app.sections import SECTION_FIELDS, add_section_columns
+
+# case_text 구성 순서 ([사건명] ... \n[판시사항] ... \n[판결요지] ... \n[전문] ...)
+TEXT_FIELDS = ["사건명", "판시사항", "판결요지", "전문"]
+
+FINAL_COLUMNS = [
+    "판례정보일련번호",
+    "사건번호",
+    "사건명",
+    "법원명",
+    "사건종류명",
+    "판결유형",
+    "선고일자_norm",
+    "참조조문",
+    "case_text",
+    "text_length",
+]
+
+PASSTHROUGH_COLUMNS = ["판례정보일련번호", "사건번호", "법원명", "사건종류명", "판결유형", "참조조문"]
+
+MIN_TEXT_LENGTH = 200
+MAX_TEXT_LENGTH = 12000
+
+
+def normalize_date(values: pa.Array) -> pa.Array:
+    """
+    선고일자 → "YYYY-MM-DD" (8자리), "YYYY-01-01" (4자리), 그 외 null
+    숫자(int/float)와 문자열 입력 모두 처리
+    """
+    if pa.types.is_floating(values.type) or pa.types.is_integer(values.type):
+        text = pc.cast(pc.cast(values, pa.int64(), safe=False), pa.string())
+    else:
+        text = pc.utf8_trim_whitespace(pc.cast(values, pa.string()))
+        text = pc.replace_substring_regex(text, pattern=r"\.0+$", replacement="")
+
+    length = pc.utf8_length(text)
+    full = pc.binary_join_element_wise(
+        pc.utf8_slice_codeunits(text, 0, 4),
+        pc.utf8_slice_codeunits(text, 4, 6),
+        pc.utf8_slice_codeunits(text, 6, 8),
+        "-",
+    )
+    year_only = pc.binary_join_element_wise(text, "01-01", "-")
+    is_digits = pc.match_substring_regex(text, r"^[0-9]+$")
+
+    null = pa.scalar(None, pa.string())
+    return pc.if_else(
+        pc.and_(is_digits, pc.equal(length, 8)), full,
+        pc.if_else(pc.and_(is_digits, pc.equal(length, 4)), year_only, null)
+    )
+
+
+def build_case_text(batch: pa.RecordBatch) -> pa.Array:
+    """비어 있지 않은 필드만 "[필드명] 내용"으로 이어 붙임 (줄바꿈 구분)"""
+    parts = []
+    for field in TEXT_FIELDS:
+        values = pc.fill_null(pc.cast(batch.column(field), pa.string()), "")
+        labeled = pc.binary_join_element_wise(f"\n[{field}] ", values, "")
+        parts.append(pc.if_else(pc.equal(values, ""), "", labeled))
+    joined = pc.binary_join_element_wise(*parts, "")
+    # 첫 필드 앞의 구분자 제거
+    return pc.replace_substring_regex(joined, pattern=r"^\n", replacement="", max_replacements=1)
+
+
+def clean_batch(batch: pa.RecordBatch, min_length: int, max_length: int) -> pa.RecordBatch:
+    case_text = build_case_text(batch)
+    text_length = pc.cast(pc.utf8_length(case_text), pa.int64())
+
+    columns = {
+        name: batch.column(name) if name == "판례정보일련번호" else pc.cast(batch.column(name), pa.string())
+        for name in PASSTHROUGH_COLUMNS
+    }
+    columns["사건명"] = pc.fill_null(pc.cast(batch.column("사건명"), pa.string()), "")
+    columns["선고일자_norm"] = normalize_date(batch.column("선고일자"))
+    columns["case_text"] = case_text
+    columns["text_length"] = text_length
+
+    out = pa.RecordBatch.from_arrays(
+        [columns[name] for name in FINAL_COLUMNS], names=FINAL_COLUMNS
+    )
+    keep = pc.and_(pc.greater(text_length, min_length), pc.less(text_length, max_length))
+    return add_section_columns(out.filter(keep))
+
+
+def output_schema(source_schema: pa.Schema) -> pa.Schema:
+    """판례정보일련번호는 원본 타입 유지, 나머지는 문자열 (text_length만 int64)"""
+    fields = []
+    for name in FINAL_COLUMNS:
+        if name == "판례정보일련번호":
+            fields.append(source_schema.field(name))
+        elif name == "text_length":
+            fields.append(pa.field(name, pa.int64()))
+        else:
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields + SECTION_FIELDS)
+
+
+def iter_clean_batches(dataset: ds.Dataset, schema: pa.Schema, batch_size: int,
+                       min_length: int, max_length: int, stats: dict) -> Iterator[pa.RecordBatch]:
+    needed = sorted(set(PASSTHROUGH_COLUMNS + TEXT_FIELDS + ["선고일자"]))
+    for i, batch in enumerate(dataset.to_batches(columns=needed, batch_size=batch_size), 1):
+        stats["read"] += batch.num_rows
+        cleaned = clean_batch(batch, min_length, max_length).cast(schema)
+        stats["written"] += cleaned.num_rows
+        if i % 20 == 0:
+            print(f"   {stats['read']}행 처리 ({stats['written']}행 통과)")
+        yield cleaned
+
+
+def ingest(sources: Union[str, List[str]], out_dir: str, batch_size: int = 8192,
+           min_length: int = MIN_TEXT_LENGTH, max_length: int = MAX_TEXT_LENGTH) -> dict:
+    """
+    원본 parquet → 정제된 사건종류명 파티션 데이터셋
+
+    Returns:
+        {"read": 읽은 행 수, "written": 필터 통과 행 수}
+    """
+    start = time.time()
+    stats = {"read": 0, "written": 0}
+    dataset = ds.dataset(sources, format="parquet")
+    schema = output_schema(dataset.schema)
+
+    ds.write_dataset(
+        iter_clean_batches(dataset, schema, batch_size, min_length, max_length, stats),
+        out_dir,
+        schema=schema,
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema([("사건종류명", pa.string())]), flavor="hive"),
+        existing_data_behavior="delete_matching",
+        # 파티션별로 이 행 수만큼 모아서 row group 작성 → 버퍼 메모리도 이 크기로 제한
+        min_rows_per_group=batch_size,
+        max_rows_per_group=batch_size * 8,
+        basename_template="part-{i}.parquet",
+    )
+
+    print(
+        f"✅ 정제 완료: {out_dir} ({stats['read']}행 → {stats['written']}행, "
+        f"{time.time() - start:.1f}s)"
+    )
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="판례 원본 스트리밍 정제")
+    parser.add_argument("--source", nargs="+", required=True, help="원본 parquet 파일 또는 디렉터리")
+    parser.add_argument("--out", required=True, help="출력 디렉터리 (사건종류명 파티션)")
+    parser.add_argument("--batch-size", type=int, default=8192)
+    parser.add_argument("--min-length", type=int, default=MIN_TEXT_LENGTH, help="case_text 최소 길이 (초과)")
+    parser.add_argument("--max-length", type=int, default=MAX_TEXT_LENGTH, help="case_text 최대 길이 (미만)")
+    args = parser.parse_args()
+
+    sources = args.source[0] if len(args.source) == 1 and os.path.isdir(args.source[0]) else args.source
+    ingest(sources, args.out, args.batch_size, args.min_length, args.max_length)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+# pipeline/precompute_summaries.py
+"""
+판례 LLM 요약 일괄 사전 생성 CLI (ai_db 디렉터리에서 실행)
+
+  python -m pipeline.precompute_summaries --root <artifact_root> [--order popular] [--limit 5000]
+      [--concurrency 4] [--rpm 60]
+
+- 현재 코퍼스 버전(메인 + 델타)의 판례 요약을 LLM으로 미리 생성해서 요약 저장소에 저장
+  (app/summary_store.py, 서비스의 /case 요약/전문 조회가 먼저 읽는 저장소)
+- 동시 요청 수(--concurrency)와 분당 요청 수(--rpm)를 제한, 429/쿼터 오류는 전체 속도를 늦추고 재시도
+- 요약은 생성되는 즉시 저장 → 저장소 자체가 체크포인트 (중단 후 다시 실행하면 남은 판례만 생성)
+- text_hash가 같은 요약이 이미 있으면 건너뜀 → 다시 실행하면 내용이 바뀐 판례만 재생성 (--force: 전체 재생성)
+- --order popular: 서비스에서 요약 조회가 많았던 판례부터, 그 뒤 나머지 (--case-ids: 직접 지정한 순서)
+"""
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterator, List, Optional
+
+import pandas as pd
+
+from app.case_store import CaseStore
+from app.corpus import INDEX_FILE, active_version_dir
+from app.delta_segment import DeltaSegment, SegmentedStore, content_hash
+from app.search_engine import read_index_mmap
+from app.summary_store import SUMMARY_STORE_FILE, SummaryStore
+from llm.circuit_breaker import CircuitOpenError
+from llm.gemini_client import MODEL_NAME
+from llm.summarizer import generate_case_summary
+
+CHUNK_ROWS = 256
+MAX_RETRIES = 5
+RETRY_BASE_SEC = 2.0
+REPORT_EVERY = 50
+
+
+class RateLimiter:
+    """분당 요청 수 제한 (요청 사이 간격을 일정하게 유지, 스레드 안전)"""
+
+    def __init__(self, rpm: float):
+        self.interval = 60.0 / rpm if rpm > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            wait_sec = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait_sec > 0:
+            time.sleep(wait_sec)
+
+    def backoff(self, seconds: float) -> None:
+        """레이트 리밋 응답을 받으면 모든 워커의 다음 요청을 늦춤"""
+        with self._lock:
+            self._next = max(self._next, time.monotonic() + seconds)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    text = str(error)
+    return (
+        type(error).__name__ in ("ResourceExhausted", "TooManyRequests")
+        or "429" in text
+        or "quota" in text.lower()
+    )
+
+
+def summarize_with_retry(row: pd.DataFrame, limiter: RateLimiter) -> str:
+    """서비스와 같은 프롬프트로 요약 생성 (레이트 리밋 오류는 지수 백오프 후 재시도)"""
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.acquire()
+        try:
+            return generate_case_summary(user_case="", results_df=row, overall_risk_level="")
+        except Exception as e:
+            # 서킷 브레이커가 열린 동안(장애 중)도 건너뛰지 않고 기다렸다가 재시도
+            retryable = is_rate_limit_error(e) or isinstance(e, CircuitOpenError)
+            if not retryable or attempt == MAX_RETRIES:
+                raise
+            delay = RETRY_BASE_SEC * (2 ** attempt)
+            print(f"⏳ 레이트 리밋, {delay:.1f}s 후 재시도: {e}")
+            limiter.backoff(delay)
+
+
+def _open_store(root: str) -> SegmentedStore:
+    """현재 버전의 메인 저장소 + 델타 행"""
+    _, directory = active_version_dir(root)
+    main_store = CaseStore(directory)
+    main_index = read_index_mmap(os.path.join(directory, INDEX_FILE))
+    delta = DeltaSegment(directory, main_store, main_index.d, main_index.metric_type)
+    delta.refresh()
+    return SegmentedStore(main_store, delta)
+
+
+def target_positions(store, summary_store: SummaryStore, order: str = "popular",
+                     case_ids_path: Optional[str] = None, limit: Optional[int] = None) -> List[int]:
+    """요약을 생성할 저장소 행 위치 (우선순위 순)"""
+    case_id_to_idx = store.case_id_to_idx
+
+    if case_ids_path:
+        with open(case_ids_path, encoding="utf-8") as f:
+            ranked = [line.strip() for line in f if line.strip()]
+        positions = [case_id_to_idx[c] for c in ranked if c in case_id_to_idx]
+    else:
+        positions = sorted(case_id_to_idx.values())
+        if order == "popular":
+            popular = [case_id_to_idx[c] for c in summary_store.popular_case_ids() if c in case_id_to_idx]
+            seen = set(popular)
+            positions = popular + [p for p in positions if p not in seen]
+
+    return positions[:limit] if limit else positions
+
+
+def iter_pending(store, summary_store: SummaryStore, positions: List[int],
+                 force: bool, stats: dict) -> Iterator[tuple]:
+    """(case_id, text_hash, 1행 DataFrame) 중 요약이 없거나 내용이 바뀐 판례만"""
+    for offset in range(0, len(positions), CHUNK_ROWS):
+        rows = store.take(positions[offset:offset + CHUNK_ROWS])
+        case_ids = rows["사건번호"].map(lambda v: str(v).strip() if pd.notna(v) else "")
+        hashes = dict(zip(case_ids, rows["case_text"].map(content_hash)))
+        fresh = set() if force else summary_store.fresh_case_ids(hashes)
+        stats["skipped"] += len(fresh)
+
+        for i, case_id in enumerate(case_ids):
+            if case_id and case_id not in fresh:
+                yield case_id, hashes[case_id], rows.iloc[[i]]
+
+
+def _print_progress(stats: dict, total: int, elapsed: float) -> None:
+    done = stats["generated"] + stats["failed"]
+    rate = stats["generated"] / max(elapsed, 1e-6) * 60
+    remaining = total - stats["skipped"] - done
+    eta = remaining / rate if rate > 0 else float("inf")
+    print(
+        f"   생성 {stats['generated']} / 실패 {stats['failed']} / 건너뜀 {stats['skipped']} "
+        f"(대상 {total}, {rate:.1f}건/분, 남은 시간 ~{eta:.0f}분)"
+    )
+
+
+def precompute(root: str, store_path: Optional[str] = None, order: str = "popular",
+               case_ids_path: Optional[str] = None, limit: Optional[int] = None,
+               concurrency: int = 4, rpm: float = 60.0, force: bool = False) -> dict:
+    """
+    Returns:
+        {"targets", "generated", "skipped", "failed", "seconds", "per_minute"}
+    """
+    start = time.time()
+    store = _open_store(root)
+    summary_store = SummaryStore(store_path or os.path.join(root, SUMMARY_STORE_FILE), MODEL_NAME)
+    limiter = RateLimiter(rpm)
+
+    positions = target_positions(store, summary_store, order, case_ids_path, limit)
+    stats = {"targets": len(positions), "generated": 0, "skipped": 0, "failed": 0}
+    print(f"🧾 요약 사전 생성: 대상 {len(positions)}건 (모델 {MODEL_NAME}, 동시 {concurrency}, {rpm:g}rpm)")
+
+    def handle(future) -> None:
+        case_id, text_hash = in_flight.pop(future)
+        try:
+            summary_store.put(case_id, text_hash, future.result())
+            stats["generated"] += 1
+        except Exception as e:
+            stats["failed"] += 1
+            print(f"⚠️ 요약 실패 {case_id}: {e}")
+        if (stats["generated"] + stats["failed"]) % REPORT_EVERY == 0:
+            _print_progress(stats, len(positions), time.time() - start)
+
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for case_id, text_hash, row in iter_pending(store, summary_store, positions, force, stats):
+            # 대기 중인 요청은 (동시 수 × 2)로 제한 → 판례 행을 미리 다 읽지 않음
+            while len(in_flight) >= concurrency * 2:
+                finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    handle(future)
+            in_flight[pool.submit(summarize_with_retry, row, limiter)] = (case_id, text_hash)
+
+        while in_flight:
+            finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            for future in finished:
+                handle(future)
+
+    elapsed = time.time() - start
+    stats["seconds"] = round(elapsed, 1)
+    stats["per_minute"] = round(stats["generated"] / max(elapsed, 1e-6) * 60, 2)
+    summary_store.close()
+
+    print(
+        f"✅ 요약 사전 생성 완료: 생성 {stats['generated']}건, 건너뜀 {stats['skipped']}건, "
+        f"실패 {stats['failed']}건 ({elapsed:.1f}s, {stats['per_minute']}건/분)"
+    )
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="판례 LLM 요약 일괄 사전 생성")
+    parser.add_argument("--root", required=True, help="아티팩트 루트 디렉터리")
+    parser.add_argument("--store", help=f"요약 저장소 경로 (기본: <root>/{SUMMARY_STORE_FILE})")
+    parser.add_argument("--order", choices=["popular", "corpus"], default="popular",
+                        help="popular: 조회 많은 판례부터, corpus: 저장소 순서")
+    parser.add_argument("--case-ids", help="생성할 사건번호 목록 파일 (한 줄에 하나, 이 순서대로)")
+    parser.add_argument("--limit", type=int, help="앞에서부터 N건만")
+    parser.add_argument("--concurrency", type=int, default=4, help="동시 LLM 요청 수")
+    parser.add_argument("--rpm", type=float, default=60.0, help="분당 최대 요청 수 (0이면 제한 없음)")
+    parser.add_argument("--force", action="store_true", help="이미 있는 요약도 다시 생성")
+    args = parser.parse_args()
+
+    precompute(
+        args.root,
+        store_path=args.store,
+        order=args.order,
+        case_ids_path=args.case_ids,
+        limit=args.limit,
+        concurrency=args.concurrency,
+        rpm=args.rpm,
+        force=args.force,
+    )
+
+
+if __name__ == "__main__":
+    main()
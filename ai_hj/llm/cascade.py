@@ -0,0 +1,297 @@
+# cascade.py
+"""
+2단계 예측 (cascade): TF-IDF 모델 먼저, 불확실할 때만 BERT
+- lerning/machine_kisul.ipynb 의 LegalAIPredictor (TF-IDF + Ridge) 를 joblib mmap 으로 로드
+  → 계수/idf 배열은 파일을 메모리 매핑해서 읽기 때문에 fork 된 워커끼리 같은 페이지 캐시를 공유
+- 확신도가 기준값 이상이면 TF-IDF 결과로 바로 응답, 아니면 MultiTaskLegalBERT 로 넘김
+- 확신도 (0~1) = 사연 n-gram 중 학습 어휘에 있는 비율
+                 × 분류 모델 최대 확률 (case_type_model 이 있을 때)
+                 × (1 - 트리 간 예측 편차) (RandomForest 회귀일 때)
+  0~100 범위 예측(승소율/위험도)이 범위를 크게 벗어나면 외삽으로 보고 BERT 로 넘김
+- 정확도 영향: TF-IDF 로 응답한 요청 일부를 백그라운드에서 BERT 로도 돌려 차이(MAE)를 기록
+  (오프라인 평가: python cascade.py --test ../pkl_file/machine_data/test_machineData.pkl)
+"""
+import os
+import random
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+
+# lerning/machine_kisul.ipynb 셀10 저장 경로 (llm 폴더 기준)
+DEFAULT_CASCADE_MODEL = "../pkl_file/machine_data/model/legal_ai_machinModel.pkl"
+
+# 예측 키 → (LegalAIPredictor 모델 속성, 상한)
+TARGETS = {
+    "win_rate": ("win_rate_model", 100),
+    "sentence": ("sentence_model", None),
+    "fine": ("fine_model", None),
+    "risk": ("risk_model", 100),
+}
+
+# 0~100 예측이 이만큼 넘게 벗어나면 외삽으로 판단
+OUT_OF_RANGE_MARGIN = 10.0
+
+
+class LegalAIPredictor:
+    """
+    lerning/machine_kisul.ipynb 셀5 와 같은 구조 (노트북에서 __main__ 으로 pickle 됨)
+    서빙에서는 속성만 사용하므로 학습 코드는 노트북 참고
+    """
+
+    def __init__(self):
+        self.case_type_model = None
+        self.win_rate_model = None
+        self.sentence_model = None
+        self.risk_model = None
+        self.fine_model = None
+        self.vectorizer = None
+
+
+def load_predictor(path: str, mmap: bool = True) -> LegalAIPredictor:
+    """joblib 로드 (mmap_mode="r": 압축 없이 저장된 numpy 배열은 복사 없이 파일 매핑)"""
+    # 노트북에서 저장한 객체는 __main__.LegalAIPredictor 를 참조
+    main_module = sys.modules["__main__"]
+    if not hasattr(main_module, "LegalAIPredictor"):
+        main_module.LegalAIPredictor = LegalAIPredictor
+    return joblib.load(path, mmap_mode="r" if mmap else None)
+
+
+class CascadePredictor:
+    """TF-IDF 1차 예측 + 확신도 (스레드 안전, 통계 포함)"""
+
+    def __init__(self, model_path: str, threshold: float = 0.5, shadow_rate: float = 0.05,
+                 max_shadow_pending: int = 4, mmap: bool = True):
+        """
+        Args:
+            model_path: legal_ai_machinModel.pkl 경로
+            threshold: 이 확신도 이상이면 TF-IDF 결과로 응답
+            shadow_rate: TF-IDF 로 응답한 요청 중 BERT 로도 돌려 비교할 비율
+            max_shadow_pending: 밀려 있는 비교 작업이 이만큼이면 비교 생략 (서빙 부하 우선)
+        """
+        self.predictor = load_predictor(model_path, mmap=mmap)
+        self.vectorizer = self.predictor.vectorizer
+        self._analyze = self.vectorizer.build_analyzer()
+        self.threshold = threshold
+        self.shadow_rate = shadow_rate
+        self.max_shadow_pending = max_shadow_pending
+
+        self._lock = threading.Lock()
+        self.served = {"tfidf": 0, "bert": 0}
+        self.escalations = {"low_confidence": 0, "out_of_range": 0, "full_depth": 0}
+        self.confidence_sum = {"tfidf": 0.0, "bert": 0.0}
+
+        self._shadow_pool = None
+        self._shadow_pid = None
+        self._shadow_pending = 0
+        self.shadow = {"samples": 0, "skipped": 0, "failed": 0, "win_side_agree": 0}
+        self.shadow_abs_error = {key: 0.0 for key in TARGETS}
+
+    # ------------------------
+    # 1차 예측 + 확신도
+    # ------------------------
+    def _coverage(self, text: str) -> float:
+        """사연 n-gram 중 학습 어휘(vocabulary_)에 있는 비율"""
+        grams = self._analyze(text)
+        if not grams:
+            return 0.0
+        vocab = self.vectorizer.vocabulary_
+        return sum(1 for g in grams if g in vocab) / len(grams)
+
+    @staticmethod
+    def _tree_spread(model, X_vec, upper: Optional[float]) -> Optional[float]:
+        """RandomForest 회귀면 트리별 예측 표준편차 (0~1 로 정규화), 아니면 None"""
+        estimators = getattr(model, "estimators_", None)
+        if not estimators or upper is None:
+            return None
+        preds = np.array([tree.predict(X_vec)[0] for tree in estimators])
+        return min(1.0, float(preds.std()) / (upper / 2))
+
+    def predict(self, text: str) -> Tuple[Dict, float, Optional[str]]:
+        """
+        → (예측 딕셔너리, 확신도, BERT 로 넘길 이유 또는 None)
+        예측 딕셔너리는 LegalAnalyzer.predict_bert 와 같은 키
+        """
+        X_vec = self.vectorizer.transform([text])
+        confidence = self._coverage(text)
+
+        classifier = self.predictor.case_type_model
+        case_type = "법률 사건 분석"
+        if classifier is not None and hasattr(classifier, "predict_proba"):
+            proba = classifier.predict_proba(X_vec)[0]
+            confidence *= float(proba.max())
+            case_type = str(classifier.classes_[proba.argmax()])
+
+        preds = {}
+        out_of_range = False
+        for key, (attr, upper) in TARGETS.items():
+            model = getattr(self.predictor, attr)
+            raw = float(model.predict(X_vec)[0])
+            if upper is not None and not (-OUT_OF_RANGE_MARGIN <= raw <= upper + OUT_OF_RANGE_MARGIN):
+                out_of_range = True
+            preds[key] = max(0, min(upper, raw)) if upper is not None else max(0, raw)
+
+            spread = self._tree_spread(model, X_vec, upper)
+            if spread is not None:
+                confidence *= 1 - spread
+
+        reason = None
+        if out_of_range:
+            reason = "out_of_range"
+        elif confidence < self.threshold:
+            reason = "low_confidence"
+
+        result = {
+            'case_type': case_type,
+            **preds,
+            'exit_layer': 0,  # BERT 레이어를 쓰지 않음
+            'num_windows': 0,
+        }
+        return result, confidence, reason
+
+    # ------------------------
+    # 통계
+    # ------------------------
+    def record(self, tier: str, confidence: Optional[float], reason: Optional[str] = None):
+        with self._lock:
+            self.served[tier] += 1
+            if confidence is not None:
+                self.confidence_sum[tier] += confidence
+            if reason is not None:
+                self.escalations[reason] += 1
+
+    def maybe_shadow(self, text: str, cheap: Dict, run_bert: Callable[[str], Dict]):
+        """TF-IDF 로 응답한 요청 일부를 백그라운드에서 BERT 로도 예측해 차이 기록"""
+        if self.shadow_rate <= 0 or random.random() >= self.shadow_rate:
+            return
+        with self._lock:
+            if self._shadow_pending >= self.max_shadow_pending:
+                self.shadow["skipped"] += 1
+                return
+            self._shadow_pending += 1
+            # fork 된 워커는 부모의 스레드를 물려받지 않으므로 pid 가 바뀌면 새로 만듦
+            if self._shadow_pid != os.getpid():
+                self._shadow_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cascade-shadow")
+                self._shadow_pid = os.getpid()
+        self._shadow_pool.submit(self._shadow_compare, text, cheap, run_bert)
+
+    def _shadow_compare(self, text: str, cheap: Dict, run_bert: Callable[[str], Dict]):
+        try:
+            bert = run_bert(text)
+        except Exception as e:
+            print(f"⚠️ cascade 비교 예측 실패: {e}")
+            with self._lock:
+                self.shadow["failed"] += 1
+                self._shadow_pending -= 1
+            return
+        with self._lock:
+            self._shadow_pending -= 1
+            self.shadow["samples"] += 1
+            if (cheap['win_rate'] >= 50) == (bert['win_rate'] >= 50):
+                self.shadow["win_side_agree"] += 1
+            for key in TARGETS:
+                self.shadow_abs_error[key] += abs(cheap[key] - bert[key])
+
+    def stats(self) -> Dict:
+        """
+        tier 별 응답 비율 + BERT 로 넘긴 이유
+        accuracy_vs_bert: TF-IDF 응답을 BERT 와 비교한 평균 절대 오차 / 승패 방향 일치율
+        """
+        with self._lock:
+            total = sum(self.served.values())
+            samples = self.shadow["samples"]
+            return {
+                "threshold": self.threshold,
+                "total": total,
+                "served": dict(self.served),
+                "ratio": {
+                    tier: round(count / total, 4) for tier, count in self.served.items()
+                } if total else {},
+                "escalations": dict(self.escalations),
+                "avg_confidence": {
+                    tier: round(self.confidence_sum[tier] / count, 4)
+                    for tier, count in self.served.items() if count
+                },
+                "accuracy_vs_bert": {
+                    "shadow_rate": self.shadow_rate,
+                    **self.shadow,
+                    "pending": self._shadow_pending,
+                    "mae": {
+                        key: round(err / samples, 4) for key, err in self.shadow_abs_error.items()
+                    } if samples else {},
+                    "win_side_agreement": round(self.shadow["win_side_agree"] / samples, 4) if samples else None,
+                },
+            }
+
+
+# ------------------------
+# 오프라인 평가: 기준값별 TF-IDF 응답 비율과 정답 대비 MAE
+# ------------------------
+# 테스트 데이터 컬럼 (machine_kisul.ipynb) → 예측 키
+LABEL_COLUMNS = {
+    "win_rate": "win_rate",
+    "sentence": "sentence_years",
+    "fine": "fine_amount",
+    "risk": "risk_score",
+}
+
+
+def sweep_thresholds(cheap: List[Dict], confidences: List[float], reasons: List[Optional[str]],
+                     bert: List[Dict], labels: Dict[str, List[float]],
+                     thresholds: List[float]) -> List[Dict]:
+    """기준값마다 cascade 결과 (TF-IDF 비율, 정답 대비 MAE) 를 BERT 단독과 비교"""
+    def mae(preds, key):
+        return float(np.mean([abs(p[key] - y) for p, y in zip(preds, labels[key])]))
+
+    rows = [{"threshold": "bert_only", "tfidf_ratio": 0.0,
+             **{key: round(mae(bert, key), 4) for key in TARGETS}},
+            {"threshold": "tfidf_only", "tfidf_ratio": 1.0,
+             **{key: round(mae(cheap, key), 4) for key in TARGETS}}]
+    for t in thresholds:
+        use_cheap = [r != "out_of_range" and c >= t for c, r in zip(confidences, reasons)]
+        mixed = [c if u else b for c, b, u in zip(cheap, bert, use_cheap)]
+        rows.append({"threshold": t, "tfidf_ratio": round(sum(use_cheap) / len(use_cheap), 4),
+                     **{key: round(mae(mixed, key), 4) for key in TARGETS}})
+    return rows
+
+
+def main():
+    import argparse
+    import pandas as pd
+    from dotenv import load_dotenv
+    from jem_api import LegalAnalyzer
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--test", default="../pkl_file/machine_data/test_machineData.pkl")
+    parser.add_argument("--model", default=DEFAULT_CASCADE_MODEL)
+    parser.add_argument("--bert", default="../lerning/saved_mode3")
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--thresholds", default="0.3,0.4,0.5,0.6,0.7,0.8")
+    args = parser.parse_args()
+
+    load_dotenv()
+    test_df = pd.read_pickle(args.test)
+    test_df = test_df[~test_df['case_type'].isin(['기타', '헌법'])].head(args.limit)
+    cascade = CascadePredictor(args.model, shadow_rate=0)
+    analyzer = LegalAnalyzer(model_path=args.bert, gemini_api_key=os.getenv("GEMINI_API_KEY"))
+
+    cheap, confidences, reasons, bert = [], [], [], []
+    for idx, text in enumerate(test_df['text'], 1):
+        if idx % 100 == 0:
+            print(f"  진행: {idx:,}/{len(test_df):,}")
+        result, confidence, reason = cascade.predict(text)
+        cheap.append(result)
+        confidences.append(confidence)
+        reasons.append(reason)
+        bert.append(analyzer.predict_bert(text))
+
+    labels = {key: test_df[col].tolist() for key, col in LABEL_COLUMNS.items()}
+    thresholds = [float(t) for t in args.thresholds.split(",")]
+    print(pd.DataFrame(sweep_thresholds(cheap, confidences, reasons, bert, labels, thresholds)).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
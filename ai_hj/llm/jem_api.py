@@ -6,8 +6,18 @@ from transformers import AutoTokenizer
 import json
 import os
 
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from model import MultiTaskLegalBERT #내가 만든 모델 불러와
+from single_flight import SingleFlight, prompt_key
+from prompt_budget import FEEDBACK_PROMPT_BUDGET, PromptStats, estimate_tokens, truncate_tokens
+from circuit_breaker import CircuitBreaker
+from cascade import CascadePredictor
+
+# 장문 모드 윈도우 집계 방식
+WINDOW_POOLINGS = ("mean", "max", "weighted")
+
+# 분류 헤드 라벨 순서 (학습 노트북의 case_type 카테고리 순서, 체크포인트에 class_names가 있으면 그 값 사용)
+DEFAULT_CLASS_NAMES = ['민사/가사소송', '행정소송', '형사소송']
 
 
 
@@ -16,12 +26,28 @@ from model import MultiTaskLegalBERT #내가 만든 모델 불러와
 class LegalAnalyzer:
     """법률 사건 분석 클래스 (BERT + Gemini)"""
     
-    def __init__(self, model_path: str, gemini_api_key: str):
+    def __init__(self, model_path: str, gemini_api_key: str,
+                 exit_confidence: float = 0.9, exit_tolerance: float = 0.05,
+                 long_document: bool = False, window_overlap: int = 128,
+                 max_windows: int = 8, window_pooling: str = "mean",
+                 cascade_model_path: Optional[str] = None, cascade_threshold: float = 0.5,
+                 cascade_shadow_rate: float = 0.05):
         """
         Args:
             model_path: 학습된 BERT 모델 경로
             gemini_api_key: Gemini API 키
+            exit_confidence: 조기 종료에 필요한 분류 확신도
+            exit_tolerance: 조기 종료 시 직전 출구 대비 허용 변화율
+            long_document: 기본 장문 모드 사용 여부 (512토큰 초과 사연을 윈도우로 분할)
+            window_overlap: 인접 윈도우끼리 겹치는 토큰 수
+            max_windows: 한 사연당 최대 윈도우 수 (최악의 경우 연산량 상한)
+            window_pooling: 윈도우별 출력 집계 방식 (mean / max / weighted)
+            cascade_model_path: TF-IDF 예측 모델(legal_ai_machinModel.pkl) 경로, 있으면 cascade 모드
+            cascade_threshold: TF-IDF 결과로 바로 응답할 최소 확신도
+            cascade_shadow_rate: TF-IDF 응답 중 BERT 로도 돌려 정확도 차이를 기록할 비율
         """
+        if window_pooling not in WINDOW_POOLINGS:
+            raise ValueError(f"지원하지 않는 pooling: {window_pooling} (가능: {WINDOW_POOLINGS})")
         # BERT 모델 로드
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.tokenizer = AutoTokenizer.from_pretrained("klue/bert-base")
@@ -33,11 +59,6 @@ class LegalAnalyzer:
         
         # 이건 직접 가서 내가 필요한 모델을 불러오겠다는것
         # self.model = MultiTaskLegalBERT(num_labels=3).to(self.device)
-        self.model = MultiTaskLegalBERT(
-        model_name="klue/bert-base",  # 👈 엔진 선택
-        num_labels=3).to(self.device)
-     
-        
         model_file = os.path.join(model_path, "pytorch_model.bin")
         
         # 파일을 불러옵니다 (상자 가져오기)
@@ -48,12 +69,25 @@ class LegalAnalyzer:
         
         
         # 'model_state_dict'라는 알맹이가 있는지 확인하고 가중치만 추출
+        self.class_names = DEFAULT_CLASS_NAMES
         if isinstance(checkpoint, dict) and 'model_state_dict' in checkpoint:
             state_dict = checkpoint['model_state_dict']
+            self.class_names = checkpoint.get('class_names') or DEFAULT_CLASS_NAMES
             print("✅ 딕셔너리 포장을 풀고 가중치를 추출했습니다.")
         else:
             state_dict = checkpoint
             print("✅ 일반 가중치 파일을 로드했습니다.")
+
+        # 체크포인트에 중간 출구 헤드가 있으면 조기 종료 모드로 구성
+        exit_layers = MultiTaskLegalBERT.exit_layers_from_state_dict(state_dict)
+        self.model = MultiTaskLegalBERT(
+        model_name="klue/bert-base",  # 👈 엔진 선택
+        num_labels=3,
+        exit_layers=exit_layers).to(self.device)
+        self.model.exit_confidence = exit_confidence
+        self.model.exit_tolerance = exit_tolerance
+        if exit_layers:
+            print(f"✅ 조기 종료 헤드 로드: {exit_layers}번 레이어")
             
         # 모델 뼈대에 추출한 가중치를 주입합니다.
         self.model.load_state_dict(state_dict)
@@ -68,30 +102,111 @@ class LegalAnalyzer:
         # llm 불러와 / Gemini 설정
         # genai.configure(api_key=gemini_api_key)
         # self.gemini_model = genai.GenerativeModel('gemini-pro')
+        self.gemini_api_key = gemini_api_key
         self.client = genai.Client(api_key=gemini_api_key)
         self.model_name = "gemini-2.5-flash"
+        # 같은 프롬프트의 동시 피드백 요청은 Gemini 호출 1번으로 합침
+        self.llm_flight = SingleFlight()
+        # 피드백 프롬프트 토큰 예산 (긴 사연은 가운데 생략)
+        self.prompt_stats = PromptStats({"feedback": FEEDBACK_PROMPT_BUDGET})
+        # Gemini 장애/지연이 이어지면 호출 없이 바로 템플릿 피드백
+        self.llm_breaker = CircuitBreaker(
+            "gemini-feedback",
+            failure_threshold=float(os.getenv("HJ_LLM_BREAKER_FAILURE_RATE", "0.5")),
+            slow_call_sec=float(os.getenv("HJ_LLM_BREAKER_SLOW_SEC", "20")),
+            open_sec=float(os.getenv("HJ_LLM_BREAKER_OPEN_SEC", "30")),
+        )
+
+        # 장문 모드 설정
+        self.long_document = long_document
+        self.window_overlap = window_overlap
+        self.max_windows = max_windows
+        self.window_pooling = window_pooling
+
+        # cascade 모드: 쉬운 사연은 TF-IDF 모델로 응답, 불확실할 때만 BERT
+        self.cascade = None
+        if cascade_model_path:
+            self.cascade = CascadePredictor(cascade_model_path, threshold=cascade_threshold,
+                                            shadow_rate=cascade_shadow_rate)
+            print(f"✅ cascade TF-IDF 모델 로드: {cascade_model_path} (threshold={cascade_threshold})")
         
         # # 클래스 이름 로드
         # with open(f"{model_path}/config.json", 'r') as f:
         #     config = json.load(f)
         #     self.class_names = config.get('class_names', ['민사/가사소송', '행정소송', '형사소송'])
     
-    def predict_bert(self, text: str) -> Dict[str, Any]:
-        """BERT로 기본 수치 예측"""
+    def _tokenize_windows(self, text: str) -> Dict[str, torch.Tensor]:
+        """겹치는 512토큰 윈도우로 분할 (max_windows 초과 시 앞/뒤 포함 균등 샘플링)"""
         inputs = self.tokenizer(
-            text, 
-            return_tensors="pt", 
-            truncation=True, 
-            padding=True, 
-            max_length=512
+            text,
+            return_tensors="pt",
+            truncation=True,
+            padding=True,
+            max_length=512,
+            stride=self.window_overlap,
+            return_overflowing_tokens=True
         )
+        inputs = {k: v for k, v in inputs.items()
+                  if k not in ('token_type_ids', 'overflow_to_sample_mapping')}
+
+        num_windows = inputs['input_ids'].size(0)
+        if num_windows > self.max_windows:
+            keep = torch.linspace(0, num_windows - 1, self.max_windows).round().long().unique()
+            inputs = {k: v[keep] for k, v in inputs.items()}
+        return inputs
+
+    def _pool_windows(self, outputs: Dict[str, Any], attention_mask: torch.Tensor) -> Dict[str, Any]:
+        """윈도우별 5개 헤드 출력을 하나로 집계"""
+        pooled = {}
+        # weighted: 실제 토큰 수(패딩 제외)에 비례한 가중 평균
+        weights = attention_mask.sum(dim=1).float()
+        weights = weights / weights.sum()
+
+        for key in ('win_rate', 'sentence', 'fine', 'risk', 'logits'):
+            values = outputs[key]
+            if self.window_pooling == "max":
+                pooled[key] = values.max(dim=0).values
+            elif self.window_pooling == "weighted":
+                w = weights.view(-1, *([1] * (values.dim() - 1)))
+                pooled[key] = (values * w).sum(dim=0)
+            else:
+                pooled[key] = values.mean(dim=0)
+        pooled['exit_layer'] = outputs['exit_layer']
+        return pooled
+
+    def predict_bert(self, text: str, full_depth: bool = False,
+                     long_document: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        BERT로 기본 수치 예측
+
+        Args:
+            full_depth: True면 조기 종료 없이 전체 레이어 사용
+            long_document: True면 512토큰 초과 사연을 윈도우로 나눠 한 번의 배치로 추론
+                           (None이면 분석기 기본값)
+        """
+        if long_document is None:
+            long_document = self.long_document
+
+        if long_document:
+            inputs = self._tokenize_windows(text)
+        else:
+            inputs = self.tokenizer(
+                text, 
+                return_tensors="pt", 
+                truncation=True, 
+                padding=True, 
+                max_length=512
+            )
         
          # token_type_ids 제거
         inputs = {k: v.to(self.device) for k, v in inputs.items()
                   if k != 'token_type_ids'}
+        num_windows = inputs['input_ids'].size(0)
         
-        with torch.no_grad():
-            outputs = self.model(**inputs)
+        # 모든 윈도우를 한 번의 배치 forward로 처리
+        outputs = self.model.predict(**inputs, full_depth=full_depth)
+        if num_windows > 1:
+            outputs = self._pool_windows(outputs, inputs['attention_mask'])
         
         # # 소송 유형 예측
         # logits = outputs['logits']
@@ -102,12 +217,143 @@ class LegalAnalyzer:
             'win_rate': max(0, min(100, outputs['win_rate'].item())),
             'sentence': max(0, outputs['sentence'].item()),
             'fine': max(0, outputs['fine'].item()),
-            'risk': max(0, min(100, outputs['risk'].item()))
+            'risk': max(0, min(100, outputs['risk'].item())),
+            'exit_layer': outputs['exit_layer'],
+            'num_windows': num_windows
+        }
+
+    def predict(self, text: str, full_depth: bool = False,
+                long_document: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        수치 예측 (cascade 모드면 TF-IDF 먼저, 확신도가 낮을 때만 BERT)
+        full_depth=True 는 전체 모델을 요청한 것이므로 바로 BERT
+        결과에 'tier' (tfidf / bert) 와 'tier_confidence' (TF-IDF 확신도) 추가
+        """
+        if self.cascade is None:
+            return self.predict_bert(text, full_depth=full_depth, long_document=long_document)
+
+        if full_depth:
+            self.cascade.record("bert", None, "full_depth")
+            result = self.predict_bert(text, full_depth=True, long_document=long_document)
+            return {**result, 'tier': 'bert', 'tier_confidence': None}
+
+        cheap, confidence, reason = self.cascade.predict(text)
+        if reason is None:
+            self.cascade.record("tfidf", confidence)
+            self.cascade.maybe_shadow(
+                text, cheap, lambda t: self.predict_bert(t, long_document=long_document)
+            )
+            return {**cheap, 'tier': 'tfidf', 'tier_confidence': confidence}
+
+        self.cascade.record("bert", confidence, reason)
+        result = self.predict_bert(text, long_document=long_document)
+        return {**result, 'tier': 'bert', 'tier_confidence': confidence}
+
+    def predict_shared(self, text: str) -> Dict[str, Any]:
+        """
+        BERT forward 1번으로 수치 예측 + 소송 유형 확률 + 검색용 벡터
+        (ai_db 가 같은 인코더로 만든 인덱스를 쓰면 SentenceTransformer 인코딩을 생략)
+        검색 벡터는 인덱스 빌드와 같은 조건이어야 하므로 512토큰 절단, 조기 종료 없음
+        """
+        inputs = self.tokenizer(
+            text,
+            return_tensors="pt",
+            truncation=True,
+            padding=True,
+            max_length=512
+        )
+        inputs = {k: v.to(self.device) for k, v in inputs.items()
+                  if k != 'token_type_ids'}
+        outputs = self.model.predict_shared(**inputs)
+
+        probs = torch.softmax(outputs['logits'], dim=-1)[0].tolist()
+        case_type_probs = dict(zip(self.class_names, probs))
+        return {
+            'case_type': max(case_type_probs, key=case_type_probs.get),
+            'case_type_probs': case_type_probs,
+            'win_rate': max(0, min(100, outputs['win_rate'].item())),
+            'sentence': max(0, outputs['sentence'].item()),
+            'fine': max(0, outputs['fine'].item()),
+            'risk': max(0, min(100, outputs['risk'].item())),
+            'exit_layer': outputs['exit_layer'],
+            'num_windows': 1,
+            'embedding': outputs['embedding'][0].float().cpu().tolist(),
+        }
+
+    def reset_llm_client(self):
+        """Gemini 클라이언트 재생성 (fork된 워커는 부모의 커넥션 풀을 공유하면 안 됨)"""
+        self.client = genai.Client(api_key=self.gemini_api_key)
+
+    def exit_stats(self) -> Dict[str, Any]:
+        """조기 종료 출구별 사용 통계"""
+        return self.model.exit_stats()
+
+    def cascade_stats(self) -> Optional[Dict[str, Any]]:
+        """tier 별 응답 비율 + BERT 대비 정확도 차이 (cascade 모드가 아니면 None)"""
+        return self.cascade.stats() if self.cascade is not None else None
+
+    def llm_stats(self) -> Dict[str, Any]:
+        """Gemini 호출 통계 (coalescing: 합쳐서 생략된 호출 수, prompts: 프롬프트 토큰 수)"""
+        return {
+            "circuit_breaker": self.llm_breaker.stats(),
+            "coalescing": self.llm_flight.stats(),
+            "prompts": self.prompt_stats.stats(),
         }
     
     def generate_feedback(self, story: str, bert_results: Dict) -> str:
-        """Gemini로 상세 피드백 생성"""
-        prompt = f"""
+        """Gemini로 상세 피드백 생성 (프롬프트는 FEEDBACK_PROMPT_BUDGET 토큰 이내)"""
+        fixed_tokens = estimate_tokens(self._feedback_prompt("", bert_results))
+        prompt_story = truncate_tokens(story, FEEDBACK_PROMPT_BUDGET - fixed_tokens)
+        prompt = self._feedback_prompt(prompt_story, bert_results)
+        self.prompt_stats.record("feedback", estimate_tokens(prompt), prompt_story != story)
+
+        def call():
+            # response = self.gemini_model.generate_content(prompt)
+            response = self.client.models.generate_content(
+                model=self.model_name,
+                contents=prompt
+            )
+            return response.text
+
+        return self.llm_flight.do(
+            prompt_key(prompt, self.model_name),
+            lambda: self.llm_breaker.call(call)
+        )
+
+    def template_feedback(self, bert_results: Dict) -> str:
+        """Gemini 없이 BERT 예측값만으로 만드는 피드백 (장애/오류 시)"""
+        win_rate = bert_results['win_rate']
+        risk = bert_results['risk']
+        level = "상" if risk >= 70 else "중" if risk >= 40 else "하"
+
+        lines = [
+            "1. 승소율 분석",
+            f"   - AI 예측 승소율은 {win_rate:.1f}%입니다."
+            + (" 유리한 편으로 예측되었습니다." if win_rate >= 60
+               else " 불리한 편으로 예측되었습니다." if win_rate < 40
+               else " 결과를 예단하기 어려운 수준입니다."),
+        ]
+        if bert_results['sentence'] > 0.1:
+            lines.append(f"   - 예상 형량은 약 {bert_results['sentence']:.1f}년입니다.")
+        if bert_results['fine'] > 10000:
+            lines.append(f"   - 예상 벌금은 약 {bert_results['fine']:,.0f}원입니다.")
+        lines += [
+            "",
+            "2. 대응 전략",
+            "   - 사건 경위를 날짜순으로 정리하고 관련 증거(계약서, 메시지, 영수증 등)를 확보해 두세요.",
+            "",
+            "3. 주의사항",
+            f"   - 위험도는 {risk:.1f}/100입니다. 상대방과의 직접 접촉이나 증거 훼손은 피하세요.",
+            "",
+            "4. 전문가 상담 추천",
+            f"   - 필요성: {level}",
+            "",
+            "※ 현재 상세 AI 피드백을 생성할 수 없어 예측 수치 기반 기본 안내를 제공합니다.",
+        ]
+        return "\n".join(lines)
+
+    def _feedback_prompt(self, story: str, bert_results: Dict) -> str:
+        return f"""
 당신은 법률 전문가이자 승소율 높은 최고의 변호사입니다. 다음 사연을 분석하고 조언해주세요.
 
 【사연】
@@ -140,27 +386,32 @@ class LegalAnalyzer:
    - 필요성 (상/중/하)
    - 추천 전문 분야
 """
-        
-        # response = self.gemini_model.generate_content(prompt)
-        response = self.client.models.generate_content(
-            model=self.model_name,
-            contents=prompt
-        )
-        return response.text
     
-    def analyze(self, story: str) -> Dict[str, Any]:
+    def analyze(self, story: str, full_depth: bool = False,
+                long_document: Optional[bool] = None) -> Dict[str, Any]:
         """통합 분석 실행"""
         print("🔍 BERT 모델 분석 중...")
-        bert_results = self.predict_bert(story)
-        
-        print("💬 Gemini 피드백 생성 중...")
-        feedback = self.generate_feedback(story, bert_results)
+        bert_results = self.predict(story, full_depth=full_depth,
+                                    long_document=long_document)
         
         return {
             **bert_results,
-            'feedback': feedback,
+            **self.feedback(story, bert_results),
             'original_story': story
         }
+
+    def feedback(self, story: str, bert_results: Dict) -> Dict[str, str]:
+        """Gemini 피드백 (실패/서킷 OPEN 이면 템플릿 피드백)"""
+        print("💬 Gemini 피드백 생성 중...")
+        try:
+            feedback = self.generate_feedback(story, bert_results)
+            feedback_source = 'llm'
+        except Exception as e:
+            # 서킷 브레이커 OPEN이면 호출 없이 바로 여기로 옴
+            print(f"⚠️ 피드백 생성 실패, 템플릿 피드백 사용: {e}")
+            feedback = self.template_feedback(bert_results)
+            feedback_source = 'template'
+        return {'feedback': feedback, 'feedback_source': feedback_source}
     
     def print_result(self, result: Dict[str, Any]):
         """결과를 보기 좋게 출력"""
@@ -2,6 +2,7 @@
 # app.py
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
+from typing import Optional
 import json
 from jem_api import LegalAnalyzer
 import uvicorn
@@ -33,13 +34,19 @@ app.add_middleware(
 # 스프링부트 AiDto.AnalyzeRequest와 모양을 맞춥니다.
 class AnalyzeRequest(BaseModel):
     case_text: str
+    full_depth: bool = False  # True면 조기 종료 없이 BERT 전체 레이어 사용
+    long_document: Optional[bool] = None  # True면 512토큰 초과 사연을 윈도우 분할 (None이면 서버 기본값)
 
 
+# BERT 추론 + Gemini 호출이 모두 동기(블로킹) → async def 로 두면 이벤트 루프가 요청 내내 멈춤
+# 일반 def 로 두고 FastAPI 스레드 풀(단독 실행) / 게이트웨이 전용 풀에서 실행
+
 # 승소율
 @app.post("/analyze/win-rate")
-async def analyze_win_rate(request: AnalyzeRequest):
+def analyze_win_rate(request: AnalyzeRequest):
     try:
-        result = analyzer.analyze(request.case_text)
+        result = analyzer.analyze(request.case_text, full_depth=request.full_depth,
+                                  long_document=request.long_document)
         return {
             "win_rate": result.get('win_rate'),
             "win_rate_feedback": result.get('feedback'),
@@ -49,11 +56,45 @@ async def analyze_win_rate(request: AnalyzeRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# BERT 예측값만 (Gemini 피드백 없음) - 게이트웨이 /analyze/all 이 판례 근거와 합쳐서 LLM 호출 1번으로 설명 생성
+@app.post("/analyze/predict")
+def analyze_predict(request: AnalyzeRequest):
+    try:
+        return analyzer.predict(request.case_text, full_depth=request.full_depth,
+                                long_document=request.long_document)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+class FeedbackRequest(BaseModel):
+    case_text: str
+    predictions: dict  # /analyze/predict 결과
+
+
+# 예측값 → Gemini 피드백만 (게이트웨이가 BERT 예측과 LLM 대기를 서로 다른 입장 풀에서 실행)
+@app.post("/analyze/feedback")
+def analyze_feedback(request: FeedbackRequest):
+    try:
+        return analyzer.feedback(request.case_text, request.predictions)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# BERT 1번으로 예측값 + 소송 유형 확률 + 검색 벡터 (게이트웨이 GATEWAY_SHARED_ENCODER=1 일 때 /analyze/all 에서 사용)
+@app.post("/analyze/predict-shared")
+def analyze_predict_shared(request: AnalyzeRequest):
+    try:
+        return analyzer.predict_shared(request.case_text)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # 형량/벌금/위험도
 @app.post("/analyze/sentence")
-async def analyze_sentence(request: AnalyzeRequest):
+def analyze_sentence(request: AnalyzeRequest):
     try:
-        result = analyzer.analyze(request.case_text)
+        result = analyzer.analyze(request.case_text, full_depth=request.full_depth,
+                                  long_document=request.long_document)
         return {
             "predicted_sentence": result.get('sentence'),
             "predicted_fine": result.get('fine'),
@@ -71,8 +112,18 @@ async def analyze_sentence(request: AnalyzeRequest):
 try:
     analyzer = LegalAnalyzer(
         model_path="../lerning/saved_mode3", 
-        gemini_api_key=os.getenv("GEMINI_API_KEY")
+        gemini_api_key=os.getenv("GEMINI_API_KEY"),
         # 환경 변수에서 가져온 진짜 키를 전달
+        long_document=os.getenv("HJ_LONG_DOCUMENT", "0") == "1",
+        max_windows=int(os.getenv("HJ_MAX_WINDOWS", "8")),
+        window_pooling=os.getenv("HJ_WINDOW_POOLING", "mean"),
+        # HJ_CASCADE=1 이면 TF-IDF 모델(machine_kisul.ipynb)로 먼저 예측하고 불확실할 때만 BERT
+        cascade_model_path=(
+            os.getenv("HJ_CASCADE_MODEL", "../pkl_file/machine_data/model/legal_ai_machinModel.pkl")
+            if os.getenv("HJ_CASCADE", "0") == "1" else None
+        ),
+        cascade_threshold=float(os.getenv("HJ_CASCADE_THRESHOLD", "0.5")),
+        cascade_shadow_rate=float(os.getenv("HJ_CASCADE_SHADOW_RATE", "0.05")),
     )
     print("AI 모델 로딩 성공!")
 except Exception as e:
@@ -83,20 +134,33 @@ except Exception as e:
 # 2. 요청 데이터 구조 정의
 class StoryRequest(BaseModel):
     story: str
+    full_depth: bool = False
+    long_document: Optional[bool] = None
 
 
 
 #여기가 스프링부트랑 연결하는 지점
 # 3. 분석 API 엔드포인트
 @app.post("/analyze")
-async def analyze_case(request: StoryRequest):
+def analyze_case(request: StoryRequest):
     try:
         # 사용자가 보낸 사연(story)을 분석기로 전달
-        result = analyzer.analyze(request.story)
+        result = analyzer.analyze(request.story, full_depth=request.full_depth,
+                                  long_document=request.long_document)
         return result  # 분석 결과(JSON)를 스프링부트에 반환
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+# 4. 모니터링 엔드포인트 (조기 종료 출구별 / cascade tier 별 사용 비율 → 기준값 튜닝용)
+@app.get("/metrics")
+async def metrics():
+    return {
+        "early_exit": analyzer.exit_stats(),
+        "cascade": analyzer.cascade_stats(),
+        "llm": analyzer.llm_stats(),
+    }
+
 print("\n💾 테스트 결과가 'test_input_result.json'에 저장되었습니다.") 
 
 
@@ -152,5 +216,19 @@ if __name__ == "__main__":
         
     # 서버 실행: 8000번 포트에서 대기 / 이건 스프링부트하고 연결할때 쓰는거야
     # '서버'에서 띄우는거야
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # HJ_WORKERS > 1 이면 모델을 한 번만 로드해서 공유 메모리에 올리고 워커를 fork
+    workers = int(os.getenv("HJ_WORKERS", "1"))
+    if workers > 1:
+        from serving import serve_forked
+        serve_forked(
+            app,
+            analyzer.model,
+            host="0.0.0.0",
+            port=8000,
+            workers=workers,
+            threads_per_worker=int(os.getenv("HJ_THREADS_PER_WORKER", "0")) or None,
+            on_worker_start=analyzer.reset_llm_client,
+        )
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
        
\ No newline at end of file
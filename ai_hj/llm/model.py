@@ -1,89 +1,266 @@
 # models.py
+import threading
+from collections import Counter
+
+import torch
 import torch.nn as nn
 from transformers import BertModel
 
+# 회귀 헤드 이름 (출력 딕셔너리 키와 동일)
+REGRESSION_KEYS = ("win_rate", "sentence", "fine", "risk")
+
+
+def mean_pool(last_hidden_state, attention_mask):
+    """패딩을 제외한 토큰 평균 (검색 벡터용, ai_db/app/bert_encoder.py 와 같은 방식이어야 함)"""
+    mask = attention_mask.unsqueeze(-1).to(last_hidden_state.dtype)
+    return (last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+
+
+class ExitHead(nn.Module):
+    """중간 레이어용 경량 헤드 (CLS 풀링 + 5개 예측 헤드)"""
+
+    def __init__(self, hidden_size, num_labels):
+        super().__init__()
+        self.pooler = nn.Sequential(nn.Linear(hidden_size, hidden_size), nn.Tanh())
+        self.win_rate_head = nn.Linear(hidden_size, 1)
+        self.sentence_head = nn.Linear(hidden_size, 1)
+        self.fine_head = nn.Linear(hidden_size, 1)
+        self.risk_head = nn.Linear(hidden_size, 1)
+        self.classifier = nn.Linear(hidden_size, num_labels)
+
+    def forward(self, hidden_states):
+        pooled = self.pooler(hidden_states[:, 0])
+        return {
+            "win_rate": self.win_rate_head(pooled).squeeze(-1),
+            "sentence": self.sentence_head(pooled).squeeze(-1),
+            "fine": self.fine_head(pooled).squeeze(-1),
+            "risk": self.risk_head(pooled).squeeze(-1),
+            "logits": self.classifier(pooled),
+        }
+
+
 class MultiTaskLegalBERT(nn.Module):
-    def __init__(self, model_name, num_labels):
+    def __init__(self, model_name, num_labels, exit_layers=None):
         super().__init__()
         self.bert = BertModel.from_pretrained(model_name)
         self.config = self.bert.config
         hidden_size = self.bert.config.hidden_size
-        
+
         # 수치 예측용 4가지 헤드
         self.win_rate_head = nn.Linear(hidden_size, 1)
         self.sentence_head = nn.Linear(hidden_size, 1)
         self.fine_head = nn.Linear(hidden_size, 1)
         self.risk_head = nn.Linear(hidden_size, 1)
-        
+
         # 소송 분류
         self.classifier = nn.Linear(hidden_size, num_labels)
         self.num_labels = num_labels
 
+        # 조기 종료(early-exit)용 중간 헤드 / 예: exit_layers=(4, 6, 8, 10)
+        # 마지막 레이어는 기존 헤드가 담당하므로 제외
+        num_layers = self.config.num_hidden_layers
+        self.exit_layers = sorted(
+            {int(l) for l in (exit_layers or []) if 0 < int(l) < num_layers}
+        )
+        self.exit_heads = nn.ModuleDict({
+            str(l): ExitHead(hidden_size, num_labels) for l in self.exit_layers
+        })
+
+        # 조기 종료 기준 (confidence: 분류 확신도 / tolerance: 직전 출구 대비 수치 변화율)
+        self.exit_confidence = 0.9
+        self.exit_tolerance = 0.05
+
+        # 출구별 사용 횟수 (레이어 번호 → 횟수), 여러 요청 스레드가 함께 갱신
+        self.exit_counts = Counter()
+        self._exit_lock = threading.Lock()
+
     @property
     def device(self):
         return next(self.parameters()).device
 
-    def forward(self, input_ids, attention_mask, labels=None, 
+    def _multitask_loss(self, preds, labels, win_rate, sentence, fine, risk):
+        """기존 멀티태스크 손실 (수치 MSE 4개 + 0.1 * 분류 CE)"""
+        mse_fct = nn.MSELoss()
+        loss = mse_fct(preds["win_rate"], win_rate) + \
+               mse_fct(preds["sentence"], sentence) + \
+               mse_fct(preds["fine"], fine) + \
+               mse_fct(preds["risk"], risk)
+
+        loss_fct = nn.CrossEntropyLoss()
+        loss += 0.1 * loss_fct(preds["logits"].view(-1, self.num_labels), labels.view(-1))
+        return loss
+
+    def _final_heads(self, pooled_output):
+        return {
+            "win_rate": self.win_rate_head(pooled_output).squeeze(-1),
+            "sentence": self.sentence_head(pooled_output).squeeze(-1),
+            "fine": self.fine_head(pooled_output).squeeze(-1),
+            "risk": self.risk_head(pooled_output).squeeze(-1),
+            "logits": self.classifier(pooled_output),
+        }
+
+    def forward(self, input_ids, attention_mask, labels=None,
                 win_rate=None, sentence=None, fine=None, risk=None):
-        outputs = self.bert(input_ids=input_ids, attention_mask=attention_mask)
+        outputs = self.bert(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            output_hidden_states=bool(self.exit_layers),
+        )
         pooled_output = outputs.pooler_output
-        
+
         # 각 수치 예측
-        pred_win = self.win_rate_head(pooled_output).squeeze(-1)
-        pred_sent = self.sentence_head(pooled_output).squeeze(-1)
-        pred_fine = self.fine_head(pooled_output).squeeze(-1)
-        pred_risk = self.risk_head(pooled_output).squeeze(-1)
-        logits = self.classifier(pooled_output)
-        
+        preds = self._final_heads(pooled_output)
+
         loss = None
         if win_rate is not None:
-            mse_fct = nn.MSELoss()
-            loss = mse_fct(pred_win, win_rate) + \
-                   mse_fct(pred_sent, sentence) + \
-                   mse_fct(pred_fine, fine) + \
-                   mse_fct(pred_risk, risk)
-            
-            loss_fct = nn.CrossEntropyLoss()
-            loss += 0.1 * loss_fct(logits.view(-1, self.num_labels), labels.view(-1))
-            
+            loss = self._multitask_loss(preds, labels, win_rate, sentence, fine, risk)
+
+            # 중간 출구 헤드도 같은 손실로 함께 학습
+            # hidden_states[0]은 임베딩 출력이므로 l번째 레이어 출력은 hidden_states[l]
+            for l in self.exit_layers:
+                exit_preds = self.exit_heads[str(l)](outputs.hidden_states[l])
+                loss = loss + self._multitask_loss(
+                    exit_preds, labels, win_rate, sentence, fine, risk
+                )
+
+        return {
+            "loss": loss,
+            **preds,
+        }
+
+    def _should_exit(self, preds, prev_preds):
+        """분류 확신도가 충분하고 직전 출구 대비 수치 예측이 안정되면 종료"""
+        if prev_preds is None:
+            return False
+
+        confidence = torch.softmax(preds["logits"], dim=-1).max(dim=-1).values
+        if (confidence < self.exit_confidence).any():
+            return False
+
+        for key in REGRESSION_KEYS:
+            change = (preds[key] - prev_preds[key]).abs() / prev_preds[key].abs().clamp(min=1.0)
+            if (change > self.exit_tolerance).any():
+                return False
+        return True
+
+    @torch.no_grad()
+    def predict(self, input_ids, attention_mask, full_depth=False):
+        """
+        추론 전용 forward (조기 종료 지원)
+
+        Args:
+            full_depth: True면 조기 종료 없이 12개 레이어 전체 사용
+
+        Returns:
+            forward()와 같은 예측 딕셔너리 + 'exit_layer'
+        """
+        num_layers = self.config.num_hidden_layers
+
+        if full_depth or not self.exit_layers:
+            preds = self.forward(input_ids=input_ids, attention_mask=attention_mask)
+            self._record_exit(num_layers)
+            return {**preds, "exit_layer": num_layers}
+
+        # 인코더 레이어를 하나씩 직접 실행하면서 출구마다 종료 여부 확인
+        hidden = self.bert.embeddings(input_ids=input_ids)
+        extended_mask = self.bert.get_extended_attention_mask(
+            attention_mask, input_ids.shape
+        )
+
+        prev_preds = None
+        for i, layer in enumerate(self.bert.encoder.layer, start=1):
+            layer_out = layer(hidden, attention_mask=extended_mask)
+            hidden = layer_out[0] if isinstance(layer_out, tuple) else layer_out
+
+            if str(i) in self.exit_heads:
+                preds = self.exit_heads[str(i)](hidden)
+                if self._should_exit(preds, prev_preds):
+                    self._record_exit(i)
+                    return {"loss": None, **preds, "exit_layer": i}
+                prev_preds = preds
+
+        preds = self._final_heads(self.bert.pooler(hidden))
+        self._record_exit(num_layers)
+        return {"loss": None, **preds, "exit_layer": num_layers}
+
+    @torch.no_grad()
+    def predict_shared(self, input_ids, attention_mask):
+        """
+        forward 1번으로 수치/분류 헤드 예측 + 검색용 벡터 (마지막 레이어 토큰 평균)
+        검색 인덱스와 같은 벡터여야 하므로 조기 종료 없이 전체 레이어 사용
+        """
+        outputs = self.bert(input_ids=input_ids, attention_mask=attention_mask)
+        preds = self._final_heads(outputs.pooler_output)
+        self._record_exit(self.config.num_hidden_layers)
+        return {
+            "loss": None,
+            **preds,
+            "exit_layer": self.config.num_hidden_layers,
+            "embedding": mean_pool(outputs.last_hidden_state, attention_mask),
+        }
+
+    def _record_exit(self, layer):
+        with self._exit_lock:
+            self.exit_counts[layer] += 1
+
+    def exit_stats(self):
+        """출구별 사용 횟수/비율 (기준값 튜닝용)"""
+        with self._exit_lock:
+            counts = dict(self.exit_counts)
+        total = sum(counts.values())
         return {
-            "loss": loss, 
-            "win_rate": pred_win, 
-            "sentence": pred_sent, 
-            "fine": pred_fine, 
-            "risk": pred_risk, 
-            "logits": logits
+            "exit_layers": self.exit_layers + [self.config.num_hidden_layers],
+            "confidence": self.exit_confidence,
+            "tolerance": self.exit_tolerance,
+            "total": total,
+            "counts": {str(l): c for l, c in sorted(counts.items())},
+            "ratio": {
+                str(l): c / total for l, c in sorted(counts.items())
+            } if total else {},
+            "avg_exit_layer": (
+                sum(l * c for l, c in counts.items()) / total
+            ) if total else None,
         }
-    
+
+    @staticmethod
+    def exit_layers_from_state_dict(state_dict):
+        """체크포인트에 저장된 중간 출구 헤드의 레이어 번호 추출"""
+        layers = set()
+        for key in state_dict:
+            if key.startswith("exit_heads."):
+                layers.add(int(key.split(".")[1]))
+        return sorted(layers)
+
     def save_pretrained(self, save_path):
         """모델 저장 (Hugging Face 스타일)"""
         import os
-        import torch
         os.makedirs(save_path, exist_ok=True)
-        
+
         # 모델 가중치 저장
         torch.save(self.state_dict(), f"{save_path}/pytorch_model.bin")
-        
+
         # BERT 설정 저장
         self.bert.config.save_pretrained(save_path)
-    
+
     @classmethod
     def from_pretrained(cls, model_path, num_labels=3):
         """저장된 모델 불러오기"""
-        import torch
-        
-        # 모델 초기화
-        model = cls("klue/bert-base", num_labels=num_labels)
-        
         # 가중치 로드
-        # state_dict = torch.load(f"{model_path}/pytorch_model.bin", 
+        # state_dict = torch.load(f"{model_path}/pytorch_model.bin",
         #                         map_location=torch.device('cpu'))
-        
+
         # weights_only=False를 추가하여 모델을 정상적으로 로드합니다.
-        state_dict = torch.load(f"{model_path}/pytorch_model.bin", 
+        state_dict = torch.load(f"{model_path}/pytorch_model.bin",
                                 map_location=torch.device('cpu'),
                                 weights_only=False)
-        
+
+        # 모델 초기화 (중간 출구 헤드가 저장돼 있으면 함께 구성)
+        model = cls(
+            "klue/bert-base",
+            num_labels=num_labels,
+            exit_layers=cls.exit_layers_from_state_dict(state_dict),
+        )
+
         model.load_state_dict(state_dict)
-        
-        return model
\ No newline at end of file
+
+        return model
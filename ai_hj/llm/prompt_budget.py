@@ -0,0 +1,12 @@
+# prompt_budget.py
+"""
+피드백 프롬프트 토큰 예산
+- 사연이 길어도 프롬프트 입력 토큰이 예산을 넘지 않도록 사연 가운데를 생략
+  (앞부분 = 사건 경위, 끝부분 = 현재 상황/질문 을 남김)
+- 요청마다 프롬프트 토큰 수를 기록 (/metrics 의 llm.prompts)
+
+토큰 추정/축약과 통계는 token_budget.py (ai_db 와 같은 코드)
+"""
+from token_budget import OMISSION, PromptStats, estimate_tokens, truncate_tokens  # 기존 import 경로 유지
+
+FEEDBACK_PROMPT_BUDGET = 2000
@@ -0,0 +1,130 @@
+# serving.py
+"""
+멀티 프로세스 BERT 서빙
+- 부모 프로세스에서 MultiTaskLegalBERT를 한 번만 로드
+- 가중치를 공유 메모리(torch shared tensor)로 옮긴 뒤 워커 N개를 fork
+- 워커들은 같은 리스닝 소켓을 공유하고, 각자 intra-op 스레드 수를 제한해 추론
+→ 워커 수만큼 코어를 쓰면서 가중치 메모리는 한 번만 사용
+"""
+import gc
+import os
+import signal
+import socket
+import time
+import multiprocessing as mp
+
+import torch
+import uvicorn
+
+
+def share_model_memory(model):
+    """모델 파라미터/버퍼를 공유 메모리로 이동 (fork 후 워커들이 같은 페이지를 읽기 전용으로 사용)"""
+    model.eval()
+    for param in model.parameters():
+        param.requires_grad_(False)
+    model.share_memory()
+    return model
+
+
+def _bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _worker_main(app, sock, num_threads, on_worker_start):
+    """워커 프로세스 진입점"""
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # 부모에서 이미 설정된 경우
+        pass
+
+    if on_worker_start is not None:
+        on_worker_start()
+
+    print(f"👷 워커 시작 (pid={os.getpid()}, threads={num_threads})")
+    config = uvicorn.Config(app, log_level="info")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _run_worker(target, args):
+    # 재시작된 워커는 감시 루프의 stop 핸들러를 물려받음 → 기본 동작으로 되돌려야 terminate() 로 바로 종료
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    target(*args)
+
+
+def supervise_workers(target, args, workers: int) -> None:
+    """
+    preload-then-fork 공통 루프 (serve_forked, 게이트웨이 backend_worker.py 가 함께 사용)
+    - 부모가 모델/데이터를 이미 로드한 상태에서 호출
+    - GC 대상에서 제외(gc.freeze) → 워커 N개 fork → 비정상 종료된 워커는 다시 fork
+    - SIGINT/SIGTERM 을 받으면 워커를 종료하고 반환
+    """
+    # fork 전에 현재 객체들을 GC 대상에서 제외 → 참조 카운트 변경으로 인한 copy-on-write 최소화
+    gc.collect()
+    gc.freeze()
+
+    ctx = mp.get_context("fork")
+
+    def start_worker():
+        proc = ctx.Process(target=_run_worker, args=(target, args), daemon=False)
+        proc.start()
+        return proc
+
+    procs = [start_worker() for _ in range(workers)]
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    # 워커 감시: 비정상 종료된 워커는 다시 fork
+    try:
+        while not stopping:
+            for i, proc in enumerate(procs):
+                if not proc.is_alive():
+                    print(f"⚠️ 워커 종료 감지 (pid={proc.pid}, exitcode={proc.exitcode}) → 재시작")
+                    procs[i] = start_worker()
+            time.sleep(1.0)
+    finally:
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+        for proc in procs:
+            proc.join(timeout=10)
+
+
+def serve_forked(app, model, host: str = "0.0.0.0", port: int = 8000,
+                 workers: int = 2, threads_per_worker: int = None,
+                 on_worker_start=None):
+    """
+    모델을 공유 메모리에 올린 뒤 워커를 fork해서 서빙
+
+    Args:
+        app: FastAPI 앱
+        model: 부모에서 이미 로드한 torch 모델
+        workers: 워커 프로세스 수
+        threads_per_worker: 워커별 intra-op 스레드 수 (None이면 코어 수 / 워커 수)
+        on_worker_start: fork 직후 워커에서 실행할 함수 (Gemini 클라이언트 재생성 등)
+    """
+    if threads_per_worker is None:
+        threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+
+    share_model_memory(model)
+    sock = _bind_socket(host, port)
+    print(f"🚀 멀티 프로세스 서빙: http://{host}:{port} (workers={workers}, threads/worker={threads_per_worker})")
+    try:
+        supervise_workers(_worker_main, (app, sock, threads_per_worker, on_worker_start), workers)
+    finally:
+        sock.close()
+        print("🛑 멀티 프로세스 서빙 종료")
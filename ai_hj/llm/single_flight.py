@@ -0,0 +1,66 @@
+# single_flight.py
+"""
+동일 프롬프트 LLM 호출 합치기 (single-flight)
+- 같은 프롬프트(해시)의 요청이 동시에 들어오면 첫 요청만 LLM을 호출하고
+  나머지는 그 호출의 결과(또는 예외)를 그대로 받음
+- 결과를 보관하지는 않음 (호출이 끝나면 키 삭제)
+
+ai_db/llm/ 와 ai_hj/llm/ 에 같은 파일이 있음 (두 서비스는 따로 배포·실행되므로 복사본 유지, 수정은 두 곳 함께)
+"""
+import hashlib
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict
+
+
+def prompt_key(prompt: str, model_name: str = "") -> str:
+    return hashlib.sha256(f"{model_name}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """프롬프트 해시별 진행 중 호출 (스레드 안전)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable):
+        """key 로 진행 중인 호출이 있으면 그 결과를 기다리고, 없으면 fn() 실행"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self.upstream_calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.upstream_calls + self.coalesced
+        with self._lock:
+            in_flight = len(self._calls)
+        return {
+            "requests": total,
+            "upstream_calls": self.upstream_calls,
+            "saved_calls": self.coalesced,
+            "saved_ratio": round(self.coalesced / total, 4) if total else 0.0,
+            "in_flight": in_flight,
+        }
@@ -0,0 +1,93 @@
+# token_budget.py
+"""
+프롬프트 토큰 추정/축약 + 프롬프트 토큰 수 통계
+- 토큰 수는 API 호출 없이 추정 (한글/한자 1글자 ≈ 1토큰, 그 외 4글자 ≈ 1토큰, 실제보다 약간 크게 잡음)
+- 긴 텍스트는 앞부분(사건 경위)과 끝부분(현재 상황/질문)을 남기고 가운데를 생략
+
+ai_db/llm/ 와 ai_hj/llm/ 에 같은 파일이 있음 (두 서비스는 따로 배포·실행되므로 복사본 유지, 수정은 두 곳 함께)
+"""
+import math
+import re
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+OMISSION = " …(중략)… "
+
+_WIDE_RE = re.compile(r"[ᄀ-ᇿ㄰-㆏가-힣一-鿿]")
+_SENTENCE_END_RE = re.compile(r"(?<=[.?!다요])\s+")
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    if not text:
+        return 0
+    wide = len(_WIDE_RE.findall(text))
+    return wide + math.ceil((len(text) - wide) / 4)
+
+
+def truncate_tokens(text: Optional[str], max_tokens: int, head_ratio: float = 0.6) -> str:
+    """앞/뒤 문장을 남기고 가운데를 생략해서 max_tokens 이하로"""
+    text = text or ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= estimate_tokens(OMISSION):
+        return ""
+
+    available = max_tokens - estimate_tokens(OMISSION)
+    sentences = _SENTENCE_END_RE.split(text.strip())
+
+    head, used = [], 0
+    for s in sentences:
+        cost = estimate_tokens(s) + 1
+        if used + cost > available * head_ratio:
+            break
+        head.append(s)
+        used += cost
+
+    tail = []
+    for s in reversed(sentences[len(head):]):
+        cost = estimate_tokens(s) + 1
+        if used + cost > available:
+            break
+        tail.insert(0, s)
+        used += cost
+
+    if not head and not tail:
+        # 문장 하나가 예산보다 길면 글자 단위로 자름
+        head_text = text
+        while head_text and estimate_tokens(head_text) > available:
+            head_text = head_text[:int(len(head_text) * 0.9)]
+        return head_text.rstrip() + OMISSION.rstrip()
+    return " ".join(head) + OMISSION + " ".join(tail)
+
+
+class PromptStats:
+    """템플릿별 프롬프트 토큰 수 기록 (최근 window건 분포)"""
+
+    def __init__(self, budgets: Optional[Dict[str, int]] = None, window: int = 1000):
+        self.budgets = budgets or {}
+        self._lock = threading.Lock()
+        self._recent: Dict[str, deque] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self.window = window
+
+    def record(self, name: str, tokens: int, trimmed: bool) -> None:
+        with self._lock:
+            self._recent.setdefault(name, deque(maxlen=self.window)).append(tokens)
+            counts = self._counts.setdefault(name, {"requests": 0, "trimmed": 0})
+            counts["requests"] += 1
+            counts["trimmed"] += int(trimmed)
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            out = {}
+            for name, recent in self._recent.items():
+                tokens = sorted(recent)
+                out[name] = {
+                    **self._counts[name],
+                    "budget": self.budgets.get(name),
+                    "avg_tokens": round(sum(tokens) / len(tokens), 1),
+                    "p95_tokens": tokens[min(len(tokens) - 1, int(len(tokens) * 0.95))],
+                    "max_tokens": tokens[-1],
+                }
+            return out
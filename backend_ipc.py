@@ -0,0 +1,222 @@
+# backend_ipc.py
+"""
+게이트웨이 ↔ 백엔드 워커 프로세스 통신 (Unix 도메인 소켓)
+- 프레임: 4바이트 길이(big endian) + JSON 본문 (UTF-8, 코드 실행이 불가능한 형식)
+  소켓은 본인 소유 0700 디렉터리 안에서만 생성/연결 (XDG_RUNTIME_DIR 우선), 소켓 권한 0600
+  요청 (endpoint, args, kwargs) → 응답 (status, payload)  status 200 이면 결과, 아니면 오류 메시지
+- 요청마다 연결 1개: 바쁜 워커는 accept 하지 않으므로 커널이 쉬는 워커에 분배
+- BackendProcess: 백엔드 마스터 프로세스(backend_worker.py) 실행/감시
+  마스터가 죽으면 지수 백오프로 재시작 (마스터 안의 워커 재시작은 마스터가 담당)
+"""
+import asyncio
+import json
+import os
+import struct
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Optional
+
+HEADER = struct.Struct(">I")
+MAX_FRAME = 64 * 1024 * 1024
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# /tmp 처럼 누구나 쓸 수 있는 곳이면 사용자별 이름 (다른 사용자가 먼저 만든 디렉터리는 ensure_private_dir 에서 거부)
+SOCKET_DIR = os.getenv("GATEWAY_SOCKET_DIR") or (
+    os.path.join(os.environ["XDG_RUNTIME_DIR"], "legal_ai") if os.getenv("XDG_RUNTIME_DIR")
+    else os.path.join(tempfile.gettempdir(), f"legal_ai-{os.getuid()}")
+)
+
+
+class RemoteError(Exception):
+    """백엔드 핸들러가 오류 응답을 보냄 (str 은 오류 메시지)"""
+
+    def __init__(self, status_code: int, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class BackendUnavailable(Exception):
+    """백엔드 프로세스가 준비되지 않았거나 처리 중 종료됨"""
+
+
+def ensure_private_dir(directory: str) -> None:
+    """
+    소켓 디렉터리 생성/검사: 본인 소유 + 그룹/기타 권한 없음 (심볼릭 링크 불가)
+    → 다른 로컬 사용자가 먼저 만든 디렉터리에 가짜 소켓을 끼워 넣는 것 방지
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or stat.S_IMODE(st.st_mode) & 0o077:
+        raise RuntimeError(
+            f"소켓 디렉터리가 안전하지 않습니다 (본인 소유 0700 디렉터리여야 함): {directory} "
+            f"(uid={st.st_uid}, mode={oct(stat.S_IMODE(st.st_mode))})"
+        )
+
+
+def encode_frame(obj) -> bytes:
+    body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    return HEADER.pack(len(body)) + body
+
+
+def decode_frame(body: bytes):
+    return json.loads(body.decode("utf-8"))
+
+
+def _check_size(size: int) -> int:
+    if size > MAX_FRAME:
+        raise ValueError(f"frame too large: {size} bytes")
+    return size
+
+
+# ---- 동기 (워커 쪽) ----
+
+def _recv_exact(sock, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise EOFError("connection closed")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def read_frame(sock):
+    (size,) = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    return decode_frame(_recv_exact(sock, _check_size(size)))
+
+
+def write_frame(sock, obj) -> None:
+    sock.sendall(encode_frame(obj))
+
+
+# ---- 비동기 (게이트웨이 쪽) ----
+
+async def read_frame_async(reader: asyncio.StreamReader):
+    (size,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return decode_frame(await reader.readexactly(_check_size(size)))
+
+
+class BackendProcess:
+
+    def __init__(self, name: str, workers: int = 1, threads_per_worker: int = 2,
+                 intra_op_threads: Optional[int] = None, ready_timeout: float = 300.0):
+        """
+        Args:
+            name: 백엔드 이름 (backend_worker.BACKENDS 키: hj, db)
+            workers: fork 할 워커 프로세스 수
+            threads_per_worker: 워커별 동시 처리 요청 수 (LLM 대기 동안 다른 요청 처리)
+            intra_op_threads: 워커별 torch 스레드 수 (None이면 코어 수 / 워커 수)
+            ready_timeout: 로딩/재시작 중일 때 요청이 기다리는 최대 시간
+        """
+        self.name = name
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.intra_op_threads = intra_op_threads
+        self.ready_timeout = ready_timeout
+        self.socket_path = os.path.join(SOCKET_DIR, f"{name}.sock")
+
+        self._proc: Optional[subprocess.Popen] = None
+        self._started_at = 0.0
+        self._backoff = 1.0
+        self._stopping = False
+
+        self.restarts = 0
+        self.calls = 0
+        self.errors = 0
+        self.retried = 0
+
+    def start(self) -> None:
+        ensure_private_dir(SOCKET_DIR)
+        cmd = [
+            sys.executable, os.path.join(ROOT, "backend_worker.py"), self.name,
+            "--socket", self.socket_path,
+            "--workers", str(self.workers),
+            "--threads", str(self.threads_per_worker),
+        ]
+        if self.intra_op_threads:
+            cmd += ["--intra-op-threads", str(self.intra_op_threads)]
+        self._proc = subprocess.Popen(cmd, cwd=ROOT)
+        self._started_at = time.monotonic()
+        print(f"🚀 백엔드 프로세스 시작: {self.name} (pid={self._proc.pid}, workers={self.workers})")
+
+    async def supervise(self, interval: float = 1.0) -> None:
+        """마스터 프로세스 감시 → 종료되면 재시작 (연속 실패 시 대기 시간 2배, 최대 60초)"""
+        while not self._stopping:
+            await asyncio.sleep(interval)
+            if self._proc is None or self._proc.poll() is None:
+                if time.monotonic() - self._started_at > 60:
+                    self._backoff = 1.0
+                continue
+            print(f"⚠️ 백엔드 프로세스 종료 감지: {self.name} (exitcode={self._proc.returncode}) "
+                  f"→ {self._backoff:.0f}s 후 재시작")
+            # 남은 워커(마스터 없이 종료 대기 중)로 새 연결이 가지 않도록 소켓 경로부터 제거
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            await asyncio.sleep(self._backoff)
+            self._backoff = min(self._backoff * 2, 60.0)
+            if not self._stopping:
+                self.restarts += 1
+                self.start()
+
+    def stop(self) -> None:
+        self._stopping = True
+        if self._proc is not None and self._proc.poll() is None:
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+
+    async def _connect(self, deadline: float):
+        while True:
+            try:
+                return await asyncio.open_unix_connection(self.socket_path)
+            except (FileNotFoundError, ConnectionRefusedError):
+                # 로딩 중이거나 재시작 중
+                if time.monotonic() > deadline:
+                    raise BackendUnavailable(f"{self.name} backend not ready")
+                await asyncio.sleep(0.5)
+
+    async def call(self, endpoint: str, *args, **kwargs):
+        """백엔드 워커에서 endpoint 핸들러 실행 (인자/결과는 JSON 호환 기본 타입)"""
+        self.calls += 1
+        frame = encode_frame((endpoint, args, kwargs))
+        deadline = time.monotonic() + self.ready_timeout
+
+        for attempt in range(2):
+            reader, writer = await self._connect(deadline)
+            try:
+                writer.write(frame)
+                await writer.drain()
+                status, payload = await read_frame_async(reader)
+                break
+            except (asyncio.IncompleteReadError, ConnectionError):
+                # 처리 중 워커 종료 → 다른 워커로 한 번만 재시도 (조회성 요청만 있음)
+                if attempt:
+                    self.errors += 1
+                    raise BackendUnavailable(f"{self.name} backend worker exited")
+                self.retried += 1
+            finally:
+                writer.close()
+
+        if status != 200:
+            self.errors += 1
+            raise RemoteError(status, payload)
+        return payload
+
+    def stats(self) -> Dict:
+        alive = self._proc is not None and self._proc.poll() is None
+        return {
+            "pid": self._proc.pid if self._proc is not None else None,
+            "alive": alive,
+            "workers": self.workers,
+            "threads_per_worker": self.threads_per_worker,
+            "restarts": self.restarts,
+            "calls": self.calls,
+            "errors": self.errors,
+            "retried": self.retried,
+        }
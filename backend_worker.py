@@ -0,0 +1,199 @@
+# backend_worker.py
+"""
+백엔드 워커 프로세스 (게이트웨이 GATEWAY_MODE=process)
+
+  python backend_worker.py hj --socket $XDG_RUNTIME_DIR/legal_ai/hj.sock --workers 2
+  python backend_worker.py db --socket $XDG_RUNTIME_DIR/legal_ai/db.sock --workers 4
+
+- 백엔드(ai_hj: BERT, ai_db: 인코더 + FAISS)를 이 프로세스에서 한 번만 로드
+- 가중치를 공유 메모리로 옮기고 gc.freeze 후 워커 N개를 fork (fork/감시 루프는 ai_hj/llm/serving.py 것을 그대로 사용)
+- 워커들은 같은 Unix 도메인 소켓에서 accept, 워커마다 --threads 개 스레드가 요청 처리
+- 종료된 워커는 다시 fork, 마스터가 사라지면 워커도 종료
+→ 백엔드마다 별도 프로세스라 GIL/intra-op 스레드를 서로 뺏지 않고, 워커 수를 따로 조절
+"""
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+
+from backend_ipc import ensure_private_dir, read_frame, write_frame
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+HJ_LLM_DIR = os.path.join(ROOT, "ai_hj", "llm")
+
+
+def supervise_workers(target, args, workers: int) -> None:
+    """ai_hj/llm/serving.py 의 fork/감시 루프 (db 백엔드도 같은 코드, 경로는 뒤쪽에 추가해서 db 모듈을 가리지 않음)"""
+    if HJ_LLM_DIR not in sys.path:
+        sys.path.append(HJ_LLM_DIR)
+    import serving
+    serving.supervise_workers(target, args, workers)
+
+
+def load_hj():
+    """ai_hj/llm/main.py (flat import, 모델 경로가 llm 폴더 기준)"""
+    sys.path.insert(0, HJ_LLM_DIR)
+    os.chdir(HJ_LLM_DIR)
+    import main as hj
+    from serving import share_model_memory
+
+    handlers = {
+        "win_rate": lambda body: hj.analyze_win_rate(hj.AnalyzeRequest(**body)),
+        "sentence": lambda body: hj.analyze_sentence(hj.AnalyzeRequest(**body)),
+        "predict": lambda body: hj.analyze_predict(hj.AnalyzeRequest(**body)),
+        "predict_shared": lambda body: hj.analyze_predict_shared(hj.AnalyzeRequest(**body)),
+        "feedback": lambda body: hj.analyze_feedback(hj.FeedbackRequest(**body)),
+    }
+
+    def before_fork():
+        share_model_memory(hj.analyzer.model)
+
+    return handlers, before_fork, hj.analyzer.reset_llm_client
+
+
+def load_db():
+    """ai_db/app/main.py (app 패키지 기준 import)"""
+    db_dir = os.path.join(ROOT, "ai_db")
+    sys.path.insert(0, db_dir)
+    os.chdir(db_dir)
+    from app import main as db, service
+    from app.schemas import CaseRequest
+
+    handlers = {
+        "analyze": lambda body, x_deadline_ms=None: db.analyze(CaseRequest(**body), x_deadline_ms=x_deadline_ms),
+        "summary": db.case_summary,
+        "full": db.case_full,
+        "duplicates": db.case_duplicates,
+        "section": db.case_section,
+        "retrieve": lambda body, **kwargs: db.analyze_case(CaseRequest(**body), **kwargs),
+        "combined_summary": db.combined_summary,
+        "analysis_summary": db.summarize_analysis,
+    }
+
+    def before_fork():
+        service.model.eval()
+        service.model.share_memory()
+
+    return handlers, before_fork, service.corpus_manager.start_watcher
+
+
+BACKENDS = {
+    "hj": load_hj,
+    "db": load_db,
+}
+
+
+def dispatch(handlers, endpoint, args, kwargs):
+    """→ (status, payload)  결과는 JSON 호환 기본 타입으로 변환해서 전송"""
+    from fastapi import HTTPException
+    from fastapi.encoders import jsonable_encoder
+
+    handler = handlers.get(endpoint)
+    if handler is None:
+        return 404, f"unknown endpoint: {endpoint}"
+    try:
+        return 200, jsonable_encoder(handler(*args, **kwargs))
+    except HTTPException as e:
+        return e.status_code, e.detail
+    except Exception as e:
+        return 500, str(e)
+
+
+class _WorkerState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.draining = False
+
+
+def _serve_connections(sock: socket.socket, handlers, state: _WorkerState) -> None:
+    while True:
+        conn, _ = sock.accept()
+        with conn:
+            with state.lock:
+                if state.draining:
+                    # 종료 중 → 응답 없이 닫음 (게이트웨이가 다른 워커로 재시도)
+                    continue
+                state.in_flight += 1
+            try:
+                endpoint, args, kwargs = read_frame(conn)
+                write_frame(conn, dispatch(handlers, endpoint, args, kwargs))
+            except (EOFError, ConnectionError) as e:
+                print(f"⚠️ 요청 연결 종료: {e}")
+            finally:
+                with state.lock:
+                    state.in_flight -= 1
+
+
+def _worker_main(sock, handlers, threads, intra_op_threads, on_worker_start, master_pid):
+    import torch
+    torch.set_num_threads(intra_op_threads)
+
+    if on_worker_start is not None:
+        on_worker_start()
+
+    state = _WorkerState()
+    for _ in range(threads):
+        threading.Thread(target=_serve_connections, args=(sock, handlers, state), daemon=True).start()
+    print(f"👷 백엔드 워커 시작 (pid={os.getpid()}, threads={threads}, intra_op={intra_op_threads})")
+
+    # 마스터가 강제 종료되면 (재시작된 마스터와 겹치지 않도록) 처리 중인 요청만 끝내고 종료
+    while os.getppid() == master_pid:
+        time.sleep(0.5)
+    with state.lock:
+        state.draining = True
+    while state.in_flight:
+        time.sleep(0.1)
+
+
+def _bind_socket(path: str) -> socket.socket:
+    ensure_private_dir(os.path.dirname(os.path.abspath(path)))
+    if os.path.exists(path):
+        os.unlink(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # bind 와 동시에 0600 으로 생성 (bind 후 chmod 하면 그 사이에 다른 사용자가 연결 가능)
+    old_umask = os.umask(0o177)
+    try:
+        sock.bind(path)
+    finally:
+        os.umask(old_umask)
+    sock.listen(2048)
+    return sock
+
+
+def serve(backend: str, socket_path: str, workers: int, threads: int, intra_op_threads: int = None):
+    handlers, before_fork, on_worker_start = BACKENDS[backend]()
+    if intra_op_threads is None:
+        intra_op_threads = max(1, (os.cpu_count() or 1) // workers)
+
+    before_fork()
+    sock = _bind_socket(socket_path)
+    print(f"🚀 백엔드 서빙: {backend} → {socket_path} (workers={workers})")
+    try:
+        supervise_workers(
+            _worker_main,
+            (sock, handlers, threads, intra_op_threads, on_worker_start, os.getpid()),
+            workers,
+        )
+    finally:
+        sock.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        print(f"🛑 백엔드 서빙 종료: {backend}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("backend", choices=sorted(BACKENDS))
+    parser.add_argument("--socket", required=True)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=2)
+    parser.add_argument("--intra-op-threads", type=int, default=None)
+    args = parser.parse_args()
+    serve(args.backend, args.socket, args.workers, args.threads, args.intra_op_threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# bench/gateway_load.py
+"""
+게이트웨이 동시 처리 부하 테스트
+
+  python main.py                                   # 게이트웨이 실행 (8000번 포트)
+  python bench/gateway_load.py --concurrency 1     # 순차 처리 기준값
+  python bench/gateway_load.py --concurrency 12    # 엔드포인트를 섞어 동시 요청
+
+- 유효 동시성 = 요청 지연 합계 / 전체 경과 시간
+  → 이벤트 루프가 막혀 있으면 동시 요청 수와 관계없이 1 근처, 전용 풀에서 실행되면 동시 요청 수에 가까워짐
+- 엔드포인트별 지연(p50/p95)과 상태 코드(429 = 입장 제어로 거절)를 함께 출력
+- 끝나면 /metrics 의 풀별 실행/거절 수 출력
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+STORY = "임대인이 계약 만료 후 두 달이 지났는데도 보증금 5천만 원을 돌려주지 않고 연락을 피하고 있습니다."
+
+ENDPOINTS = {
+    "analyze": ("POST", "/analyze", {"case_text": STORY}),
+    "win_rate": ("POST", "/analyze/win-rate", {"case_text": STORY}),
+    "sentence": ("POST", "/analyze/sentence", {"case_text": STORY}),
+    "all": ("POST", "/analyze/all", {"case_text": STORY}),
+}
+
+
+def call(base_url: str, name: str, timeout: float, client_id: str):
+    method, path, body = ENDPOINTS[name]
+    req = urllib.request.Request(
+        base_url + path,
+        data=json.dumps(body, ensure_ascii=False).encode("utf-8") if body else None,
+        headers={"Content-Type": "application/json", "X-Client-Id": client_id},
+        method=method,
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as res:
+            res.read()
+            status = res.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = "error"
+    return name, status, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=12)
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--endpoints", default="analyze,win_rate,sentence",
+                        help="쉼표로 구분, 순서대로 번갈아 요청")
+    parser.add_argument("--clients", type=int, default=4, help="X-Client-Id 개수")
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.endpoints.split(",") if n.strip()]
+    plan = list(itertools.islice(itertools.cycle(names), args.requests))
+
+    # 모델 로딩(첫 요청)이 측정에 섞이지 않도록 엔드포인트별로 한 번씩 미리 호출
+    for name in names:
+        call(args.url, name, args.timeout, "warmup")
+
+    results = []
+    lock = threading.Lock()
+
+    def run(i_name):
+        i, name = i_name
+        row = call(args.url, name, args.timeout, f"client-{i % args.clients}")
+        with lock:
+            results.append(row)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(run, enumerate(plan)))
+    wall = time.perf_counter() - start
+
+    print("=" * 60)
+    print(f"📊 concurrency={args.concurrency} requests={len(results)} wall={wall:.2f}s")
+    print(f"{'endpoint':>10} {'n':>5} {'p50(s)':>8} {'p95(s)':>8}  status")
+    by_name = defaultdict(list)
+    for name, status, sec in results:
+        by_name[name].append((status, sec))
+    for name, rows in by_name.items():
+        secs = np.array([sec for _, sec in rows])
+        statuses = dict(Counter(str(s) for s, _ in rows))
+        print(f"{name:>10} {len(rows):>5} {np.percentile(secs, 50):>8.2f} "
+              f"{np.percentile(secs, 95):>8.2f}  {statuses}")
+    print("-" * 60)
+    ok = sum(1 for _, status, _ in results if status == 200)
+    print(f"처리량: {ok / wall:.2f} req/s (200 응답 기준)")
+    print(f"유효 동시성: {sum(sec for _, _, sec in results) / wall:.2f}")
+
+    try:
+        with urllib.request.urlopen(args.url + "/metrics", timeout=10) as res:
+            print(json.dumps(json.loads(res.read()), ensure_ascii=False, indent=2))
+    except Exception as e:
+        print(f"⚠️ /metrics 조회 실패: {e}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# executors.py
+"""
+게이트웨이 동기 작업 실행기
+- ai_hj(BERT + Gemini 피드백), ai_db(임베딩/검색 + 요약) 파이프라인은 모두 동기 함수
+  → 이벤트 루프에서 직접 부르면 요청 하나가 끝날 때까지 게이트웨이 전체가 멈춤
+- 작업 종류별 전용 스레드 풀에서 실행하고 이벤트 루프는 결과만 await
+  (torch 연산/FAISS 검색/LLM 대기는 GIL을 놓으므로 스레드로 실제 동시 처리)
+- 엔드포인트별 동시 실행 상한: 한 엔드포인트가 풀을 독점하지 않도록
+
+설정 (환경 변수)
+  GATEWAY_THREADS_<풀>      풀 스레드 수 (BERT, RETRIEVAL, LOOKUP)
+  GATEWAY_LIMIT_<엔드포인트>  엔드포인트 동시 실행 상한 (WIN_RATE, SENTENCE, ANALYZE, SUMMARY, FULL, ...)
+                             없으면 풀 스레드 수와 같음 (상한 없음)
+"""
+import asyncio
+import functools
+import os
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+# 풀 이름 → 기본 스레드 수
+# bert/retrieval 은 요청 안에서 Gemini 응답(수 초)을 기다리므로 CPU 코어 수보다 크게 잡음
+DEFAULT_THREADS = {
+    "bert": 8,
+    "retrieval": 8,
+    "lookup": 16,
+}
+
+# 엔드포인트 → 풀
+ENDPOINT_POOLS = {
+    "win_rate": "bert",
+    "sentence": "bert",
+    "analyze": "retrieval",
+    "summary": "lookup",
+    "full": "lookup",
+    "duplicates": "lookup",
+    "section": "lookup",
+    # 입장 풀을 나눠 실행하는 단계 (/analyze, /analyze/all, 승소율/형량 탭)
+    "predict": "bert",
+    "predict_shared": "bert",
+    "retrieve": "retrieval",
+    "combined_summary": "lookup",
+    "analysis_summary": "lookup",
+    "feedback": "lookup",
+}
+
+
+class EndpointExecutors:
+
+    def __init__(self):
+        self._pools: Dict[str, ThreadPoolExecutor] = {}
+        self._pool_pid = None
+        self.threads = {
+            name: int(os.getenv(f"GATEWAY_THREADS_{name.upper()}", str(default)))
+            for name, default in DEFAULT_THREADS.items()
+        }
+        self.limits = {
+            endpoint: int(os.getenv(f"GATEWAY_LIMIT_{endpoint.upper()}", str(self.threads[pool])))
+            for endpoint, pool in ENDPOINT_POOLS.items()
+        }
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.running = {endpoint: 0 for endpoint in ENDPOINT_POOLS}
+        self.completed = {endpoint: 0 for endpoint in ENDPOINT_POOLS}
+
+    def _pool(self, name: str) -> ThreadPoolExecutor:
+        # fork 된 워커는 부모의 스레드를 물려받지 않으므로 pid 가 바뀌면 새로 만듦
+        if self._pool_pid != os.getpid():
+            self._pools = {}
+            self._pool_pid = os.getpid()
+        if name not in self._pools:
+            self._pools[name] = ThreadPoolExecutor(
+                max_workers=self.threads[name],
+                thread_name_prefix=f"gateway-{name}",
+            )
+        return self._pools[name]
+
+    def _semaphore(self, endpoint: str) -> asyncio.Semaphore:
+        # 이벤트 루프 안에서 처음 쓸 때 생성
+        if endpoint not in self._semaphores:
+            self._semaphores[endpoint] = asyncio.Semaphore(self.limits[endpoint])
+        return self._semaphores[endpoint]
+
+    @asynccontextmanager
+    async def limit(self, endpoint: str):
+        """엔드포인트 동시 실행 상한 (process 모드에서 백엔드 호출에도 사용)"""
+        async with self._semaphore(endpoint):
+            self.running[endpoint] += 1
+            try:
+                yield
+            finally:
+                self.running[endpoint] -= 1
+                self.completed[endpoint] += 1
+
+    async def run(self, endpoint: str, fn: Callable, *args, **kwargs):
+        """fn(*args, **kwargs) 를 엔드포인트 전용 풀에서 실행하고 결과 반환"""
+        pool = self._pool(ENDPOINT_POOLS[endpoint])
+        async with self.limit(endpoint):
+            return await asyncio.get_running_loop().run_in_executor(
+                pool, functools.partial(fn, *args, **kwargs)
+            )
+
+    def stats(self) -> Dict:
+        return {
+            "threads": self.threads,
+            "endpoints": {
+                endpoint: {
+                    "pool": ENDPOINT_POOLS[endpoint],
+                    "limit": self.limits[endpoint],
+                    "running": self.running[endpoint],
+                    "completed": self.completed[endpoint],
+                }
+                for endpoint in ENDPOINT_POOLS
+            },
+        }
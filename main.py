@@ -1,15 +1,71 @@
 # 통합main / 레이지로딩 기능
 
-from fastapi import FastAPI, HTTPException
+import asyncio
+import os
+import time
+
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
+from typing import Optional
 
-from ai_hj.llm import main as hj_main
-from ai_db.app import main as db_main
+from admission import AdmissionController, Overloaded, request_priority
+from backend_ipc import BackendProcess
+from executors import EndpointExecutors
 
 
 app = FastAPI(title="Legal_AI API")
 
+# 입장 제어: cpu 풀(인코더/BERT), io 풀(LLM/저장소), 대기열이 차면 429
+admission = AdmissionController()
+
+# 동기 파이프라인(BERT/검색/LLM)은 엔드포인트별 전용 스레드 풀에서 실행 → 이벤트 루프는 막히지 않음
+executors = EndpointExecutors()
+
+# GATEWAY_MODE=process: 백엔드(ai_hj / ai_db)를 각자 워커 프로세스 풀로 띄우고 Unix 도메인 소켓으로 호출
+# (게이트웨이 프로세스에는 모델을 올리지 않음, 백엔드별 워커 수를 따로 조절)
+GATEWAY_MODE = os.getenv("GATEWAY_MODE", "inline")
+backends = {}
+if GATEWAY_MODE == "process":
+    backends = {
+        name: BackendProcess(
+            name,
+            workers=int(os.getenv(f"GATEWAY_{name.upper()}_WORKERS", "1")),
+            threads_per_worker=int(os.getenv(f"GATEWAY_{name.upper()}_THREADS_PER_WORKER", "2")),
+            intra_op_threads=int(os.getenv(f"GATEWAY_{name.upper()}_INTRA_OP_THREADS", "0")) or None,
+        )
+        for name in ("hj", "db")
+    }
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": f"서버가 혼잡합니다 ({exc.pool}). 잠시 후 다시 시도해 주세요."},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+def admit(request: Request, pool: str):
+    """X-Priority: batch 면 사전 생성/일괄 작업으로 보고 뒤로, X-Client-Id(없으면 IP) 별 공정 분배"""
+    client = request.headers.get("x-client-id") or (request.client.host if request.client else "")
+    return admission.slot(pool, request_priority(request.headers.get("x-priority")), client)
+
+@app.on_event("startup")
+async def start_backends():
+    for backend in backends.values():
+        backend.start()
+        asyncio.create_task(backend.supervise())
+
+
+@app.on_event("shutdown")
+def stop_backends():
+    for backend in backends.values():
+        backend.stop()
+
 # CORS 설정
 app.add_middleware(
     CORSMiddleware,
@@ -29,6 +85,7 @@ def get_hj_module():
     global hj_module
     if hj_module is None:
         print("sj_LLM 모듈 로딩 중.")
+        from ai_hj.llm import main as hj_main
         hj_module = hj_main
         print("sj_LLM 모듈 로딩 완료")
     return hj_module
@@ -38,67 +95,226 @@ def get_db_module():
     global db_module
     if db_module is None:
         print("🔄 판례 검색 모듈 로딩 중.")
+        from ai_db.app import main as db_main
         db_module = db_main
         print("✅ 판례 검색 모듈 로딩 완료!")
     return db_module
 
 
+async def call_backend(backend: str, endpoint: str, handler: str, *args, **kwargs):
+    """process 모드면 백엔드 워커 프로세스에서, 아니면 게이트웨이 전용 스레드 풀에서 handler 실행"""
+    if backend in backends:
+        async with executors.limit(endpoint):
+            return await backends[backend].call(endpoint, *jsonable_encoder(args), **jsonable_encoder(kwargs))
+    module = get_hj_module() if backend == "hj" else get_db_module()
+    return await executors.run(endpoint, getattr(module, handler), *args, **kwargs)
+
+
 # Request 스키마
 class AnalyzeRequest(BaseModel):
     case_text: str
+    full_depth: bool = False  # BERT 조기 종료 끄기 (요청 단위)
+    long_document: Optional[bool] = None  # 장문 윈도우 모드 (None이면 서버 기본값)
 
 class CaseRequest(BaseModel):
     case_text: str
+    case_type: Optional[str] = None
+    deadline_ms: Optional[int] = None  # 지연 예산 (X-Deadline-Ms 헤더가 우선)
+
+class AnalyzeAllRequest(BaseModel):
+    case_text: str
+    case_type: Optional[str] = None
+    full_depth: bool = False
+    long_document: Optional[bool] = None
+    deadline_ms: Optional[int] = None
+
+# 1이면 /analyze/all 에서 BERT forward 1번의 결과(예측값 + 소송 유형 확률 + 검색 벡터)로 검색까지
+# (ai_db 인덱스를 legal-bert 인코더로 빌드했을 때만 효과, 아니면 ai_db 가 자체 인코딩으로 대체)
+SHARED_ENCODER = os.getenv("GATEWAY_SHARED_ENCODER", "0") == "1"
+
+# /analyze/all 기본 지연 예산 (0이면 없음)
+ANALYZE_ALL_BUDGET_MS = float(os.getenv("GATEWAY_ANALYZE_ALL_BUDGET_MS", "0"))
+
+
+def resolve_budget_ms(*values) -> float:
+    """헤더 > 요청 필드 > 기본값 중 처음으로 읽히는 값 (0이면 예산 없음)"""
+    for value in values:
+        try:
+            return max(float(value), 0.0)
+        except (TypeError, ValueError):
+            continue
+    return 0.0
+
+
+class FeedbackRequest(BaseModel):
+    case_text: str
+    predictions: dict
 
 
+# 입장 풀 구분: BERT 예측/인코딩/검색은 cpu 슬롯, Gemini 대기는 io 슬롯
+# → 느린 LLM 응답이 cpu 슬롯을 붙잡아 정상 요청까지 429 가 되지 않도록 단계마다 슬롯을 바꿔 잡음
+# (Overloaded 는 429 로 응답해야 하므로 500 변환에서 제외)
+
 # 승소율 탭 - 클릭시 llm/main.py 로딩
 @app.post("/analyze/win-rate")
-async def analyze_win_rate(request: AnalyzeRequest):
+async def analyze_win_rate(request: AnalyzeRequest, http_request: Request):
     """승소율 탭 클릭 → 여기서 처음 llm/main.py import"""
     try:
-        llm = get_hj_module()  # 여기서 처음 import!
-        return await llm.analyze_win_rate(request)
+        async with admit(http_request, "cpu"):
+            # 여기서 처음 import! (process 모드면 백엔드 프로세스 호출)
+            predictions = await call_backend("hj", "predict", "analyze_predict", request)
+        async with admit(http_request, "io"):
+            feedback = await call_backend(
+                "hj", "feedback", "analyze_feedback",
+                FeedbackRequest(case_text=request.case_text, predictions=predictions),
+            )
+        return {
+            "win_rate": predictions.get('win_rate'),
+            "win_rate_feedback": feedback.get('feedback'),
+            "legal_list": predictions.get('legal_list', [])
+        }
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # 형량 탭 - 클릭시 llm/main.py 로딩 (이미 로딩됐으면 재사용)
 @app.post("/analyze/sentence")
-async def analyze_sentence(request: AnalyzeRequest):
-    """형량 탭 클릭 → llm/main.py 재사용"""
+async def analyze_sentence(request: AnalyzeRequest, http_request: Request):
+    """형량 탭 클릭 → llm/main.py 재사용 (응답에 피드백이 없으므로 BERT 예측만)"""
     try:
-        llm = get_hj_module()  # 이미 import 됐으면 재사용
-        return await llm.analyze_sentence(request)
+        async with admit(http_request, "cpu"):
+            # 이미 import 됐으면 재사용
+            predictions = await call_backend("hj", "predict", "analyze_predict", request)
+        return {
+            "predicted_sentence": predictions.get('sentence'),
+            "predicted_fine": predictions.get('fine'),
+            "risk_analysis": predictions.get('risk')
+        }
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def remaining_budget_ms(budget_ms: float, start: float):
+    """검색/예측에 쓴 시간을 뺀 나머지 예산 (예산이 없으면 None → 백엔드 기본값)"""
+    return max(budget_ms - (time.monotonic() - start) * 1000, 1) if budget_ms > 0 else None
+
+
 # 판례 검색 탭 - 클릭시 app/main.py 로딩
 @app.post("/analyze")
-async def analyze_case(request: CaseRequest):
+async def analyze_case(request: CaseRequest, http_request: Request,
+                       x_deadline_ms: Optional[str] = Header(None)):
     """판례 검색 탭 클릭 → 여기서 처음 app/main.py import"""
     try:
-        case = get_db_module()  # 여기서 처음 import!
-        return await case.analyze(request)
+        start = time.monotonic()
+        budget_ms = resolve_budget_ms(x_deadline_ms, request.deadline_ms)
+        async with admit(http_request, "cpu"):
+            # 여기서 처음 import! 인코딩/검색만 (요약은 아래 io 단계)
+            analysis = await call_backend("db", "retrieve", "analyze_case", request,
+                                          deadline_ms=budget_ms or None, summarize=False)
+        async with admit(http_request, "io"):
+            summary = await call_backend("db", "analysis_summary", "summarize_analysis",
+                                         request.case_text, analysis,
+                                         deadline_ms=remaining_budget_ms(budget_ms, start))
+        return {**analysis, **summary}
+    except Overloaded:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# 통합 분석 - 판례 검색 + 승소율/형량 예측 + 종합 설명
+@app.post("/analyze/all")
+async def analyze_all(request: AnalyzeAllRequest, http_request: Request,
+                      x_deadline_ms: Optional[str] = Header(None)):
+    """
+    세 탭을 따로 부르면 Gemini 3번(판례 요약 + 피드백 2번) + BERT 2번
+    → 검색(ai_db)과 BERT 예측(ai_hj)을 동시에 실행하고, 둘을 합친 프롬프트로 LLM 1번
+    """
+    try:
+        start = time.monotonic()
+        budget_ms = resolve_budget_ms(x_deadline_ms, request.deadline_ms, ANALYZE_ALL_BUDGET_MS)
+        async with admit(http_request, "cpu"):
+            if SHARED_ENCODER:
+                # 예측 forward 의 벡터/분류 확률로 검색 → 트랜스포머 forward 1번 (대신 순차 실행)
+                predictions = await call_backend("hj", "predict_shared", "analyze_predict_shared", request)
+                shared = {
+                    "embedding": predictions.pop("embedding"),
+                    "case_type_probs": predictions.get("case_type_probs"),
+                }
+                analysis = await call_backend("db", "retrieve", "analyze_case", request,
+                                              deadline_ms=budget_ms or None, summarize=False,
+                                              prefetch=False, shared=shared)
+            else:
+                analysis, predictions = await asyncio.gather(
+                    call_backend("db", "retrieve", "analyze_case", request,
+                                 deadline_ms=budget_ms or None, summarize=False, prefetch=False),
+                    call_backend("hj", "predict", "analyze_predict", request),
+                )
+        async with admit(http_request, "io"):
+            # 검색/예측에 쓴 시간을 뺀 나머지 예산 안에서만 LLM 대기
+            summary = await call_backend("db", "combined_summary", "combined_summary",
+                                         request.case_text, analysis, predictions,
+                                         deadline_ms=remaining_budget_ms(budget_ms, start))
+        return {
+            **analysis,
+            **summary,
+            "predicted_case_type": predictions.get("case_type"),
+            "win_rate": predictions.get("win_rate"),
+            "predicted_sentence": predictions.get("sentence"),
+            "predicted_fine": predictions.get("fine"),
+            "risk_analysis": predictions.get("risk"),
+        }
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/case/{case_id}/summary")
-async def case_summary(case_id: str):
+async def case_summary(case_id: str, http_request: Request, enrich: bool = False):
+    """판례 요약 (기본: 로컬 추출 요약, enrich=true면 LLM 보강)"""
+    async with admit(http_request, "io"):
+        try:
+            return await call_backend("db", "summary", "case_summary", case_id, enrich)
+        except Exception as e:
+            raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/case/{case_id}/full")
+async def case_full(case_id: str, http_request: Request, enrich: bool = False):
+    async with admit(http_request, "io"):
+        try:
+            return await call_backend("db", "full", "case_full", case_id, enrich)
+        except Exception as e:
+            raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/case/{case_id}/duplicates")
+async def case_duplicates(case_id: str):
+    """근사 중복 판례 펼쳐보기"""
     try:
-        case = get_db_module()
-        return await case.case_summary(case_id)
+        return await call_backend("db", "duplicates", "case_duplicates", case_id)
     except Exception as e:
         raise HTTPException(status_code=404, detail=str(e))
 
-@app.get("/case/{case_id}/full")
-async def case_full(case_id: str):
+@app.get("/case/{case_id}/section/{section}")
+async def case_section(case_id: str, section: str):
+    """판례 섹션(판시사항/판결요지/주문/이유) 조회"""
     try:
-        case = get_db_module()
-        return await case.case_full(case_id)
+        return await call_backend("db", "section", "case_section", case_id, section)
     except Exception as e:
         raise HTTPException(status_code=404, detail=str(e))
 
+@app.get("/metrics")
+def metrics():
+    """게이트웨이 입장 제어 / 실행기 현황 (풀별 실행/대기/거절 수)"""
+    return {
+        "mode": GATEWAY_MODE,
+        "admission": admission.stats(),
+        "executors": executors.stats(),
+        "backends": {name: backend.stats() for name, backend in backends.items()},
+    }
+
 if __name__ == "__main__":
     import uvicorn
     print("="*50)